@@ -181,4 +181,5 @@ def post_comment(db: Session, agent_id: str, ticker: str, action: str, company_n
     db.commit()
     
     # 서버 로그 확인용 (선택)
-    # print(f"💬 [{agent_type}] {agent_id}: {content}")
\ No newline at end of file
+    # print(f"💬 [{agent_type}] {agent_id}: {content}")
+    return new_post
\ No newline at end of file
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+from sqlalchemy.orm import Session
+from database import SessionLocal, DBAgent
+
+logger = logging.getLogger("GlobalMarket")
+
+# ------------------------------------------------------------------
+# 인메모리 에이전트 계좌 저장소 (Write-Behind)
+# - 시뮬레이션 중에는 이 저장소가 '진짜' 잔고/보유량입니다.
+# - 에이전트 의사결정/정산은 DB를 읽지 않고 여기서 바로 처리하고,
+#   바뀐 계좌(dirty)만 주기적으로, 그리고 종료 시에 agents 테이블에 일괄 저장합니다.
+# ------------------------------------------------------------------
+
+class AgentAccount:
+    """에이전트 1명의 계좌 (__slots__ 로 500~수만 명도 가볍게)"""
+    __slots__ = ("row_id", "agent_id", "cash", "positions", "avg_prices", "psychology")
+
+    def __init__(self, row_id, agent_id, cash, portfolio=None, psychology=None):
+        self.row_id = row_id
+        self.agent_id = agent_id
+        self.cash = float(cash or 0)
+        self.positions = dict(portfolio or {})     # ticker -> 보유 수량
+        self.psychology = dict(psychology or {})   # AgentState 필드 + 부가 기억
+        # 평단가는 psychology 의 avg_price_{ticker} 키로 저장되던 값을 복원합니다.
+        self.avg_prices = {
+            k[len("avg_price_"):]: v for k, v in self.psychology.items() if k.startswith("avg_price_")
+        }
+
+    def to_row(self):
+        psychology = dict(self.psychology)
+        for k in [k for k in psychology if k.startswith("avg_price_")]:
+            del psychology[k]
+        for ticker, avg in self.avg_prices.items():
+            psychology[f"avg_price_{ticker}"] = avg
+        return {
+            "id": self.row_id,
+            "cash_balance": self.cash,
+            "portfolio": dict(self.positions),
+            "psychology": psychology,
+        }
+
+
+class AccountStore:
+    def __init__(self, flush_interval: float = 5.0, batch_size: int = 500):
+        self.accounts = {}      # agent_id -> AgentAccount
+        self.dirty = set()
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._flush_task = None
+
+    def __len__(self):
+        return len(self.accounts)
+
+    def get(self, agent_id):
+        return self.accounts.get(agent_id)
+
+    def agent_ids(self):
+        return list(self.accounts.keys())
+
+    def _add_rows(self, rows):
+        for row in rows:
+            self.accounts[row.agent_id] = AgentAccount(
+                row.id, row.agent_id, row.cash_balance, row.portfolio, row.psychology
+            )
+
+    def load_all(self, db: Session):
+        """시작할 때 agents 테이블 전체를 한 번에 읽어 옵니다."""
+        self._add_rows(db.query(DBAgent).all())
+        logger.info(f"💾 [계좌 저장소] 에이전트 {len(self.accounts)}명 메모리 적재 완료")
+
+    def load(self, db: Session, agent_ids):
+        """저장소에 없는 에이전트만 IN 쿼리 한 번으로 불러옵니다. (도중에 생긴 에이전트 대비)"""
+        missing = [a for a in set(agent_ids) if a not in self.accounts]
+        if missing:
+            self._add_rows(db.query(DBAgent).filter(DBAgent.agent_id.in_(missing)).all())
+
+    def mark_dirty(self, agent_id):
+        self.dirty.add(agent_id)
+
+    def apply_buy(self, account: AgentAccount, ticker, price, qty):
+        old_qty = account.positions.get(ticker, 0)
+        new_qty = old_qty + qty
+        old_avg = account.avg_prices.get(ticker, 0)
+        account.avg_prices[ticker] = ((old_qty * old_avg) + (price * qty)) / new_qty if new_qty > 0 else price
+        account.positions[ticker] = new_qty
+
+    def apply_sell(self, account: AgentAccount, ticker, qty):
+        account.positions[ticker] -= qty
+        if account.positions[ticker] <= 0:
+            del account.positions[ticker]
+            account.avg_prices.pop(ticker, None)
+
+    def flush(self, db: Session = None):
+        """바뀐 계좌만 batch_size 단위로 bulk update 합니다. (저장한 계좌 수 반환)"""
+        if not self.dirty:
+            return 0
+
+        ids, self.dirty = list(self.dirty), set()
+        rows = [self.accounts[a].to_row() for a in ids if a in self.accounts]
+
+        own_session = db is None
+        if own_session:
+            db = SessionLocal()
+        try:
+            for i in range(0, len(rows), self.batch_size):
+                db.bulk_update_mappings(DBAgent, rows[i:i + self.batch_size])
+                db.commit()
+        except Exception as e:
+            db.rollback()
+            # 실패한 계좌는 다음 주기에 다시 저장하도록 되돌려 둡니다.
+            self.dirty.update(ids)
+            logger.error(f"🚨 [계좌 저장소] flush 실패: {e}")
+            return 0
+        finally:
+            if own_session:
+                db.close()
+        return len(rows)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
+
+    def start(self):
+        """주기적 write-behind 작업을 시작합니다. (이벤트 루프 안에서 호출)"""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    def close(self):
+        """종료 시 호출: 주기 작업을 멈추고 남은 변경을 모두 저장합니다."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        return self.flush()
@@ -1,17 +1,78 @@
 import os
 import time
 import json
+import bisect
+import asyncio
+from collections import deque
 from dotenv import load_dotenv
-from openai import AzureOpenAI
+from openai import AzureOpenAI, AsyncAzureOpenAI
 from json_repair import repair_json
+from core.llm_scheduler import percentile
+from core.llm_cache import LLMCache, POLICIES, default_cache
 
 load_dotenv()
 
+# ------------------------------------------------------------------
+# LLM 호출 경로
+# - "stream": Assistants run 을 스트리밍으로 만들고 완료 이벤트가 오는 즉시 결과를 받습니다. (기본)
+# - "poll"  : 스트리밍이 막힌 환경용. 0.2초부터 1.5배씩 늘려 최대 2초 간격으로 상태를 조회합니다.
+# - "chat"  : 한 번 묻고 끝나는 프롬프트용 chat.completions 직통 경로. (스레드/런 생성 없음)
+# 스레드 + 메시지 + 런은 create_and_run 한 번으로 만들고, 클라이언트(sync/async)는 서비스당 하나를 재사용합니다.
+# 경로별 호출 지연은 LatencyHistogram 에 쌓여 latency_snapshot() 으로 볼 수 있습니다.
+# ------------------------------------------------------------------
+TRANSPORTS = ("stream", "poll", "chat")
+POLL_START = 0.2        # 초
+POLL_FACTOR = 1.5
+POLL_MAX = 2.0
+AGENT_INSTRUCTIONS = "당신은 주식 뉴스 분석 및 생성 전문가입니다. 항상 JSON 형식으로 응답합니다."
+PENDING_STATUSES = ('queued', 'in_progress', 'cancelling')
+NEWS_PROMPT_VERSION = 1     # _news_prompt 내용을 바꾸면 올려서 캐시된 예전 응답을 버립니다.
+
+
+class LatencyHistogram:
+    """고정 구간 누적 카운트 + 최근 500건 p50/p95/p99"""
+    BOUNDS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0)   # 초
+    __slots__ = ("counts", "recent", "calls", "errors")
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.recent = deque(maxlen=500)
+        self.calls = 0
+        self.errors = 0
+
+    def observe(self, seconds: float, ok: bool = True):
+        self.counts[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+        self.recent.append(seconds)
+        self.calls += 1
+        if not ok:
+            self.errors += 1
+
+    def snapshot(self):
+        lat = sorted(self.recent)
+        labels = [f"<={b:g}s" for b in self.BOUNDS] + [f">{self.BOUNDS[-1]:g}s"]
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "p50_sec": round(percentile(lat, 50), 3),
+            "p95_sec": round(percentile(lat, 95), 3),
+            "p99_sec": round(percentile(lat, 99), 3),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
 class StockAgentService:
-    def __init__(self, mode="real"):
+    def __init__(self, mode="real", transport: str = None, use_cache: bool = True):
         self.endpoint = os.getenv("AZURE_AI_ENDPOINT")
         self.api_key = os.getenv("AZURE_AI_API_KEY") 
         self.mode = mode
+        self.transport = transport or os.getenv("AGENT_LLM_TRANSPORT", "stream")
+        if self.transport not in TRANSPORTS:
+            print(f"⚠️ 알 수 없는 호출 경로 '{self.transport}' -> stream 사용")
+            self.transport = "stream"
+        self.latency = {t: LatencyHistogram() for t in TRANSPORTS}
+        self.retrieves = 0          # poll 경로에서 runs.retrieve 를 부른 횟수
+        self.async_client = None
+        self.cache = default_cache() if use_cache else None
         
         if mode == "virtual":
             self.agent_id = os.getenv("VIRTUAL_AGENT_ID")
@@ -21,6 +82,7 @@ class StockAgentService:
             self.agent_id = os.getenv("REAL_AGENT_ID")
             self.model_name = "gpt-4o"
             print(f"📡 실제 뉴스 분석 모드 (4o) 활성화")
+        self.chat_deployment = os.getenv("AZURE_CHAT_DEPLOYMENT", self.model_name)
 
         if not self.endpoint or not self.api_key:
             print("❌ 오류: .env 설정이 부족합니다.")
@@ -33,6 +95,11 @@ class StockAgentService:
                 api_key=self.api_key,
                 api_version="2024-05-01-preview"
             )
+            self.async_client = AsyncAzureOpenAI(
+                azure_endpoint=self.endpoint,
+                api_key=self.api_key,
+                api_version="2024-05-01-preview"
+            )
             
             # 에이전트 유효성 검사 및 자동 생성
             self._ensure_agent_exists()
@@ -40,6 +107,7 @@ class StockAgentService:
         except Exception as e:
             print(f"❌ 클라이언트 초기화 실패: {e}")
             self.client = None
+            self.async_client = None
 
     def _ensure_agent_exists(self):
         """에이전트 ID가 유효한지 확인하고, 없으면 새로 만듭니다."""
@@ -54,10 +122,9 @@ class StockAgentService:
             
             try:
                 # 2. 없으면 새로 만듭니다.
-                instructions = "당신은 주식 뉴스 분석 및 생성 전문가입니다. 항상 JSON 형식으로 응답합니다."
                 new_agent = self.client.beta.assistants.create(
                     name=f"StockAgent-{self.mode}",
-                    instructions=instructions,
+                    instructions=AGENT_INSTRUCTIONS,
                     model=self.model_name 
                 )
                 # 3. 새로 만든 ID를 현재 실행 메모리에 적용합니다.
@@ -67,48 +134,140 @@ class StockAgentService:
             except Exception as e:
                 print(f"❌ 에이전트 생성 실패: {e}")
 
-    def _call_llm(self, prompt: str) -> str:
-        if not self.client: return ""
+    # ------------------------------------------------------------------
+    # 요청/응답 공통 처리
+    # ------------------------------------------------------------------
+    def _run_args(self, prompt: str) -> dict:
+        # 스레드 생성 + 메시지 추가 + 런 시작을 한 번의 요청으로
+        return {
+            "assistant_id": self.agent_id,
+            "thread": {"messages": [{"role": "user", "content": prompt}]},
+        }
 
-        try:
-            thread = self.client.beta.threads.create()
-            self.client.beta.threads.messages.create(
-                thread_id=thread.id,
-                role="user",
-                content=prompt
-            )
+    def _chat_args(self, prompt: str) -> dict:
+        return {
+            "model": self.chat_deployment,
+            "messages": [
+                {"role": "system", "content": AGENT_INSTRUCTIONS},
+                {"role": "user", "content": prompt},
+            ],
+        }
 
-            run = self.client.beta.threads.runs.create(
-                thread_id=thread.id,
-                assistant_id=self.agent_id
-            )
+    @staticmethod
+    def _message_text(message) -> str:
+        if message.role == "assistant" and message.content:
+            return message.content[0].text.value
+        return ""
 
-            # 대기 루프
-            while run.status in ['queued', 'in_progress', 'cancelling']:
-                time.sleep(1)
-                run = self.client.beta.threads.runs.retrieve(
-                    thread_id=thread.id,
-                    run_id=run.id
-                )
+    def _run_failed(self, run):
+        print(f"⚠️ 에이전트 응답 실패 상태: {run.status}")
+        if getattr(run, 'last_error', None):
+            print(f"   -> 원인: {run.last_error}")
 
-            if run.status == 'completed':
-                messages = self.client.beta.threads.messages.list(thread_id=thread.id)
-                for msg in messages.data:
-                    if msg.role == "assistant":
-                        if msg.content:
-                            return msg.content[0].text.value
-            else:
-                print(f"⚠️ 에이전트 응답 실패 상태: {run.status}")
-                if hasattr(run, 'last_error') and run.last_error:
-                    print(f"   -> 원인: {run.last_error}")
-                return ""
+    def _poll_result(self, messages, run) -> str:
+        if run.status != 'completed':
+            self._run_failed(run)
             return ""
+        for msg in messages.data:
+            text = self._message_text(msg)
+            if text:
+                return text
+        return ""
+
+    def _event_result(self, event):
+        """스트림 이벤트 하나를 보고 (끝났는지, 응답 텍스트)를 돌려줍니다."""
+        if event.event == "thread.message.completed":
+            text = self._message_text(event.data)
+            return bool(text), text
+        if event.event in ("thread.run.failed", "thread.run.cancelled", "thread.run.expired", "thread.run.incomplete"):
+            self._run_failed(event.data)
+            return True, ""
+        if event.event == "error":
+            print(f"⚠️ 에이전트 스트림 오류: {event.data}")
+            return True, ""
+        return False, ""
+
+    def _next_delay(self, delay: float) -> float:
+        self.retrieves += 1
+        return min(POLL_MAX, delay * POLL_FACTOR)
+
+    def latency_snapshot(self):
+        return {
+            "transport": self.transport,
+            "retrieves": self.retrieves,
+            **{t: h.snapshot() for t, h in self.latency.items() if h.calls},
+        }
+
+    # ------------------------------------------------------------------
+    # 동기 호출 (기존 스크립트용)
+    # ------------------------------------------------------------------
+    def _call_llm(self, prompt: str, transport: str = None) -> str:
+        if not self.client: return ""
 
+        transport = transport or self.transport
+        started = time.perf_counter()
+        text = ""
+        try:
+            if transport == "chat":
+                completion = self.client.chat.completions.create(**self._chat_args(prompt))
+                text = completion.choices[0].message.content or ""
+            elif transport == "stream":
+                with self.client.beta.threads.create_and_run(**self._run_args(prompt), stream=True) as stream:
+                    for event in stream:
+                        finished, text = self._event_result(event)
+                        if finished:
+                            break
+            else:
+                run = self.client.beta.threads.create_and_run(**self._run_args(prompt))
+                delay = POLL_START
+                while run.status in PENDING_STATUSES:
+                    time.sleep(delay)
+                    delay = self._next_delay(delay)
+                    run = self.client.beta.threads.runs.retrieve(thread_id=run.thread_id, run_id=run.id)
+                messages = self.client.beta.threads.messages.list(thread_id=run.thread_id, order="desc", limit=1) \
+                    if run.status == 'completed' else None
+                text = self._poll_result(messages, run)
         except Exception as e:
             print(f"❌ Azure Agent 호출 중 오류 발생: {e}")
-            return ""
+        self.latency[transport].observe(time.perf_counter() - started, ok=bool(text))
+        return text
 
-    def analyze_stock_news(self, company_name: str, mode="real", count=2, company_desc: str = ""):
+    # ------------------------------------------------------------------
+    # 비동기 호출 (이벤트 루프를 막지 않음)
+    # ------------------------------------------------------------------
+    async def _acall_llm(self, prompt: str, transport: str = None) -> str:
+        if not self.async_client: return ""
+
+        transport = transport or self.transport
+        client = self.async_client
+        started = time.perf_counter()
+        text = ""
+        try:
+            if transport == "chat":
+                completion = await client.chat.completions.create(**self._chat_args(prompt))
+                text = completion.choices[0].message.content or ""
+            elif transport == "stream":
+                async with await client.beta.threads.create_and_run(**self._run_args(prompt), stream=True) as stream:
+                    async for event in stream:
+                        finished, text = self._event_result(event)
+                        if finished:
+                            break
+            else:
+                run = await client.beta.threads.create_and_run(**self._run_args(prompt))
+                delay = POLL_START
+                while run.status in PENDING_STATUSES:
+                    await asyncio.sleep(delay)
+                    delay = self._next_delay(delay)
+                    run = await client.beta.threads.runs.retrieve(thread_id=run.thread_id, run_id=run.id)
+                messages = await client.beta.threads.messages.list(thread_id=run.thread_id, order="desc", limit=1) \
+                    if run.status == 'completed' else None
+                text = self._poll_result(messages, run)
+        except Exception as e:
+            print(f"❌ Azure Agent 호출 중 오류 발생: {e}")
+        self.latency[transport].observe(time.perf_counter() - started, ok=bool(text))
+        return text
+
+    def _news_prompt(self, company_name: str, mode="real", count=2, company_desc: str = "") -> str:
         desc_instruction = f"- 이 회사의 핵심 사업 모델은 '{company_desc}'입니다. 이와 관련된 전문 용어, 제품, 기술 동향을 반드시 기사에 포함하세요." if company_desc else ""
 
         if mode == "virtual":
@@ -153,9 +312,10 @@ class StockAgentService:
         else: 
             system_prompt = f"'{company_name}' 뉴스 {count}개를 분석하여 위 JSON 포맷으로 응답하세요."
 
-        #print(f"🤖 {company_name} 뉴스 생성 요청 중...")
-        response_text = self._call_llm(system_prompt)
+        return system_prompt
 
+    @staticmethod
+    def _parse_news(response_text: str):
         if not response_text:
             return []
 
@@ -166,7 +326,61 @@ class StockAgentService:
             return news_data
         except Exception:
             return []
-        
+
+    # ------------------------------------------------------------------
+    # 응답 캐시 (cache: "reuse" 캐시된 변형 사용 / "fresh" 새로 생성해 변형 추가 / "off")
+    # ------------------------------------------------------------------
+    def _cache_key(self, template: str, inputs: dict, policy: str):
+        if policy not in POLICIES:
+            raise ValueError(f"cache 는 {POLICIES} 중 하나여야 합니다: {policy}")
+        if not self.cache or policy == "off":
+            return None
+        return LLMCache.key(self.model_name, template, inputs)
+
+    def _cache_lookup(self, key, policy: str):
+        if key and policy == "reuse":
+            return self.cache.get(key)
+        return None
+
+    def _remember(self, key, response_text: str):
+        news = self._parse_news(response_text)
+        if key and news:    # 파싱되는 응답만 저장 (빈 응답/깨진 JSON 은 다음에 다시 호출)
+            self.cache.put(key, response_text)
+        return news
+
+    def _news_key(self, company_name, mode, count, company_desc, policy):
+        inputs = {"company": company_name, "mode": mode, "count": count, "desc": company_desc}
+        return self._cache_key(f"news:v{NEWS_PROMPT_VERSION}", inputs, policy)
+
+    def cache_snapshot(self):
+        return self.cache.snapshot() if self.cache else None
+
+    def analyze_stock_news(self, company_name: str, mode="real", count=2, company_desc: str = "", cache: str = "reuse"):
+        #print(f"🤖 {company_name} 뉴스 생성 요청 중...")
+        key = self._news_key(company_name, mode, count, company_desc, cache)
+        cached = self._cache_lookup(key, cache)
+        if cached is not None:
+            return self._parse_news(cached)
+        return self._remember(key, self._call_llm(self._news_prompt(company_name, mode, count, company_desc)))
+
+    async def analyze_stock_news_async(self, company_name: str, mode="real", count=2, company_desc: str = "", cache: str = "reuse"):
+        key = self._news_key(company_name, mode, count, company_desc, cache)
+        cached = self._cache_lookup(key, cache)
+        if cached is not None:
+            return self._parse_news(cached)
+        return self._remember(key, await self._acall_llm(self._news_prompt(company_name, mode, count, company_desc)))
+
+    async def generate_news_async(self, prompt: str, cache: str = "reuse"):
+        """
+        완성된 프롬프트를 그대로 보내고 JSON 기사 목록으로 받습니다. (실제 기사 패러디 변환 등)
+        프롬프트 문자열 자체가 입력이자 템플릿이라 캐시 키도 프롬프트 전체로 만듭니다.
+        """
+        key = self._cache_key("prompt", {"prompt": prompt}, cache)
+        cached = self._cache_lookup(key, cache)
+        if cached is not None:
+            return self._parse_news(cached)
+        return self._remember(key, await self._acall_llm(prompt))
+
 
 if __name__ == "__main__":
     from dotenv import load_dotenv
@@ -36,6 +36,48 @@ def get_agent_persona(agent_name):
         return "Aggressive Speculator (공격적 투기꾼)", \
                "모멘텀과 추세를 추종합니다. 오르는 말에 올라타는 것을 즐기며, 하이 리스크 하이 리턴을 추구합니다."
 
+# LLM 응답이 틱 마감 안에 오지 않을 때 쓰는 결정론적 페르소나 규칙
+def persona_rule_decision(agent_name, agent_state: AgentState, current_price, cash, portfolio_qty=0, market_sentiment=None):
+    agent_type, _ = get_agent_persona(agent_name)
+    trend = market_sentiment or ""
+    is_up = "급등" in trend or "상승" in trend
+    is_down = "급락" in trend or "하락" in trend
+
+    action = "HOLD"
+    if agent_type.startswith("Value"):
+        # 싸지면 줍고, 과열되면 덜어냄
+        if is_down: action = "BUY"
+        elif "급등" in trend: action = "SELL"
+    elif agent_type.startswith("Institutional"):
+        # 급락 때만 리스크 관리 매도
+        if "급락" in trend: action = "SELL"
+    elif agent_type.startswith("Contrarian"):
+        if is_up: action = "SELL"
+        elif is_down: action = "BUY"
+    else:
+        # 공격적 투기꾼: 추세 추종
+        if is_up: action = "BUY"
+        elif is_down: action = "SELL"
+
+    price = int(current_price)
+    qty = 0
+    if action == "BUY" and price > 0:
+        ratio = 0.05 + 0.15 * agent_state.greed_index
+        qty = int((cash * ratio) // price)
+    elif action == "SELL":
+        qty = min(portfolio_qty, max(1, int(portfolio_qty * (0.2 + 0.5 * agent_state.fear_index))))
+
+    if action != "HOLD" and qty <= 0:
+        action, qty = "HOLD", 0
+
+    return {
+        "action": action,
+        "quantity": qty,
+        "price": price,
+        "thought_process": f"[규칙 판단] {agent_type} 성향대로 {trend or '시장 흐름'}에 대응합니다.",
+        "source": "rule"  # LLM 결정이 아님 (결정 캐시에 저장하지 않음)
+    }
+
 # [AgentSociety 논문 핵심] 흐름(Stream)과 상호작용(Interaction)이 추가된 뇌
 async def agent_society_think(
     agent_name, 
@@ -132,7 +174,8 @@ async def agent_society_think(
             print(f"⚠️ [{agent_name}] LLM 응답 없음. 기본값 처리.")
             decision = {
                 "thought_process": "시장이 조용하군요. 상황을 지켜보겠습니다.", 
-                "action": "HOLD", "quantity": 0, "price": int(current_price)
+                "action": "HOLD", "quantity": 0, "price": int(current_price),
+                "source": "error"  # LLM 실패 기본값 (결정 캐시에 저장하지 않음)
             }
         else:
             decision = json.loads(raw_content.strip())
@@ -147,13 +190,15 @@ async def agent_society_think(
             print(f"⚠️ [{agent_name} 검열 경고] 표현이 필터링 되었습니다. 기본 멘트 출력.")
             decision = {
                 "thought_process": "흥미로운 장세네요. 신중하게 접근해야겠습니다.",
-                "action": "HOLD", "quantity": 0, "price": int(current_price)
+                "action": "HOLD", "quantity": 0, "price": int(current_price),
+                "source": "error"
             }
         else:
             print(f"❌ [{agent_name}] 뇌정지 에러: {e}")
             decision = {
                 "thought_process": "생각 중입니다...",
-                "action": "HOLD", "quantity": 0, "price": int(current_price)
+                "action": "HOLD", "quantity": 0, "price": int(current_price),
+                "source": "error"
             }
 
     # --- 🔥 정상 로직(매매 계산 등)은 try-except 밖에서 무조건 실행됩니다! ---
@@ -205,4 +250,4 @@ async def agent_society_think(
 
     except Exception as e:
         print(f"❌ [{agent_name}] 로직 처리 중 최후 에러: {e}")
-        return {"action": "HOLD", "quantity": 0, "price": int(current_price), "thought_process": "에러 복구 관망"}
\ No newline at end of file
+        return {"action": "HOLD", "quantity": 0, "price": int(current_price), "thought_process": "에러 복구 관망", "source": "error"}
\ No newline at end of file
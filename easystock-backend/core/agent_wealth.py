@@ -0,0 +1,56 @@
+import heapq
+import logging
+from datetime import datetime
+from sqlalchemy.orm import Session
+from database import DBAgentWealth
+
+logger = logging.getLogger("GlobalMarket")
+
+# ------------------------------------------------------------------
+# 에이전트 자산 순위 스냅샷
+# - 틱마다 메모리 계좌(AccountStore)와 그 틱의 기준가로 총자산 = 현금 + Σ(수량 × 현재가) 를 한 번 계산합니다.
+#   (DB 조회 없음, 가격은 틱 시작 때 한 번 읽은 dict)
+# - 상위 top_n 명만 agent_wealth 테이블에 통째로 다시 씁니다. 대시보드(dashboard.py)는 이 테이블만 읽으므로
+#   보는 사람이 몇 명이든 에이전트/종목 테이블을 다시 훑지 않습니다.
+# ------------------------------------------------------------------
+
+class WealthSnapshot:
+    def __init__(self, top_n: int = 100, exclude=()):
+        self.top_n = top_n
+        self.exclude = set(exclude)
+        self.rows = []              # 마지막으로 계산한 상위 목록
+        self._table_ready = False
+
+    def compute(self, accounts, prices: dict, sim_time: datetime = None):
+        """accounts: AgentAccount 목록, prices: ticker -> 현재가"""
+        def valued():
+            for acc in accounts:
+                if acc.agent_id in self.exclude:
+                    continue
+                stock = sum(qty * prices.get(ticker, 0) for ticker, qty in acc.positions.items())
+                yield acc.cash + stock, acc.agent_id, acc.cash, stock
+
+        top = heapq.nlargest(self.top_n, valued())
+        self.rows = [
+            {"rank": i + 1, "agent_id": agent_id, "total": total, "cash": cash, "stock": stock, "sim_time": sim_time}
+            for i, (total, agent_id, cash, stock) in enumerate(top)
+        ]
+        return self.rows
+
+    def flush(self, db: Session):
+        """마지막 계산 결과로 agent_wealth 를 한 트랜잭션에 갈아 끼웁니다. (저장한 행 수 반환)"""
+        if not self.rows:
+            return 0
+        try:
+            if not self._table_ready:
+                DBAgentWealth.__table__.create(bind=db.get_bind(), checkfirst=True)
+                self._table_ready = True
+            now = datetime.now()
+            db.query(DBAgentWealth).delete(synchronize_session=False)
+            db.bulk_insert_mappings(DBAgentWealth, [{**row, "updated_at": now} for row in self.rows])
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"🚨 [자산 순위] 저장 실패: {e}")
+            return 0
+        return len(self.rows)
@@ -0,0 +1,141 @@
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import desc
+from sqlalchemy.orm import Session
+from database import DBCandle
+
+logger = logging.getLogger("GlobalMarket")
+
+# ------------------------------------------------------------------
+# 증분 OHLCV 캔들 생성기
+# - 매칭 엔진의 체결을 받아 종목별 1분/5분/1시간/1일 봉을 시뮬레이션 시간 기준으로 갱신합니다.
+# - 바뀐 봉만 모아 두었다가 flush() 때 candles 테이블에 한 번에 씁니다. (새 봉 insert, 진행 중인 봉 update)
+# - 차트 API 는 원본 체결 수천 건 대신 (ticker, interval, bucket_start) 인덱스 범위 조회 한 번으로 봉을 읽습니다.
+# ------------------------------------------------------------------
+
+INTERVALS = {"1m": 60, "5m": 300, "1h": 3600, "1d": 86400}
+
+# 차트 period -> (봉 간격, 보여줄 기간)
+CHART_PERIODS = {
+    "1h": ("1m", timedelta(hours=1)),
+    "1d": ("5m", timedelta(days=1)),
+    "1w": ("1h", timedelta(weeks=1)),
+    "1mo": ("1d", timedelta(days=30)),
+    "1y": ("1d", timedelta(days=365)),
+}
+
+
+def bucket_start(ts: datetime, interval: str) -> datetime:
+    """ts 가 속한 봉의 시작 시각 (하루 안에서 간격 단위로 내림)"""
+    seconds = INTERVALS[interval]
+    midnight = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    offset = int((ts - midnight).total_seconds()) // seconds * seconds
+    return midnight + timedelta(seconds=offset)
+
+
+class CandleBuilder:
+    def __init__(self, intervals=tuple(INTERVALS), max_retries: int = 5):
+        self.intervals = intervals
+        self.max_retries = max_retries  # 저장이 연속으로 이만큼 실패하면 쌓인 봉을 버림
+        self.failures = 0
+        self.current = {}   # (ticker, interval) -> 진행 중인 봉 dict
+        self.dirty = {}     # (ticker, interval, bucket_start) -> 봉 dict (아직 DB에 안 쓴 것)
+
+    def record(self, ticker, price, qty, ts: datetime = None):
+        ts = ts or datetime.now()
+        for interval in self.intervals:
+            start = bucket_start(ts, interval)
+            key = (ticker, interval)
+            bar = self.current.get(key)
+            if bar is None or bar["bucket_start"] != start:
+                if bar is not None and start < bar["bucket_start"]:
+                    continue  # 늦게 도착한 과거 체결은 이미 넘어간 봉을 건드리지 않습니다.
+                bar = self.current[key] = {
+                    "ticker": ticker, "interval": interval, "bucket_start": start,
+                    "open": price, "high": price, "low": price, "close": price,
+                    "volume": 0, "trades": 0,
+                }
+            else:
+                bar["high"] = max(bar["high"], price)
+                bar["low"] = min(bar["low"], price)
+                bar["close"] = price
+            bar["volume"] += qty
+            bar["trades"] += 1
+            self.dirty[(ticker, interval, start)] = bar
+
+    def warm(self, db: Session, tickers):
+        """시작할 때 종목/간격별 마지막 봉을 읽어 와서, 같은 구간이면 이어서 갱신합니다."""
+        for ticker in tickers:
+            for interval in self.intervals:
+                row = db.query(DBCandle).filter(DBCandle.ticker == ticker, DBCandle.interval == interval) \
+                        .order_by(desc(DBCandle.bucket_start)).first()
+                if row:
+                    self.current[(ticker, interval)] = {
+                        "id": row.id, "ticker": ticker, "interval": interval, "bucket_start": row.bucket_start,
+                        "open": row.open, "high": row.high, "low": row.low, "close": row.close,
+                        "volume": row.volume or 0, "trades": row.trades or 0,
+                    }
+
+    def flush(self, db: Session):
+        """바뀐 봉만 한 트랜잭션으로 저장합니다. (저장한 봉 수 반환)"""
+        if not self.dirty:
+            return 0
+
+        bars, self.dirty = list(self.dirty.values()), {}
+        new_bars = [b for b in bars if "id" not in b]
+        old_bars = [b for b in bars if "id" in b]
+        try:
+            if new_bars:
+                # return_defaults 로 새 id 를 받아 두면 다음 flush 부터는 update 로 갱신합니다.
+                db.bulk_insert_mappings(DBCandle, new_bars, return_defaults=True)
+            if old_bars:
+                db.bulk_update_mappings(DBCandle, old_bars)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            for b in new_bars:
+                b.pop("id", None)   # 롤백된 insert 에서 받은 id 는 무효
+            self.failures += 1
+            if self.failures >= self.max_retries:
+                # 계속 실패하면 다시 쌓지 않고 버립니다. (진행 중인 봉은 메모리에 남아 다음 체결 때 다시 저장됨)
+                logger.error(f"🚨 [캔들] 저장 {self.failures}회 연속 실패, 봉 {len(bars)}개 버림: {e}")
+                self.failures = 0
+                return 0
+            for b in bars:
+                self.dirty.setdefault((b["ticker"], b["interval"], b["bucket_start"]), b)
+            logger.error(f"🚨 [캔들] 저장 실패 ({self.failures}/{self.max_retries}): {e}")
+            return 0
+        self.failures = 0
+        return len(bars)
+
+    def live_bar(self, ticker, interval):
+        return self.current.get((ticker, interval))
+
+
+def to_chart_row(bar):
+    return {
+        "time": bar["bucket_start"].isoformat(),
+        "open": bar["open"], "high": bar["high"], "low": bar["low"], "close": bar["close"],
+        "volume": bar["volume"],
+    }
+
+
+def load_chart(db: Session, ticker: str, interval: str, limit: int, live_bar=None):
+    """
+    (ticker, interval) 인덱스를 최신 쪽부터 limit 개만 훑어서 오래된 순으로 돌려줍니다.
+    live_bar: 메모리에 있는 진행 중 봉 (아직 flush 전이면 DB 값 대신 이걸 씀)
+    """
+    rows = db.query(DBCandle).filter(DBCandle.ticker == ticker, DBCandle.interval == interval) \
+             .order_by(desc(DBCandle.bucket_start)).limit(limit).all()
+    bars = [{
+        "bucket_start": r.bucket_start, "open": r.open, "high": r.high, "low": r.low,
+        "close": r.close, "volume": r.volume or 0,
+    } for r in reversed(rows)]
+
+    if live_bar:
+        if bars and bars[-1]["bucket_start"] == live_bar["bucket_start"]:
+            bars[-1] = live_bar
+        elif not bars or bars[-1]["bucket_start"] < live_bar["bucket_start"]:
+            bars.append(live_bar)
+            bars = bars[-limit:]
+    return [to_chart_row(b) for b in bars]
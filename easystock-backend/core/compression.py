@@ -0,0 +1,41 @@
+import gzip
+import json
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None   # pip install brotli 하면 br 도 씁니다.
+
+# ------------------------------------------------------------------
+# 목록 응답 압축
+# - 뉴스 목록처럼 한글 텍스트가 많은 JSON 은 gzip 으로 보통 1/4 이하로 줄어듭니다.
+# - 앱 전체 미들웨어 대신 목록 API 에서만 골라 씁니다. (SSE/WebSocket 스트림, ETag 를 쓰는 호가창은 그대로)
+# - 클라이언트 Accept-Encoding 에 br 이 있고 brotli 모듈이 있으면 br, 아니면 gzip, 둘 다 없으면 원문.
+# ------------------------------------------------------------------
+
+MIN_SIZE = 1024         # 이보다 작은 응답은 압축 이득이 없어서 그대로 보냅니다.
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def _accepts(request: Request, coding: str):
+    header = request.headers.get("accept-encoding", "")
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() == coding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+def compressed_json(request: Request, payload, headers: dict = None) -> Response:
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+    headers = {"Vary": "Accept-Encoding", **(headers or {})}
+    if len(body) >= MIN_SIZE:
+        if brotli is not None and _accepts(request, "br"):
+            body = brotli.compress(body, quality=BROTLI_QUALITY)
+            headers["Content-Encoding"] = "br"
+        elif _accepts(request, "gzip"):
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+            headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
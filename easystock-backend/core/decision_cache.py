@@ -0,0 +1,121 @@
+import math
+import random
+import zlib
+from collections import OrderedDict
+
+# ------------------------------------------------------------------
+# 에이전트 의사결정 캐시 (LRU + TTL)
+# - 같은 성향, 같은 종목, 같은 추세, 같은 최신 뉴스, 비슷한 가격/보유량/현금이면
+#   LLM 이 내리는 결정도 거의 같으므로, 양자화한 상태를 키로 결정을 재사용합니다.
+# - 모두가 똑같이 움직이지 않도록 에이전트별로 만료 시점과 수량/가격에 흔들림(jitter)을 줍니다.
+# ------------------------------------------------------------------
+
+TREND_BUCKETS = [("급등", 2), ("급락", -2), ("상승", 1), ("하락", -1), ("보합", 0)]
+
+def trend_bucket(trend_info):
+    for word, bucket in TREND_BUCKETS:
+        if trend_info and word in trend_info:
+            return bucket
+    return None  # 정보 없음
+
+
+def log_bucket(value, base):
+    """0 이하는 0, 그 외에는 로그 구간 번호 (값이 base 배 커질 때마다 한 칸)"""
+    if not value or value <= 0:
+        return 0
+    return 1 + int(math.log(value) / math.log(base))
+
+
+class DecisionCache:
+    def __init__(self, max_entries: int = 5000, ttl: float = 600.0, ttl_jitter: float = 0.3,
+                 qty_jitter: float = 0.2, price_jitter: float = 0.003):
+        self.entries = OrderedDict()   # key -> (저장 시각, 결정 dict)
+        self.max_entries = max_entries
+        self.ttl = ttl                 # 시간 단위는 호출하는 쪽의 now 와 같음 (시뮬레이션 초)
+        self.ttl_jitter = ttl_jitter   # 에이전트별로 최대 30% 일찍 만료
+        self.qty_jitter = qty_jitter
+        self.price_jitter = price_jitter
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+    @staticmethod
+    def make_key(persona, ticker, trend_info, news_id, price, position, cash):
+        return (
+            persona,
+            ticker,
+            trend_bucket(trend_info),
+            news_id,
+            log_bucket(price, 1.005),   # 가격은 0.5% 구간
+            log_bucket(position, 2),    # 보유량은 2배 구간
+            log_bucket(cash, 2),        # 현금도 2배 구간
+        )
+
+    @staticmethod
+    def _agent_seed(agent_name):
+        return zlib.crc32(str(agent_name).encode())
+
+    def get(self, key, agent_name, now, current_price, cash, portfolio_qty):
+        item = self.entries.get(key)
+        if item is None:
+            self.stats["misses"] += 1
+            return None
+
+        stored_at, decision = item
+        # 에이전트마다 다른 시점에 만료되게 해서 동시에 몰려가지 않도록 합니다.
+        agent_ttl = self.ttl * (1 - self.ttl_jitter * (self._agent_seed(agent_name) % 1000) / 1000)
+        if now - stored_at > agent_ttl:
+            self.stats["expired"] += 1
+            self.stats["misses"] += 1
+            if now - stored_at > self.ttl:
+                del self.entries[key]
+            return None
+
+        self.entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return self._adapt(decision, agent_name, now, current_price, cash, portfolio_qty)
+
+    def put(self, key, decision, now, current_price):
+        d = dict(decision)
+        # 가격은 절대값이 아니라 '현재가 대비 비율'로 저장해서 구간 안의 다른 가격에도 맞게 씁니다.
+        try:
+            d["price_ratio"] = float(d.get("price", current_price)) / current_price if current_price else 1.0
+        except (TypeError, ValueError):
+            d["price_ratio"] = 1.0
+        self.entries[key] = (now, d)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _adapt(self, decision, agent_name, now, current_price, cash, portfolio_qty):
+        """공유된 결정을 이 에이전트의 지갑 사정에 맞게 고치고 흔들림을 줍니다."""
+        rng = random.Random(self._agent_seed(agent_name) ^ int(now))
+        d = dict(decision)
+        action = str(d.get("action", "HOLD")).upper()
+
+        try:
+            qty = int(float(d.get("quantity", 0)))
+        except (TypeError, ValueError):
+            qty = 0
+        qty = int(qty * (1 + rng.uniform(-self.qty_jitter, self.qty_jitter)))
+
+        ratio = d.pop("price_ratio", 1.0)
+        price = int(current_price * ratio * (1 + rng.uniform(-self.price_jitter, self.price_jitter)))
+        d["price"] = price
+
+        if action == "BUY":
+            qty = min(qty, int(cash // price)) if price > 0 else 0
+        elif action == "SELL":
+            qty = min(qty, portfolio_qty)
+
+        if action in ("BUY", "SELL") and qty <= 0:
+            d["action"], qty = "HOLD", 0
+        d["quantity"] = qty
+        return d
+
+    def snapshot(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "size": len(self.entries),
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,174 @@
+import bisect
+from collections import defaultdict
+import numpy as np
+
+# ------------------------------------------------------------------
+# 인메모리 자산 랭킹 (Leaderboard)
+# - 유저별 총자산 = 현금 + Σ(보유 수량 × 현재가) 를 메모리에 들고 증분으로 고칩니다.
+#   · 가격이 바뀌면 그 종목 보유자만 (수량 × 가격 변화분) 만큼 더합니다.
+#   · 잔고/보유 주식이 바뀐 유저는 그 유저 값만 다시 계산합니다.
+# - −총자산(실수)과 user_id 를 같은 순서의 리스트 두 개로 들고 있어서 상위 K명은 O(K), 특정 유저 순위는 이분 탐색 O(log n).
+#   (튜플 리스트 정렬보다 실수 배열 정렬이 훨씬 빨라서 키를 나눠 둡니다. 총자산이 같으면 user_id 오름차순)
+# - 바뀐 유저는 모아 두었다가 조회할 때 자리를 고칩니다. 많이 바뀌었으면(가격 변동 등) numpy 로 통째로 다시 정렬하는 쪽이
+#   한 명씩 빼고 넣는 것보다 빠르므로 rebuild_ratio 를 넘으면 재정렬합니다.
+# - DB를 전혀 모르는 순수 자료구조입니다. (DB 연동은 services/leaderboard.py)
+# ------------------------------------------------------------------
+
+class UserEntry:
+    __slots__ = ("username", "level", "exp", "cash", "holdings", "stock_value", "invested", "key")
+
+    def __init__(self, username, level=1, exp=0, cash=0):
+        self.username = username
+        self.level = level
+        self.exp = exp
+        self.cash = cash
+        self.holdings = {}        # 종목 -> (수량, 평단가)
+        self.stock_value = 0.0    # Σ 수량 × 현재가
+        self.invested = 0.0       # Σ 수량 × 평단가
+        self.key = None           # 정렬 리스트에 들어가 있는 −총자산 (아직 없으면 None)
+
+    @property
+    def total(self):
+        return self.cash + self.stock_value
+
+    @property
+    def profit_rate(self):
+        """보유 주식 평가 수익률 (투자 원금 대비, %)"""
+        if self.invested <= 0:
+            return 0.0
+        return (self.stock_value - self.invested) / self.invested * 100
+
+
+class Leaderboard:
+    def __init__(self, rebuild_ratio: float = 0.05):
+        self.users = {}                    # user_id -> UserEntry
+        self.holders = defaultdict(dict)   # 종목 -> {user_id: 수량}
+        self.prices = {}                   # 종목 -> 현재가
+        self.rebuild_ratio = rebuild_ratio
+        self._keys = []                    # −총자산 오름차순 = 총자산 내림차순
+        self._ids = []                     # _keys 와 같은 자리의 user_id
+        self._dirty = set()                # 값은 바뀌었지만 아직 자리를 못 고친 유저
+        self.stats = {"rebuilds": 0, "moves": 0}
+
+    def __len__(self):
+        return len(self.users)
+
+    # --------------------------------------------------------------
+    # 갱신
+    # --------------------------------------------------------------
+    def upsert_user(self, user_id, username, cash, level=1, exp=0, holdings=None):
+        """유저 한 명의 현금/보유 주식을 통째로 바꿉니다. holdings: {종목: (수량, 평단가)}"""
+        entry = self.users.get(user_id)
+        if entry is None:
+            entry = self.users[user_id] = UserEntry(username, level, exp, cash)
+        else:
+            for name in entry.holdings:
+                self.holders[name].pop(user_id, None)
+            entry.username, entry.level, entry.exp, entry.cash = username, level, exp, cash
+
+        entry.holdings = {}
+        entry.stock_value = 0.0
+        entry.invested = 0.0
+        for name, (qty, avg_price) in (holdings or {}).items():
+            if qty <= 0:
+                continue
+            entry.holdings[name] = (qty, avg_price or 0)
+            self.holders[name][user_id] = qty
+            entry.stock_value += qty * self.prices.get(name, 0)
+            entry.invested += qty * (avg_price or 0)
+        self._dirty.add(user_id)
+
+    def remove_user(self, user_id):
+        entry = self.users.pop(user_id, None)
+        if entry is None:
+            return
+        for name in entry.holdings:
+            self.holders[name].pop(user_id, None)
+        self._remove(user_id, entry.key)
+        self._dirty.discard(user_id)
+
+    def set_price(self, name, price):
+        """가격 변화분만큼 그 종목 보유자의 평가액을 고칩니다."""
+        old = self.prices.get(name, 0)
+        self.prices[name] = price
+        diff = price - old
+        if not diff:
+            return
+        users = self.users
+        for user_id, qty in self.holders.get(name, {}).items():
+            users[user_id].stock_value += qty * diff
+        self._dirty.update(self.holders.get(name, ()))
+
+    # --------------------------------------------------------------
+    # 정렬 유지
+    # --------------------------------------------------------------
+    def _index(self, user_id, key):
+        """정렬 리스트에서 (key, user_id) 자리 - 없으면 None"""
+        if key is None:
+            return None
+        lo = bisect.bisect_left(self._keys, key)
+        hi = bisect.bisect_right(self._keys, key, lo)
+        i = bisect.bisect_left(self._ids, user_id, lo, hi)
+        return i if i < hi and self._ids[i] == user_id else None
+
+    def _remove(self, user_id, key):
+        i = self._index(user_id, key)
+        if i is not None:
+            del self._keys[i]
+            del self._ids[i]
+
+    def _insert(self, user_id, key):
+        lo = bisect.bisect_left(self._keys, key)
+        hi = bisect.bisect_right(self._keys, key, lo)
+        i = bisect.bisect_left(self._ids, user_id, lo, hi)
+        self._keys.insert(i, key)
+        self._ids.insert(i, user_id)
+
+    def _rebuild(self):
+        n = len(self.users)
+        ids = np.fromiter(self.users.keys(), dtype=np.int64, count=n)
+        keys = np.fromiter((-entry.total for entry in self.users.values()), dtype=np.float64, count=n)
+        order = np.lexsort((ids, keys))
+        self._keys = keys[order].tolist()
+        self._ids = ids[order].tolist()
+        for user_id, key in zip(self._ids, self._keys):
+            self.users[user_id].key = key
+        self.stats["rebuilds"] += 1
+
+    def settle(self):
+        """모아 둔 변경분으로 정렬 리스트를 고칩니다. (조회할 때도 자동으로 부릅니다)"""
+        if not self._dirty:
+            return
+        users = self.users
+        if len(self._dirty) > self.rebuild_ratio * len(users):
+            self._rebuild()
+        else:
+            for user_id in self._dirty:
+                entry = users.get(user_id)
+                if entry is None:
+                    continue
+                new_key = -entry.total
+                if new_key == entry.key:
+                    continue
+                self._remove(user_id, entry.key)
+                self._insert(user_id, new_key)
+                entry.key = new_key
+                self.stats["moves"] += 1
+        self._dirty.clear()
+
+    # --------------------------------------------------------------
+    # 조회
+    # --------------------------------------------------------------
+    def rank(self, user_id):
+        """1부터 시작하는 순위 (없는 유저면 None)"""
+        self.settle()
+        entry = self.users.get(user_id)
+        if entry is None:
+            return None
+        return self._index(user_id, entry.key) + 1
+
+    def top(self, k=10, offset=0):
+        """[(순위, user_id, UserEntry), ...]"""
+        self.settle()
+        return [(offset + i + 1, user_id, self.users[user_id])
+                for i, user_id in enumerate(self._ids[offset:offset + k])]
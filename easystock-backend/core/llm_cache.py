@@ -0,0 +1,124 @@
+import os
+import json
+import time
+import random
+import sqlite3
+import hashlib
+import threading
+
+# ------------------------------------------------------------------
+# LLM 응답 캐시 (내용 주소 방식, SQLite 파일 하나)
+# - 키 = sha256(모델, 프롬프트 템플릿 버전, 입력값). 프롬프트를 고치면 템플릿 버전을 올려서 예전 응답을 버립니다.
+# - 한 키에 응답을 max_variants 개까지 쌓아 둡니다. 가상 뉴스처럼 매번 달라도 되는 출력은
+#   캐시된 것 중 하나를 골라 쓰고(reuse), 새 출력이 필요하면 fresh 로 호출해 변형을 하나 더 쌓습니다.
+# - 전체 크기가 max_bytes 를 넘으면 오래 안 쓴 것부터 지웁니다. (90% 까지)
+# 정책: "reuse" 캐시에 있으면 그대로 / "fresh" 항상 새로 호출 후 저장 / "off" 캐시 안 씀
+# ------------------------------------------------------------------
+POLICIES = ("reuse", "fresh", "off")
+
+SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS llm_cache (
+        key TEXT NOT NULL,
+        variant INTEGER NOT NULL,
+        value TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        last_used REAL NOT NULL,
+        PRIMARY KEY (key, variant)
+    )
+"""
+LRU_INDEX_SQL = "CREATE INDEX IF NOT EXISTS ix_llm_cache_last_used ON llm_cache(last_used)"
+
+
+class LLMCache:
+    def __init__(self, path: str, max_bytes: int = 64 * 1024 * 1024, max_variants: int = 3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_variants = max_variants
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute(SCHEMA_SQL)
+            self._conn.execute(LRU_INDEX_SQL)
+        self.total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(model: str, template: str, inputs: dict) -> str:
+        raw = json.dumps([model, template, inputs], ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """캐시된 변형 중 하나 (없으면 None)"""
+        with self._lock:
+            rows = self._conn.execute("SELECT variant, value FROM llm_cache WHERE key = ?", (key,)).fetchall()
+            if not rows:
+                self.misses += 1
+                return None
+            variant, value = random.choice(rows)
+            with self._conn:
+                self._conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ? AND variant = ?",
+                                   (time.time(), key, variant))
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: str):
+        if not value:
+            return
+        now = time.time()
+        size = len(value.encode("utf-8")) + len(key)
+        with self._lock, self._conn:
+            rows = self._conn.execute("SELECT variant, size FROM llm_cache WHERE key = ? ORDER BY created_at",
+                                      (key,)).fetchall()
+            if len(rows) >= self.max_variants:
+                # 가장 오래된 변형 자리에 덮어쓰기
+                variant, old_size = rows[0]
+                self.total_bytes -= old_size
+            else:
+                variant = max((r[0] for r in rows), default=-1) + 1
+            self._conn.execute("INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?, ?)",
+                               (key, variant, value, size, now, now))
+            self.total_bytes += size
+            self.stores += 1
+            if self.total_bytes > self.max_bytes:
+                self._evict(int(self.max_bytes * 0.9))
+
+    def _evict(self, target: int):
+        cursor = self._conn.execute("SELECT rowid, size FROM llm_cache ORDER BY last_used")
+        doomed = []
+        for rowid, size in cursor:
+            if self.total_bytes <= target:
+                break
+            doomed.append((rowid,))
+            self.total_bytes -= size
+        self._conn.executemany("DELETE FROM llm_cache WHERE rowid = ?", doomed)
+        self.evictions += len(doomed)
+
+    def snapshot(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "size_kb": round(self.total_bytes / 1024, 1),
+        }
+
+    def close(self):
+        self._conn.close()
+
+
+def default_cache():
+    """LLM_CACHE_PATH (기본: 백엔드 폴더의 llm_cache.db), LLM_CACHE_MAX_MB (기본 64)"""
+    backend_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    path = os.getenv("LLM_CACHE_PATH", os.path.join(backend_root, "llm_cache.db"))
+    try:
+        return LLMCache(path, max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", "64")) * 1024 * 1024))
+    except sqlite3.Error as e:
+        print(f"⚠️ LLM 캐시를 열지 못해 캐시 없이 진행합니다: {e}")
+        return None
@@ -0,0 +1,117 @@
+import asyncio
+import time
+from collections import deque
+
+# ------------------------------------------------------------------
+# LLM 호출 스케줄러 (에이전트 의사결정용)
+# - 동시 호출 수 제한 (Semaphore)
+# - 초당 호출 수 제한 (Token Bucket) -> Azure 429 방지
+# - 호출별 제한 시간 + 틱 마감 시간: 늦으면 기다리지 않고 규칙 기반 결정으로 대체
+# - 틱 단위 지표: 틱 소요 시간, LLM 지연 p50/p95/p99, 타임아웃/대체 횟수
+# ------------------------------------------------------------------
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate            # 초당 채워지는 토큰 수
+        self.capacity = burst       # 최대 누적 토큰
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+class LLMScheduler:
+    def __init__(self, max_concurrency: int = 8, call_timeout: float = 8.0,
+                 rate_per_sec: float = 5.0, burst: int = 10, tick_deadline: float = 10.0):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.bucket = TokenBucket(rate_per_sec, burst)
+        self.call_timeout = call_timeout
+        self.tick_deadline = tick_deadline
+
+        self._tick_start = None
+        self._tick_deadline_at = None
+        self._reset_tick()
+        self.last_tick = {}
+        self.history = deque(maxlen=60)   # 최근 60틱 지표
+
+    def _reset_tick(self):
+        self._latencies = []
+        self._calls = 0
+        self._timeouts = 0
+        self._fallbacks = 0
+
+    def begin_tick(self):
+        self._reset_tick()
+        self._tick_start = time.monotonic()
+        self._tick_deadline_at = self._tick_start + self.tick_deadline
+
+    def _budget(self):
+        """틱 마감까지 남은 시간 (대기열에서 기다리는 시간 포함, 틱 밖이면 None)"""
+        if self._tick_deadline_at is None:
+            return None
+        return self._tick_deadline_at - time.monotonic()
+
+    async def _guarded(self, factory):
+        async with self.semaphore:
+            await self.bucket.acquire()
+            started = time.monotonic()
+            self._calls += 1
+            # 호출 자체는 call_timeout 안에 끝나야 함
+            result = await asyncio.wait_for(factory(), timeout=self.call_timeout)
+            self._latencies.append(time.monotonic() - started)
+            return result
+
+    async def run(self, factory, fallback):
+        """
+        factory: LLM 호출 코루틴을 만드는 함수 (예: lambda: agent_society_think(...))
+        fallback: 마감을 놓쳤을 때 결과를 만들어 줄 함수
+        LLM 자체 에러는 그대로 올려 보내서 호출한 쪽의 기존 예외 처리를 탑니다.
+        """
+        budget = self._budget()
+        if budget is None or budget > 0:
+            try:
+                return await asyncio.wait_for(self._guarded(factory), timeout=budget)
+            except asyncio.TimeoutError:
+                self._timeouts += 1
+        self._fallbacks += 1
+        return fallback()
+
+    def end_tick(self):
+        duration = time.monotonic() - self._tick_start if self._tick_start else 0.0
+        lat = sorted(self._latencies)
+        self.last_tick = {
+            "tick_sec": round(duration, 3),
+            "llm_calls": self._calls,
+            "llm_p50_sec": round(percentile(lat, 50), 3),
+            "llm_p95_sec": round(percentile(lat, 95), 3),
+            "llm_p99_sec": round(percentile(lat, 99), 3),
+            "timeouts": self._timeouts,
+            "fallbacks": self._fallbacks,
+        }
+        self.history.append(self.last_tick)
+        self._tick_start = None
+        self._tick_deadline_at = None
+        return self.last_tick
+
+    def snapshot(self):
+        return {"last_tick": self.last_tick, "history": list(self.history)}
@@ -0,0 +1,113 @@
+import random
+import uuid
+import logging
+from datetime import datetime
+
+logger = logging.getLogger("GlobalMarket")
+
+# ------------------------------------------------------------------
+# 증분 마켓 메이커 (Incremental Quote Management)
+# - 예전: 매 틱마다 종목당 MM 주문 10개를 전부 지우고(리스트 재생성) 10개를 새로 깔았음
+# - 지금: 5호가 x 양방향 호가를 '지속 호가'로 들고 있다가,
+#         기준가가 움직여서 목표 가격이 바뀐 층만 취소/재등록합니다.
+#         체결로 잔량이 처음 수량의 refill_ratio 아래로 줄어든 층도 새 수량으로 다시 깝니다. (유동성 유지)
+# - 호가는 order_id 로 추적하므로 취소/교체가 O(1) 이고, DB는 전혀 조회하지 않습니다.
+# ------------------------------------------------------------------
+
+MM_ID = "MARKET_MAKER"
+
+class MarketMaker:
+    def __init__(self, engine, agent_id: str = MM_ID, levels: int = 5, step_ratio: float = 0.0015,
+                 min_qty: int = 30, max_qty: int = 250, refill_ratio: float = 0.5):
+        self.engine = engine
+        self.agent_id = agent_id
+        self.levels = levels
+        self.step_ratio = step_ratio     # 층 간격 = 기준가의 0.15%
+        self.min_qty = min_qty
+        self.max_qty = max_qty
+        self.refill_ratio = refill_ratio # 잔량이 처음 수량의 이 비율 아래면 다시 채움
+        # ticker -> {"BUY": {price: order_id}, "SELL": {price: order_id}}
+        self.quotes = {}
+        self.last_tick_stats = {"mutations": 0, "baseline": 0, "saved": 0}
+        self.total_saved = 0
+
+    def target_prices(self, ref_price: float):
+        """기준가를 층 간격 격자에 맞춰서 매수/매도 목표 가격을 계산합니다."""
+        spacing = max(1, int(ref_price * self.step_ratio))
+        anchor = int(round(ref_price / spacing)) * spacing
+        bids = {anchor - spacing * step for step in range(1, self.levels + 1)}
+        asks = {anchor + spacing * step for step in range(1, self.levels + 1)}
+        return {"BUY": {p for p in bids if p > 0}, "SELL": asks}
+
+    def _new_quote(self, side, price, sim_time):
+        quantity = random.randint(self.min_qty, self.max_qty)
+        return {
+            "order_id": uuid.uuid4().hex,
+            "agent_id": self.agent_id,
+            "price": price,
+            "quantity": quantity,
+            "side": side,
+            "timestamp": sim_time or datetime.now(),
+            "quote_size": quantity,   # 처음 깐 수량 (호가창은 쓰지 않음, 소진 판단용)
+        }
+
+    def _depleted(self, order):
+        return order["quantity"] < order.get("quote_size", 0) * self.refill_ratio
+
+    def refresh(self, db, ticker: str, ref_price: float, sim_time: datetime = None):
+        """한 종목의 호가를 목표에 맞게 고칩니다. (바뀐 주문 수 반환)"""
+        if not ref_price or ref_price <= 0:
+            return 0
+
+        book = self.engine.get_book(ticker)
+        quotes = self.quotes.setdefault(ticker, {"BUY": {}, "SELL": {}})
+        targets = self.target_prices(ref_price)
+        mutations = 0
+
+        # 1~2. 양쪽 모두 먼저 정리해야 새 매수 호가가 옛 매도 호가와 자전거래하지 않습니다.
+        for side in ("BUY", "SELL"):
+            live = quotes[side]
+            # 다 체결되어 호가창에서 사라진 호가는 장부에서만 지웁니다.
+            for price in [p for p, oid in live.items() if oid not in book.orders]:
+                del live[price]
+            # 목표에서 벗어난 층, 체결로 많이 줄어든 층은 취소 (줄어든 층은 3에서 다시 등록)
+            for price in [p for p, oid in live.items() if p not in targets[side] or self._depleted(book.orders[oid])]:
+                book.cancel(live.pop(price))
+                mutations += 1
+
+        # 3. 비어 있는 목표 층만 새로 등록 (등록 시 교차하면 바로 매칭)
+        for side in ("BUY", "SELL"):
+            live = quotes[side]
+            for price in sorted(targets[side], reverse=(side == "BUY")):
+                if price in live:
+                    continue
+                order = self._new_quote(side, price, sim_time)
+                live[price] = order["order_id"]
+                self.engine.add_resting(db, ticker, order, sim_time)
+                mutations += 1
+
+        return mutations
+
+    def refresh_all(self, db, prices: dict, sim_time: datetime = None):
+        """
+        prices: {ticker: 기준가}
+        예전 방식(종목당 매 틱 취소 10 + 등록 10 = 20회)과 비교해서
+        이번 틱에 아낀 호가창 변경 횟수를 기록합니다.
+        """
+        mutations = 0
+        for ticker, price in prices.items():
+            mutations += self.refresh(db, ticker, price, sim_time)
+
+        baseline = len(prices) * self.levels * 2 * 2  # 층당 취소 1 + 등록 1, 양방향
+        saved = max(0, baseline - mutations)
+        self.total_saved += saved
+        self.last_tick_stats = {"mutations": mutations, "baseline": baseline, "saved": saved}
+        return self.last_tick_stats
+
+    def cancel_all(self):
+        for ticker, sides in self.quotes.items():
+            book = self.engine.get_book(ticker)
+            for live in sides.values():
+                for oid in live.values():
+                    book.cancel(oid)
+                live.clear()
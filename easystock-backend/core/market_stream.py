@@ -0,0 +1,316 @@
+import json
+import time
+import asyncio
+from collections import deque, defaultdict
+
+# ------------------------------------------------------------------
+# 시세 푸시 허브 (WebSocket / SSE 공용)
+# - 클라이언트가 1초마다 시세/호가/차트를 폴링하던 것을, 엔진과 시뮬레이션 루프가 바뀐 것만 밀어 주는 방식으로 바꿉니다.
+# - 종목별 구독: 구독한 종목의 체결(trade), 최우선 호가(quote), 호가 변화(depth), 1분봉(candle),
+#   종목 토론 글(post) 을 받고, 시장 라운지 글(GLOBAL)과 틱 요약(tick)은 모두가 받습니다.
+# - 체결/글은 구독자별 큐에 쌓되 max_events 를 넘으면 오래된 것부터 버립니다. (dropped 로 셉니다)
+# - quote/candle/tick 은 최신 값 하나만 들고 있고, depth 는 아직 못 보낸 변화분에 새 변화분을 덮어써서
+#   합칩니다. 느린 구독자는 중간 프레임을 건너뛰지만, 합친 결과를 적용하면 최신 호가와 정확히 같아집니다.
+# - 프레임 JSON 은 발행할 때 한 번만 만들어서 모든 구독자가 같은 문자열을 나눠 씁니다.
+# ------------------------------------------------------------------
+
+GLOBAL_TICKER = "GLOBAL"
+ALL_TICKERS = "*"
+
+
+def _dumps(frame):
+    return json.dumps(frame, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def post_to_dict(post):
+    """DBDiscussion -> 스트림/커뮤니티 API 공통 형식"""
+    return {
+        "id": post.id, "ticker": post.ticker, "author": post.agent_id, "content": post.content,
+        "sentiment": post.sentiment, "time": post.created_at.strftime("%H:%M") if post.created_at else None,
+    }
+
+
+class DepthFrame:
+    """호가 변화분 {가격: 잔량} (잔량 0 = 사라진 가격대). snapshot 이면 상위 호가 전체."""
+    __slots__ = ("ticker", "version", "snapshot", "bids", "asks", "text")
+
+    def __init__(self, ticker, version, snapshot, bids, asks, text=None):
+        self.ticker = ticker
+        self.version = version
+        self.snapshot = snapshot
+        self.bids = bids
+        self.asks = asks
+        self.text = text          # 여러 구독자가 나눠 쓰는 프레임이면 직렬화 결과를 한 번만 만들어 둠
+
+    def copy(self):
+        return DepthFrame(self.ticker, self.version, self.snapshot, dict(self.bids), dict(self.asks))
+
+    def merge(self, newer):
+        # 못 보낸 변화분 위에 새 변화분을 덮어씀 -> 적용 결과는 중간 프레임을 모두 받은 것과 같음
+        self.version = newer.version
+        for mine, theirs in ((self.bids, newer.bids), (self.asks, newer.asks)):
+            mine.update(theirs)
+            if self.snapshot:
+                for price in [p for p, v in mine.items() if v <= 0]:
+                    del mine[price]
+
+    def to_json(self):
+        if self.text is not None:
+            return self.text
+        return _dumps({"type": "depth", "ticker": self.ticker, "version": self.version, "snapshot": self.snapshot,
+                       "bids": sorted(self.bids.items(), reverse=True), "asks": sorted(self.asks.items())})
+
+    def freeze(self):
+        """여러 구독자가 나눠 쓸 프레임: 직렬화를 미리 한 번 해 두고, 이후 합칠 때는 복사본을 씁니다."""
+        self.text = self.to_json()
+        return self
+
+
+class Subscriber:
+    __slots__ = ("tickers", "events", "latest", "wake", "dropped", "max_events", "closed")
+
+    def __init__(self, tickers, max_events):
+        self.tickers = set(tickers)
+        self.events = deque()      # 직렬화된 체결/글 프레임 (순서 보장, 넘치면 오래된 것부터 버림)
+        self.latest = {}           # (종류, ticker) -> 직렬화된 프레임 (최신 값만) / DepthFrame (변화분 합침)
+        self.wake = asyncio.Event()
+        self.dropped = 0
+        self.max_events = max_events
+        self.closed = False
+
+    def push_event(self, text):
+        if len(self.events) >= self.max_events:
+            self.events.popleft()
+            self.dropped += 1
+        self.events.append(text)
+        self.wake.set()
+
+    def push_latest(self, key, text):
+        self.latest[key] = text
+        self.wake.set()
+
+    def push_depth(self, ticker, frame):
+        key = ("depth", ticker)
+        pending = self.latest.get(key)
+        if pending is None or frame.snapshot:
+            # 보통은 모든 구독자가 같은 프레임(과 직렬화 결과)을 나눠 씁니다.
+            self.latest[key] = frame
+            self.wake.set()
+            return
+        if pending.text is not None:
+            pending = self.latest[key] = pending.copy()   # 합칠 때만 내 몫으로 복사
+        pending.merge(frame)
+
+    def take(self):
+        """보낼 프레임(JSON 문자열)을 모두 꺼냅니다."""
+        out = list(self.events)
+        self.events.clear()
+        for frame in self.latest.values():
+            out.append(frame if isinstance(frame, str) else frame.to_json())
+        self.latest.clear()
+        self.wake.clear()
+        return out
+
+    async def next_frames(self, timeout=None, stop=None):
+        """
+        보낼 게 생길 때까지 기다렸다가 꺼냅니다. (timeout 이 지나면 빈 목록)
+        stop: 연결 종료를 감시하는 태스크 - 먼저 끝나면 기다리지 않고 빈 목록
+        """
+        if not self.events and not self.latest:
+            if stop is None:
+                try:
+                    await asyncio.wait_for(self.wake.wait(), timeout)
+                except asyncio.TimeoutError:
+                    return []
+            else:
+                wake = asyncio.ensure_future(self.wake.wait())
+                try:
+                    await asyncio.wait((wake, stop), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    wake.cancel()
+                if not self.events and not self.latest:
+                    return []
+        return self.take()
+
+
+class MarketStream:
+    def __init__(self, engine, depth: int = 10, interval: float = 0.2, max_events: int = 256):
+        self.engine = engine
+        self.depth = depth
+        self.interval = interval      # 호가 변화를 모아 보내는 주기 (초)
+        self.max_events = max_events
+        engine.stream = self
+
+        self.subscribers = set()
+        self.by_ticker = defaultdict(set)   # ticker -> 구독자 (ALL_TICKERS 포함)
+        self._published = {}                # ticker -> (호가창 version, {"bids": {가격: 잔량}, "asks": {...}})
+        self._quotes = {}                   # ticker -> 마지막으로 보낸 최우선 호가
+        self._task = None
+        self.stats = {"subscribers_peak": 0, "events": 0, "depth_frames": 0, "pump_total_sec": 0.0, "pumps": 0}
+
+    # --------------------------------------------------------------
+    # 구독 관리
+    # --------------------------------------------------------------
+    def subscribe(self, tickers=()):
+        sub = Subscriber((), self.max_events)
+        self.subscribers.add(sub)
+        self.stats["subscribers_peak"] = max(self.stats["subscribers_peak"], len(self.subscribers))
+        self.update(sub, add=tickers)
+        return sub
+
+    def update(self, sub, add=(), remove=()):
+        for ticker in remove:
+            sub.tickers.discard(ticker)
+            self.by_ticker[ticker].discard(sub)
+        for ticker in add:
+            if ticker in sub.tickers:
+                continue
+            sub.tickers.add(ticker)
+            self.by_ticker[ticker].add(sub)
+            if ticker != ALL_TICKERS:
+                self._send_initial(sub, ticker)
+
+    def unsubscribe(self, sub):
+        sub.closed = True
+        self.subscribers.discard(sub)
+        for ticker in sub.tickers:
+            self.by_ticker[ticker].discard(sub)
+
+    def _targets(self, ticker):
+        if ticker == GLOBAL_TICKER:
+            return self.subscribers
+        return self.by_ticker.get(ticker, set()) | self.by_ticker.get(ALL_TICKERS, set())
+
+    def _send_initial(self, sub, ticker):
+        # 새 구독자는 지금까지 발행된 호가 전체를 받고, 이후로는 변화분만 받습니다.
+        version, levels = self._published.get(ticker) or self._publish_levels(ticker)
+        sub.push_depth(ticker, DepthFrame(ticker, version, True, dict(levels["bids"]), dict(levels["asks"])))
+        if ticker in self._quotes:
+            sub.push_latest(("quote", ticker), _dumps(self._quotes[ticker]))
+        bar = self.engine.candles.live_bar(ticker, "1m")
+        if bar:
+            sub.push_latest(("candle", ticker), _dumps(self._candle_frame(ticker, bar)))
+
+    # --------------------------------------------------------------
+    # 발행 (엔진 / 시뮬레이션 루프 / 커뮤니티)
+    # --------------------------------------------------------------
+    def _broadcast_event(self, ticker, frame, targets=None):
+        targets = self._targets(ticker) if targets is None else targets
+        if not targets:
+            return
+        text = _dumps(frame)
+        for sub in targets:
+            sub.push_event(text)
+        self.stats["events"] += 1
+
+    def on_fills(self, ticker, fills, sim_time=None):
+        """MarketEngine._run_match 가 체결 직후 부릅니다."""
+        targets = self._targets(ticker)
+        if not targets:
+            return
+        ts = sim_time.isoformat() if sim_time else None
+        for _, _, price, qty in fills:
+            self._broadcast_event(ticker, {"type": "trade", "ticker": ticker, "price": price, "qty": qty, "time": ts}, targets)
+        bar = self.engine.candles.live_bar(ticker, "1m")
+        if bar:
+            text = _dumps(self._candle_frame(ticker, bar))
+            for sub in targets:
+                sub.push_latest(("candle", ticker), text)
+
+    def publish_post(self, post: dict):
+        """새 토론 글: 종목 글은 그 종목 구독자에게, GLOBAL 글은 모두에게"""
+        self._broadcast_event(post.get("ticker") or GLOBAL_TICKER, {"type": "post", **post})
+
+    def on_tick(self, sim_time, prices: dict):
+        """시뮬레이션 루프가 틱마다 부릅니다. (시계 + 전 종목 현재가 요약, 최신 값만 유지)"""
+        if not self.subscribers:
+            return
+        text = _dumps({"type": "tick", "time": sim_time.isoformat() if sim_time else None, "prices": prices})
+        for sub in self.subscribers:
+            sub.push_latest(("tick", GLOBAL_TICKER), text)
+
+    @staticmethod
+    def _candle_frame(ticker, bar):
+        return {"type": "candle", "ticker": ticker, "interval": bar["interval"], "time": bar["bucket_start"].isoformat(),
+                "open": bar["open"], "high": bar["high"], "low": bar["low"], "close": bar["close"], "volume": bar["volume"]}
+
+    def _publish_levels(self, ticker):
+        book = self.engine.get_book(ticker)
+        snap = book.snapshot(self.depth)
+        state = (snap["version"], {"bids": dict(snap["bids"]), "asks": dict(snap["asks"])})
+        self._published[ticker] = state
+        return state
+
+    def pump_once(self):
+        """구독자가 있는 종목 중 호가창이 바뀐 것만 골라 quote/depth 변화분을 보냅니다."""
+        started = time.perf_counter()
+        if self.by_ticker.get(ALL_TICKERS):
+            tickers = list(self.engine.order_books)
+        else:
+            tickers = [t for t, subs in self.by_ticker.items() if subs and t != ALL_TICKERS]
+        for ticker in tickers:
+            targets = self._targets(ticker)
+            if not targets:
+                continue
+            book = self.engine.order_books.get(ticker)
+            old = self._published.get(ticker)
+            if book is None or (old is not None and old[0] == book.version):
+                continue
+
+            version, levels = self._publish_levels(ticker)
+            delta = {}
+            for side in ("bids", "asks"):
+                before = old[1][side] if old else {}
+                now = levels[side]
+                changed = {p: v for p, v in now.items() if before.get(p) != v}
+                changed.update({p: 0 for p in before if p not in now})
+                delta[side] = changed
+            if delta["bids"] or delta["asks"]:
+                frame = DepthFrame(ticker, version, False, delta["bids"], delta["asks"]).freeze()
+                for sub in targets:
+                    sub.push_depth(ticker, frame)
+                self.stats["depth_frames"] += 1
+
+            bid = book.best("BUY")
+            ask = book.best("SELL")
+            quote = {"type": "quote", "ticker": ticker,
+                     "bid": bid.price if bid else None, "bid_size": bid.volume if bid else 0,
+                     "ask": ask.price if ask else None, "ask_size": ask.volume if ask else 0,
+                     "last": self.engine.last_prices.get(ticker)}
+            if self._quotes.get(ticker) != quote:
+                self._quotes[ticker] = quote
+                text = _dumps(quote)
+                for sub in targets:
+                    sub.push_latest(("quote", ticker), text)
+        self.stats["pumps"] += 1
+        self.stats["pump_total_sec"] += time.perf_counter() - started
+
+    async def _run(self):
+        while True:
+            try:
+                self.pump_once()
+            except Exception as e:
+                print(f"⚠️ [시세 스트림] 호가 발행 실패: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try: await self._task
+            except asyncio.CancelledError: pass
+            self._task = None
+
+    def snapshot(self):
+        pumps = self.stats["pumps"]
+        return {
+            "subscribers": len(self.subscribers),
+            "subscribers_peak": self.stats["subscribers_peak"],
+            "events": self.stats["events"],
+            "depth_frames": self.stats["depth_frames"],
+            "dropped_events": sum(s.dropped for s in self.subscribers),
+            "pump_avg_ms": round(self.stats["pump_total_sec"] / pumps * 1000, 3) if pumps else 0.0,
+        }
@@ -0,0 +1,106 @@
+from datetime import datetime
+from sqlalchemy import func, and_
+from sqlalchemy.orm import Session
+from database import DBTrade
+
+# ------------------------------------------------------------------
+# 종목별 당일 요약 (시가 / 누적 거래량 / 등락률)
+# - 체결이 정산될 때마다 메모리에서 바로 갱신하고, 시뮬레이션 09:00 장 시작 때 초기화합니다.
+# - /api/companies 는 종목마다 쿼리 2번씩 돌던 것을 이 요약 하나로 대신합니다.
+# - 서버가 막 켜졌을 때만 (ticker, timestamp) 인덱스를 타는 묶음 쿼리 한 번으로 다시 계산합니다.
+# ------------------------------------------------------------------
+
+MARKET_OPEN_HOUR = 9
+
+
+def session_start(ts: datetime) -> datetime:
+    return ts.replace(hour=MARKET_OPEN_HOUR, minute=0, second=0, microsecond=0)
+
+
+class TickerSummary:
+    __slots__ = ("day_open", "last_price", "volume", "trades")
+
+    def __init__(self, day_open=None, last_price=None, volume=0, trades=0):
+        self.day_open = day_open
+        self.last_price = last_price
+        self.volume = volume
+        self.trades = trades
+
+    def change_rate(self, current_price=None):
+        price = current_price if current_price is not None else self.last_price
+        if not self.day_open or price is None:
+            return 0.0
+        return (price - self.day_open) / self.day_open * 100
+
+
+class MarketSummary:
+    def __init__(self):
+        self.tickers = {}         # ticker -> TickerSummary
+        self.session = None       # 오늘 장 시작 시각 (시뮬레이션 시간)
+        self.sim_now = None       # 마지막 체결 시각 (시뮬레이션의 '현재 시간')
+        self.warmed = False
+
+    def get(self, ticker) -> TickerSummary:
+        summary = self.tickers.get(ticker)
+        if summary is None:
+            summary = self.tickers[ticker] = TickerSummary()
+        return summary
+
+    def reset_day(self, ts: datetime):
+        """장 시작(09:00) 때 호출: 시가/거래량을 비우고 새 거래일을 시작합니다."""
+        self.session = session_start(ts)
+        for summary in self.tickers.values():
+            summary.day_open = None
+            summary.volume = 0
+            summary.trades = 0
+
+    def record(self, ticker, price, qty, ts: datetime = None):
+        ts = ts or datetime.now()
+        # 루프가 reset_day 를 못 불렀더라도 날짜가 바뀐 체결이 오면 스스로 새 거래일을 엽니다.
+        if self.session is None or session_start(ts) > self.session:
+            self.reset_day(ts)
+        summary = self.get(ticker)
+        if summary.day_open is None:
+            summary.day_open = price
+        summary.last_price = price
+        summary.volume += qty
+        summary.trades += 1
+        if self.sim_now is None or ts > self.sim_now:
+            self.sim_now = ts
+
+    def warm(self, db: Session, tickers, sim_now: datetime):
+        """
+        콜드 스타트 재계산: 오늘 종목별 첫 체결 시각/거래량을 GROUP BY 로 묶고,
+        그 첫 체결 행과 조인해서 시가까지 쿼리 한 번으로 가져옵니다.
+        (ticker IN + timestamp 범위라서 (ticker, timestamp) 인덱스를 종목별 범위로 탑니다)
+        """
+        self.session = session_start(sim_now)
+        self.sim_now = sim_now
+        self.tickers.clear()
+
+        daily = db.query(
+            DBTrade.ticker.label("ticker"),
+            func.min(DBTrade.timestamp).label("first_ts"),
+            func.max(DBTrade.timestamp).label("last_ts"),
+            func.sum(DBTrade.quantity).label("volume"),
+            func.count(DBTrade.id).label("trades"),
+        ).filter(DBTrade.ticker.in_(list(tickers)), DBTrade.timestamp >= self.session).group_by(DBTrade.ticker).subquery()
+
+        rows = db.query(daily.c.ticker, DBTrade.price, daily.c.volume, daily.c.trades, daily.c.last_ts).select_from(daily) \
+                 .join(DBTrade, and_(DBTrade.ticker == daily.c.ticker, DBTrade.timestamp == daily.c.first_ts)) \
+                 .all()
+        for ticker, open_price, volume, trades, last_ts in rows:
+            if ticker in self.tickers:
+                continue  # 같은 시각 첫 체결이 여러 건이면 하나만
+            self.tickers[ticker] = TickerSummary(open_price, None, int(volume or 0), int(trades or 0))
+            if last_ts and last_ts > self.sim_now:
+                self.sim_now = last_ts
+        self.warmed = True
+
+    def to_dict(self, ticker, current_price=None):
+        summary = self.get(ticker)
+        return {
+            "day_open": summary.day_open,
+            "volume": summary.volume,
+            "change_rate": round(summary.change_rate(current_price), 2),
+        }
@@ -76,6 +76,14 @@ def gather_observation_data(db: Session, ticker: str, user_id: str = "USER_01"):
 # -----------------------------------------------------------------------------
 # 2. LLM 뇌 가동 (Cognition & Prompt Engineering)
 # -----------------------------------------------------------------------------
+# LLM 호출이 실패했을 때 돌려주는 기본 조언 (조언 캐시는 이 값이 섞인 결과를 저장하지 않습니다)
+FALLBACK_ADVICE = {
+    "opinion": "HOLD",
+    "core_logic": "일시적인 통신 장애로 분석이 어렵습니다.",
+    "feedback_to_user": "현재 시장 데이터를 불러오는 중입니다. 잠시 후 다시 확인해주세요.",
+    "chat_message": "잠시만요, 제 데이터 터미널에 오류가 생겼네요. 조금 뒤에 다시 뵙겠습니다."
+}
+
 async def ask_mentor(mentor_type: MentorType, obs_data: dict) -> dict:
     """
     특정 멘토 페르소나를 씌워 LLM에게 조언을 생성하도록 요청합니다.
@@ -140,23 +148,23 @@ async def ask_mentor(mentor_type: MentorType, obs_data: dict) -> dict:
     except Exception as e:
         print(f"❌ 멘토 LLM 호출 실패 ({persona.name}): {e}")
         # 실패 시 Fallback(기본값) 반환
-        return {
-            "opinion": "HOLD",
-            "core_logic": "일시적인 통신 장애로 분석이 어렵습니다.",
-            "feedback_to_user": "현재 시장 데이터를 불러오는 중입니다. 잠시 후 다시 확인해주세요.",
-            "chat_message": "잠시만요, 제 데이터 터미널에 오류가 생겼네요. 조금 뒤에 다시 뵙겠습니다."
-        }
+        return dict(FALLBACK_ADVICE)
 
 # -----------------------------------------------------------------------------
 # 3. 통합 실행 함수 (Multi-Agent 동시 호출)
 # -----------------------------------------------------------------------------
-async def generate_all_mentors_advice(db: Session, ticker: str, user_id: str = "USER_01"):
+async def generate_all_mentors_advice(db: Session, ticker: str, user_id: str = "USER_01", user_state: dict = None):
     """
     모든 멘토(가이드, 가치, 공격, 비관)의 조언을 동시에 비동기로 생성합니다.
+    user_state: 여러 유저가 공유할 조언이면 유저 본인 대신 넣을 보유 상태 (보유량/평단가/수익률 구간)
     """
     obs_data = gather_observation_data(db, ticker, user_id)
+    # 읽기는 끝났으니 LLM 응답을 기다리는 동안 DB 커넥션을 풀에 돌려줍니다.
+    db.rollback()
     if not obs_data:
         return {"error": "종목 데이터를 찾을 수 없습니다."}
+    if user_state is not None:
+        obs_data["user_state"] = user_state
 
     print(f"🧠 [{ticker}] 멘토 LLM 분석 시작... (비동기)")
     
@@ -0,0 +1,170 @@
+import heapq
+import bisect
+from collections import deque
+
+# ------------------------------------------------------------------
+# 가격-시간 우선(Price-Time Priority) 호가창
+# - 가격대(PriceLevel)마다 FIFO 대기열을 두고, 가격 인덱스는 힙으로 관리합니다.
+# - 주문 등록 O(log n), 최우선 호가 조회 O(1), 같은 가격이면 먼저 온 주문이 먼저 체결.
+# - DB를 전혀 모르는 순수 자료구조라서 벤치마크/테스트에서 그대로 쓸 수 있습니다.
+# - 가격대별 잔량은 등록/체결/취소 때마다 바로 갱신되고, 정렬된 가격 목록을 같이 들고 있어서
+#   상위 N호가는 정렬 없이 O(N) 으로 꺼냅니다. 바뀔 때마다 version 이 올라갑니다. (스냅샷 캐시용)
+# ------------------------------------------------------------------
+
+class PriceLevel:
+    """한 가격대에 쌓인 주문 대기열"""
+    __slots__ = ("price", "queue", "volume", "count")
+
+    def __init__(self, price):
+        self.price = price
+        self.queue = deque()   # 주문 dict들 (먼저 들어온 순서)
+        self.volume = 0        # 이 가격대의 남은 총 수량
+        self.count = 0         # 살아있는 주문 개수 (취소된 건 제외)
+
+    def front(self):
+        # 취소된 주문(quantity 0)은 대기열 앞에서 지연 삭제합니다.
+        while self.queue and self.queue[0]["quantity"] <= 0:
+            self.queue.popleft()
+        return self.queue[0] if self.queue else None
+
+
+class OrderBook:
+    """한 종목의 매수/매도 호가창"""
+
+    def __init__(self):
+        self.levels = {"BUY": {}, "SELL": {}}   # side -> {price: PriceLevel}
+        self._heaps = {"BUY": [], "SELL": []}   # 매수는 -price, 매도는 price 로 저장
+        self.orders = {}                        # order_id -> 주문 dict (취소용 인덱스)
+        self._prices = {"BUY": [], "SELL": []}  # 살아있는 가격대 (오름차순, 호가 깊이 조회용)
+        self.version = 0                        # 호가창이 바뀔 때마다 +1
+
+    @staticmethod
+    def _key(side, price):
+        return -price if side == "BUY" else price
+
+    def __len__(self):
+        return len(self.orders)
+
+    def add(self, order: dict):
+        """주문 dict(order_id, agent_id, price, quantity, side, timestamp)를 호가창에 올립니다."""
+        side = str(getattr(order["side"], "value", order["side"]))
+        order["side"] = side
+        price = order["price"]
+
+        book_side = self.levels[side]
+        level = book_side.get(price)
+        if level is None:
+            level = book_side[price] = PriceLevel(price)
+            heapq.heappush(self._heaps[side], self._key(side, price))
+            bisect.insort(self._prices[side], price)
+            self._maybe_compact(side)
+
+        level.queue.append(order)
+        level.volume += order["quantity"]
+        level.count += 1
+        self.orders[order["order_id"]] = order
+        self.version += 1
+        return order
+
+    def best(self, side):
+        """최우선 호가 PriceLevel (없으면 None)"""
+        heap = self._heaps[side]
+        book_side = self.levels[side]
+        while heap:
+            price = -heap[0] if side == "BUY" else heap[0]
+            if price in book_side:
+                return book_side[price]
+            heapq.heappop(heap)  # 이미 비어서 사라진 가격대 (지연 삭제)
+        return None
+
+    def best_price(self, side):
+        level = self.best(side)
+        return level.price if level else None
+
+    def cancel(self, order_id):
+        """주문 취소. 대기열에서는 지연 삭제되고 수량/개수는 즉시 반영됩니다."""
+        order = self.orders.pop(order_id, None)
+        if order is None:
+            return None
+        level = self.levels[order["side"]].get(order["price"])
+        if level is not None:
+            level.volume -= order["quantity"]
+            level.count -= 1
+            if level.count <= 0:
+                self._drop_level(order["side"], order["price"])
+        order["quantity"] = 0
+        self.version += 1
+        return order
+
+    def cancel_by_agent(self, agent_id):
+        """특정 에이전트의 주문을 모두 취소합니다. (취소 건수 반환)"""
+        targets = [oid for oid, o in self.orders.items() if o["agent_id"] == agent_id]
+        for oid in targets:
+            self.cancel(oid)
+        return len(targets)
+
+    def match(self):
+        """
+        (최고 매수가) >= (최저 매도가) 인 동안 체결을 만들어 냅니다.
+        반환: [(매수 주문, 매도 주문, 체결가, 체결수량), ...]
+        체결가는 기존 엔진과 같이 '매도자가 부른 가격' 입니다.
+        """
+        fills = []
+        while True:
+            bid = self.best("BUY")
+            ask = self.best("SELL")
+            if bid is None or ask is None or bid.price < ask.price:
+                break
+
+            buy = bid.front()
+            sell = ask.front()
+            qty = min(buy["quantity"], sell["quantity"])
+            fills.append((buy, sell, ask.price, qty))
+
+            self._consume(bid, buy, qty)
+            self._consume(ask, sell, qty)
+        return fills
+
+    def _consume(self, level, order, qty):
+        order["quantity"] -= qty
+        level.volume -= qty
+        self.version += 1
+        if order["quantity"] <= 0:
+            level.queue.popleft()
+            level.count -= 1
+            self.orders.pop(order["order_id"], None)
+            if level.count <= 0:
+                self._drop_level(order["side"], level.price)
+
+    def _drop_level(self, side, price):
+        del self.levels[side][price]
+        prices = self._prices[side]
+        i = bisect.bisect_left(prices, price)
+        if i < len(prices) and prices[i] == price:
+            del prices[i]
+
+    def depth(self, side, n=5):
+        """상위 n개 가격대 [(가격, 잔량), ...] (최우선 호가부터, O(n))"""
+        book_side = self.levels[side]
+        prices = self._prices[side]
+        top = reversed(prices[-n:]) if side == "BUY" else prices[:n]
+        return [(p, book_side[p].volume) for p in top]
+
+    def snapshot(self, n=5):
+        """상위 n호가 스냅샷 (version 이 같으면 내용도 같음)"""
+        return {"version": self.version, "bids": self.depth("BUY", n), "asks": self.depth("SELL", n)}
+
+    def iter_orders(self, side):
+        """우선순위 순서대로 살아있는 주문을 돌려줍니다. (디버깅/조회용, O(n log n))"""
+        book_side = self.levels[side]
+        for price in sorted(book_side, reverse=(side == "BUY")):
+            for order in book_side[price].queue:
+                if order["quantity"] > 0:
+                    yield order
+
+    def _maybe_compact(self, side):
+        # 가격대가 생겼다 사라지기를 반복하면 힙에 죽은 가격이 쌓이므로 가끔 다시 만듭니다.
+        heap = self._heaps[side]
+        if len(heap) > 2 * len(self.levels[side]) + 64:
+            heap[:] = [self._key(side, p) for p in self.levels[side]]
+            heapq.heapify(heap)
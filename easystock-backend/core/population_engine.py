@@ -0,0 +1,200 @@
+import itertools
+from datetime import datetime
+import numpy as np
+
+# ------------------------------------------------------------------
+# 벡터화 에이전트 인구 엔진 (Population Engine)
+# - LLM 왕복 없이, 전체 에이전트의 심리(공포/탐욕/안전 욕구)·현금·보유량을 NumPy 배열로 들고
+#   가격 모멘텀 + 뉴스 영향 + 페르소나로 매수/매도/관망, 수량, 지정가를 한 번에 계산합니다.
+# - 계좌의 '진짜' 값은 AccountStore 에 있으므로, 체결로 바뀐 에이전트만 골라서 배열에 다시 반영합니다.
+# - LLM 에이전트는 매 틱 소수만 뽑아서 그대로 돌리고, 그 에이전트들은 이번 틱 인구 계산에서 뺍니다.
+# ------------------------------------------------------------------
+
+# 페르소나 코드 (agent_society_brain.get_agent_persona 와 같은 구간: 끝 번호 % 10)
+VALUE, INSTITUTIONAL, CONTRARIAN, SPECULATOR = 0, 1, 2, 3
+PERSONA_BY_MOD = np.array([VALUE] * 4 + [INSTITUTIONAL] * 2 + [CONTRARIAN] * 2 + [SPECULATOR] * 2, dtype=np.int8)
+
+# 페르소나별 반응 가중치: (상승 모멘텀, 하락 모멘텀, 뉴스)
+# - 가치: 떨어지면 줍고 오르면 덜어냄, 뉴스(펀더멘탈)는 믿음
+# - 기관: 급락 때만 리스크 관리 매도, 뉴스는 신중하게 반영
+# - 역발상: 대중(모멘텀)과 반대로, 뉴스에도 살짝 반대로
+# - 투기꾼: 추세 추종 + 뉴스에 크게 반응
+PERSONA_WEIGHTS = np.array([
+    [-0.6, -0.6, 0.6],
+    [0.0, 0.6, 0.8],
+    [-1.0, -1.0, -0.3],
+    [1.2, 1.2, 0.8],
+], dtype=np.float64)
+
+MOMENTUM_SCALE = 0.02   # 기준 EMA 대비 2% 벗어나면 '강한' 모멘텀 (신호 1.0)
+
+
+def persona_code(agent_id: str, rng=None):
+    parts = str(agent_id).split("_")
+    if len(parts) > 1 and parts[-1].isdigit():
+        return int(PERSONA_BY_MOD[int(parts[-1]) % 10])
+    # 번호가 없는 에이전트는 get_agent_persona 처럼 무작위 성향
+    rng = rng or np.random.default_rng()
+    return int(PERSONA_BY_MOD[rng.integers(0, 10)])
+
+
+class PopulationEngine:
+    def __init__(self, tickers, activity: float = 0.2, noise: float = 0.25,
+                 ema_alpha: float = 0.1, seed: int = None):
+        self.tickers = list(tickers)
+        self.ticker_index = {t: i for i, t in enumerate(self.tickers)}
+        self.activity = activity      # 한 틱에 판단하는 에이전트 비율
+        self.noise = noise            # 개인차 (같은 상황에서도 모두 같은 방향으로 쏠리지 않게)
+        self.ema_alpha = ema_alpha    # 모멘텀 기준선(EMA) 갱신 속도
+        self.rng = np.random.default_rng(seed)
+        self._order_seq = itertools.count(1)
+
+        self.agent_ids = []
+        self.index = {}               # agent_id -> 배열 행 번호
+        k = len(self.tickers)
+        self.persona = np.zeros(0, dtype=np.int8)
+        self.fear = np.zeros(0)
+        self.greed = np.zeros(0)
+        self.safety = np.zeros(0)
+        self.cash = np.zeros(0)
+        self.positions = np.zeros((0, k), dtype=np.int64)
+        self.ema = None               # 종목별 기준선 가격
+        self.last_stats = {"agents": 0, "decided": 0, "buy": 0, "sell": 0, "hold": 0}
+
+    def __len__(self):
+        return len(self.agent_ids)
+
+    # --------------------------------------------------------------
+    # 계좌 적재/동기화 (AccountStore 의 AgentAccount 또는 같은 속성을 가진 객체)
+    # --------------------------------------------------------------
+    def load_accounts(self, accounts, exclude=()):
+        """계좌 목록 전체로 배열을 새로 만듭니다. (시작할 때 한 번)"""
+        accounts = [a for a in accounts if a.agent_id not in exclude]
+        n = len(accounts)
+        self.agent_ids = [a.agent_id for a in accounts]
+        self.index = {a: i for i, a in enumerate(self.agent_ids)}
+        self.persona = np.array([persona_code(a, self.rng) for a in self.agent_ids], dtype=np.int8)
+        self.fear = np.array([float(a.psychology.get("fear_index", 0.0)) for a in accounts])
+        self.greed = np.array([float(a.psychology.get("greed_index", 0.0)) for a in accounts])
+        self.safety = np.array([float(a.psychology.get("safety_needs", 0.5)) for a in accounts])
+        self.cash = np.zeros(n)
+        self.positions = np.zeros((n, len(self.tickers)), dtype=np.int64)
+        self.sync(accounts)
+
+    def sync(self, accounts):
+        """바뀐 계좌의 현금/보유량만 배열에 다시 옮겨 적습니다. (체결에 참여한 에이전트만 넘기면 O(체결 수))"""
+        for acc in accounts:
+            i = self.index.get(acc.agent_id)
+            if i is None:
+                continue
+            self.cash[i] = acc.cash
+            row = self.positions[i]
+            row[:] = 0
+            for ticker, qty in acc.positions.items():
+                j = self.ticker_index.get(ticker)
+                if j is not None:
+                    row[j] = qty
+
+    # --------------------------------------------------------------
+    # 시장 신호
+    # --------------------------------------------------------------
+    def observe_prices(self, prices):
+        """이번 틱 가격 배열을 받아 EMA 대비 모멘텀(비율)을 돌려주고 기준선을 갱신합니다."""
+        prices = np.asarray(prices, dtype=np.float64)
+        if self.ema is None:
+            self.ema = prices.copy()
+        momentum = np.where(self.ema > 0, prices / np.where(self.ema > 0, self.ema, 1) - 1, 0.0)
+        self.ema += self.ema_alpha * (prices - self.ema)
+        return momentum
+
+    # --------------------------------------------------------------
+    # 한 틱 의사결정 (전부 벡터 연산)
+    # --------------------------------------------------------------
+    def decide(self, prices, momentum, news, exclude_mask=None):
+        """
+        prices/momentum/news: 종목 순서대로의 배열 (news 는 -1 ~ 1 의 뉴스 영향)
+        반환: (행 번호, 종목 번호, 매수 여부, 수량, 지정가) 배열 묶음 - 매수/매도만
+        """
+        n = len(self.agent_ids)
+        if n == 0 or not self.tickers:
+            return (np.zeros(0, dtype=np.int64),) * 2 + (np.zeros(0, dtype=bool),) + (np.zeros(0, dtype=np.int64),) * 2
+
+        rng = self.rng
+        active = rng.random(n) < self.activity
+        if exclude_mask is not None:
+            active &= ~exclude_mask
+        rows = np.flatnonzero(active)
+        cols = rng.integers(0, len(self.tickers), size=rows.size)   # 에이전트마다 종목 하나
+
+        price = np.asarray(prices, dtype=np.float64)[cols]
+        m = np.clip(np.asarray(momentum, dtype=np.float64)[cols] / MOMENTUM_SCALE, -1.0, 1.0)
+        nw = np.clip(np.asarray(news, dtype=np.float64)[cols], -1.0, 1.0)
+        w = PERSONA_WEIGHTS[self.persona[rows]]
+        fear, greed, safety = self.fear[rows], self.greed[rows], self.safety[rows]
+
+        signal = (w[:, 0] * np.maximum(m, 0) + w[:, 1] * np.minimum(m, 0) + w[:, 2] * nw
+                  + 0.3 * (greed - fear) + rng.normal(0.0, self.noise, rows.size))
+        # 안전 욕구가 클수록 웬만한 신호에는 움직이지 않습니다.
+        threshold = 0.4 + 0.4 * safety
+        held = self.positions[rows, cols]
+        strength = np.minimum(np.abs(signal), 2.0)
+
+        is_buy = (signal > threshold) & (price > 0)
+        is_sell = (signal < -threshold) & (held > 0)
+
+        # 시장가처럼 최우선 호가를 넘겨서 부르되, 급한 정도(탐욕/공포 x 신호 세기)만큼 더 멀리 부릅니다.
+        limit = np.where(
+            is_buy,
+            price * (1.002 + 0.01 * greed * strength),
+            price * (0.998 - 0.01 * fear * strength),
+        )
+        limit = np.maximum(1, np.rint(limit)).astype(np.int64)
+
+        buy_qty = np.floor(self.cash[rows] * (0.02 + 0.08 * greed) * strength / limit)
+        sell_qty = np.ceil(held * (0.1 + 0.4 * fear) * np.minimum(strength, 1.0))
+        qty = np.where(is_buy, buy_qty, np.minimum(sell_qty, held)).astype(np.int64)
+
+        trade = (is_buy | is_sell) & (qty > 0)
+        self.last_stats = {
+            "agents": n,
+            "decided": int(rows.size),
+            "buy": int((trade & is_buy).sum()),
+            "sell": int((trade & ~is_buy).sum()),
+            "hold": int(rows.size - trade.sum()),
+        }
+        return rows[trade], cols[trade], is_buy[trade], qty[trade], limit[trade]
+
+    def build_orders(self, decisions, sim_time: datetime = None):
+        """decide() 결과를 종목별 주문 dict 목록으로 바꿉니다. {ticker: [order, ...]}"""
+        rows, cols, is_buy, qty, limit = decisions
+        timestamp = sim_time or datetime.now()
+        batches = {}
+        for r, c, b, q, p in zip(rows.tolist(), cols.tolist(), is_buy.tolist(), qty.tolist(), limit.tolist()):
+            batches.setdefault(self.tickers[c], []).append({
+                "order_id": f"POP-{next(self._order_seq)}",
+                "agent_id": self.agent_ids[r],
+                "price": p,
+                "quantity": q,
+                "side": "BUY" if b else "SELL",
+                "timestamp": timestamp,
+            })
+        return batches
+
+    def step(self, prices: dict, news: dict = None, exclude=(), sim_time: datetime = None):
+        """
+        prices: {ticker: 기준가}, news: {ticker: -1 ~ 1 뉴스 영향}
+        exclude: 이번 틱에 LLM 으로 따로 판단하는 에이전트 id
+        반환: {ticker: [주문 dict, ...]}
+        """
+        news = news or {}
+        price_arr = np.array([float(prices.get(t, 0) or 0) for t in self.tickers])
+        news_arr = np.array([float(news.get(t, 0.0)) for t in self.tickers])
+        momentum = self.observe_prices(price_arr)
+
+        exclude_mask = None
+        if exclude:
+            exclude_mask = np.zeros(len(self.agent_ids), dtype=bool)
+            idx = [self.index[a] for a in exclude if a in self.index]
+            exclude_mask[idx] = True
+
+        return self.build_orders(self.decide(price_arr, momentum, news_arr, exclude_mask), sim_time)
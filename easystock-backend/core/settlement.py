@@ -0,0 +1,123 @@
+from datetime import datetime
+from sqlalchemy.orm import Session
+from database import DBAgent, DBCompany, DBTrade
+from core.account_store import AgentAccount
+
+# 에이전트가 아닌 주문(웹 유저 등)의 agent_id 접두사: 계좌가 agents 테이블에 없어서
+# 장부는 상대 에이전트 쪽만 정산하고, 이쪽은 엔진의 external_fill_handler 가 따로 정산합니다.
+EXTERNAL_PREFIX = "USER:"
+
+def is_external(agent_id) -> bool:
+    return str(agent_id).startswith(EXTERNAL_PREFIX)
+
+# ------------------------------------------------------------------
+# 일괄 정산 장부 (Settlement Ledger)
+# - 체결 1건마다 SELECT 3번 + commit 하던 것을, 체결을 메모리 장부에 모아두었다가
+#   에이전트는 IN 쿼리 한 번으로 읽고, 거래 기록은 bulk insert 후 commit 한 번으로 끝냅니다.
+# - 체결 순서대로 같은 규칙(잔고/보유 확인)을 적용하므로 최종 잔고/포트폴리오는
+#   체결마다 commit 하던 방식과 정확히 같습니다.
+# - AccountStore 가 주어지면 계좌는 저장소의 것을 그대로 쓰고 (DB 조회 없음),
+#   agents 테이블 저장은 저장소의 write-behind 에 맡깁니다.
+# ------------------------------------------------------------------
+
+class SettlementLedger:
+    def __init__(self, store=None):
+        self.store = store
+        # agent_id -> AgentAccount (저장소가 있으면 저장소의 dict 를 공유)
+        self.accounts = store.accounts if store is not None else {}
+        self.dirty = set()
+        self.trades = []        # DBTrade bulk insert 용 dict 목록
+        self.last_prices = {}   # ticker -> 마지막 체결가
+
+    def __len__(self):
+        return len(self.trades)
+
+    def load(self, db: Session, agent_ids):
+        """장부에 없는 에이전트만 한 번의 IN 쿼리로 불러옵니다."""
+        if self.store is not None:
+            self.store.load(db, agent_ids)
+            return
+        missing = [a for a in set(agent_ids) if a not in self.accounts]
+        if not missing:
+            return
+        rows = db.query(DBAgent.id, DBAgent.agent_id, DBAgent.cash_balance, DBAgent.portfolio) \
+                 .filter(DBAgent.agent_id.in_(missing)).all()
+        for row in rows:
+            self.accounts[row.agent_id] = AgentAccount(row.id, row.agent_id, row.cash_balance, row.portfolio)
+
+    def _touch(self, agent_id):
+        if self.store is not None:
+            self.store.mark_dirty(agent_id)
+        else:
+            self.dirty.add(agent_id)
+
+    def apply(self, ticker, buyer_id, seller_id, price, qty, sim_time=None):
+        """MarketEngine._execute_trade 와 같은 규칙으로 체결 1건을 장부에 반영합니다."""
+        buyer = self.accounts.get(buyer_id)
+        seller = self.accounts.get(seller_id)
+        # 외부(유저) 쪽은 계좌가 여기 없고 따로 정산되므로, 없는 게 정상입니다.
+        if (not buyer and not is_external(buyer_id)) or (not seller and not is_external(seller_id)):
+            return # 에러 방지
+
+        total_amt = price * qty
+
+        # 1. 구매자 처리 (돈 차감, 주식 증가)
+        if buyer and buyer.cash >= total_amt:
+            buyer.cash -= total_amt
+            if self.store is not None:
+                self.store.apply_buy(buyer, ticker, price, qty)
+            else:
+                buyer.positions[ticker] = buyer.positions.get(ticker, 0) + qty
+            self._touch(buyer_id)
+
+        # 2. 판매자 처리 (돈 증가, 주식 차감)
+        if seller and seller.positions.get(ticker, 0) >= qty:
+            seller.cash += total_amt
+            if self.store is not None:
+                self.store.apply_sell(seller, ticker, qty)
+            else:
+                seller.positions[ticker] -= qty
+                if seller.positions[ticker] <= 0: del seller.positions[ticker]
+            self._touch(seller_id)
+
+        # 3. 주가 (현재가 = 최근 체결가)
+        self.last_prices[ticker] = float(price)
+
+        # 4. 거래 기록
+        self.trades.append({
+            "ticker": ticker, "price": price, "quantity": qty,
+            "buyer_id": buyer_id, "seller_id": seller_id,
+            "timestamp": sim_time or datetime.now()
+        })
+
+    def flush(self, db: Session):
+        """모아둔 변경을 한 트랜잭션으로 DB에 씁니다. (기록한 체결 수 반환)"""
+        if not self.trades and not self.dirty:
+            return 0
+
+        if self.dirty:
+            db.bulk_update_mappings(DBAgent, [
+                {"id": acc.row_id, "cash_balance": acc.cash, "portfolio": dict(acc.positions)}
+                for acc in (self.accounts[a] for a in self.dirty)
+            ])
+        if self.last_prices:
+            db.bulk_update_mappings(DBCompany, [
+                {"ticker": t, "current_price": p} for t, p in self.last_prices.items()
+            ])
+        if self.trades:
+            db.bulk_insert_mappings(DBTrade, self.trades)
+        db.commit()
+
+        written = len(self.trades)
+        self.trades = []
+        self.dirty.clear()
+        self.last_prices.clear()
+        return written
+
+    def reset(self):
+        """캐시된 계좌까지 비웁니다. (다음 정산 때 DB에서 새로 읽음, 저장소 계좌는 유지)"""
+        if self.store is None:
+            self.accounts.clear()
+        self.dirty.clear()
+        self.trades = []
+        self.last_prices.clear()
@@ -0,0 +1,36 @@
+import json
+import hashlib
+
+# ------------------------------------------------------------------
+# 버전 기반 스냅샷 캐시 (호가창 폴링용)
+# - 호가창은 바뀔 때마다 version 이 올라가므로, 버전이 같으면 지난번에 만든 JSON 바이트를 그대로 돌려줍니다.
+# - ETag 는 본문 해시라서 서버가 재시작돼 version 이 0부터 다시 시작해도 잘못된 304 가 나가지 않습니다.
+# - 클라이언트가 If-None-Match 로 같은 ETag 를 보내면 본문 없이 304 로 끝납니다.
+# ------------------------------------------------------------------
+
+class SnapshotCache:
+    def __init__(self):
+        self.entries = {}   # key -> (version, etag, body bytes)
+        self.stats = {"hits": 0, "builds": 0, "not_modified": 0}
+
+    def get(self, key, version, build):
+        """version 이 그대로면 캐시된 (etag, body), 아니면 build() 결과를 직렬화해서 저장합니다."""
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == version:
+            self.stats["hits"] += 1
+            return entry[1], entry[2]
+
+        body = json.dumps(build(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+        self.entries[key] = (version, etag, body)
+        self.stats["builds"] += 1
+        return etag, body
+
+    @staticmethod
+    def matches(if_none_match, etag):
+        if not if_none_match:
+            return False
+        return if_none_match.strip() == "*" or etag in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+
+    def snapshot(self):
+        return {**self.stats, "entries": len(self.entries)}
@@ -0,0 +1,137 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+import aiosqlite
+
+# ------------------------------------------------------------------
+# aiosqlite 커넥션 풀
+# - 요청마다 aiosqlite.connect 를 새로 열면 커넥션마다 스레드가 하나씩 생기고,
+#   닫지 않으면 스레드/파일 핸들이 계속 샙니다.
+# - 미리 열어 둔 커넥션 N개를 돌려 쓰고, 쓸 때마다 반드시 finally 에서 반납합니다.
+# - 커넥션을 열 때 PRAGMA(WAL, synchronous 등)를 한 번만 설정합니다.
+# ------------------------------------------------------------------
+
+DEFAULT_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=30000",
+    "PRAGMA cache_size=-20000",      # 약 20MB 페이지 캐시
+    "PRAGMA mmap_size=268435456",    # 256MB 메모리 맵
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+class SQLitePool:
+    def __init__(self, path: str, size: int = 8, acquire_timeout: float = 30.0, pragmas=DEFAULT_PRAGMAS):
+        self.path = path
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self.pragmas = pragmas
+
+        self._idle = None          # asyncio.Queue (이벤트 루프 안에서 만듦)
+        self._all = set()
+        self._open_lock = None
+        self._closed = False
+
+        self.stats = {"checkouts": 0, "timeouts": 0, "replaced": 0, "wait_total_sec": 0.0, "wait_max_sec": 0.0}
+        self.in_use = 0
+        self.peak_in_use = 0
+        self._recent = deque()     # 최근 체크아웃 시각 (초당 체크아웃 계산용)
+
+    async def _connect(self):
+        conn = await aiosqlite.connect(self.path, timeout=30.0)
+        conn.row_factory = aiosqlite.Row
+        for pragma in self.pragmas:
+            await conn.execute(pragma)
+        self._all.add(conn)
+        return conn
+
+    async def open(self):
+        """커넥션을 size 개 미리 열어 둡니다. (여러 번 불러도 한 번만 엶)"""
+        if self._idle is not None:
+            return
+        if self._open_lock is None:
+            self._open_lock = asyncio.Lock()
+        async with self._open_lock:
+            if self._idle is not None:
+                return
+            idle = asyncio.Queue()
+            for _ in range(self.size):
+                idle.put_nowait(await self._connect())
+            self._closed = False
+            self._idle = idle
+
+    async def checkout(self):
+        if self._idle is None:
+            await self.open()
+        started = time.monotonic()
+        try:
+            conn = await asyncio.wait_for(self._idle.get(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise
+
+        waited = time.monotonic() - started
+        self.stats["checkouts"] += 1
+        self.stats["wait_total_sec"] += waited
+        self.stats["wait_max_sec"] = max(self.stats["wait_max_sec"], waited)
+        self.in_use += 1
+        self.peak_in_use = max(self.peak_in_use, self.in_use)
+        self._recent.append(started)
+        return conn
+
+    async def release(self, conn):
+        """커넥션 반납: 끝나지 않은 트랜잭션은 롤백해서 다음 요청에 새어 나가지 않게 합니다."""
+        self.in_use -= 1
+        if self._closed:
+            await conn.close()
+            return
+        try:
+            if conn.in_transaction:
+                await conn.rollback()
+        except Exception:
+            # 망가진 커넥션은 버리고 새로 열어서 풀 크기를 유지합니다.
+            self._all.discard(conn)
+            try: await conn.close()
+            except Exception: pass
+            conn = await self._connect()
+            self.stats["replaced"] += 1
+        self._idle.put_nowait(conn)
+
+    @asynccontextmanager
+    async def acquire(self):
+        conn = await self.checkout()
+        try:
+            yield conn
+        finally:
+            await self.release(conn)
+
+    async def close(self):
+        self._closed = True
+        if self._idle is not None:
+            while not self._idle.empty():
+                self._idle.get_nowait()
+        for conn in list(self._all):
+            try: await conn.close()
+            except Exception: pass
+        self._all.clear()
+        self._idle = None
+
+    def snapshot(self, window: float = 10.0):
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] > window:
+            self._recent.popleft()
+        checkouts = self.stats["checkouts"]
+        return {
+            "size": self.size,
+            "in_use": self.in_use,
+            "peak_in_use": self.peak_in_use,
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+            "checkouts": checkouts,
+            "checkouts_per_sec": round(len(self._recent) / window, 2),
+            "wait_avg_ms": round(self.stats["wait_total_sec"] / checkouts * 1000, 3) if checkouts else 0.0,
+            "wait_max_ms": round(self.stats["wait_max_sec"] * 1000, 3),
+            "timeouts": self.stats["timeouts"],
+            "replaced": self.stats["replaced"],
+        }
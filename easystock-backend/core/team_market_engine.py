@@ -1,13 +1,50 @@
 from sqlalchemy.orm import Session
 from database import DBCompany, DBAgent, DBTrade
-from models.domain_models import Order, OrderSide
+from models.domain_models import Order
+from core.order_book import OrderBook
+from core.settlement import SettlementLedger, is_external
+from core.trade_window import TradeWindows
+from core.candle_builder import CandleBuilder
+from core.market_summary import MarketSummary
+from core.snapshot_cache import SnapshotCache
 from datetime import datetime
 
+# 정산 방식
+# - "fill": 체결 1건마다 DB 조회 + commit (기존 방식)
+# - "pass": 매칭 한 번(_match_orders)에서 나온 체결을 모아 한 번에 commit
+# - "tick": 시뮬레이션 한 틱 동안 모았다가 flush_settlement() 호출 시 commit
+SETTLEMENT_MODES = ("fill", "pass", "tick")
+
 class MarketEngine:
-    def __init__(self):
+    def __init__(self, settlement_mode: str = "pass", account_store=None, window_size: int = 20):
         # 인메모리 호가창 (DB에는 느려서 못 담음)
-        # 구조: {'IT008': {'BUY': [], 'SELL': []}}
+        # 구조: {'IT008': OrderBook} - 가격대별 FIFO 대기열 + 힙 가격 인덱스
         self.order_books = {}
+        self.last_prices = {}   # ticker -> 마지막 체결가 (DB 조회 없이 현재가 확인용)
+        self.windows = TradeWindows(window_size)   # 종목별 최근 체결 (추세/VWAP/거래량)
+        self.candles = CandleBuilder()             # 종목별 1m/5m/1h/1d 봉 (flush 는 시뮬레이션 루프가 호출)
+        self.summary = MarketSummary()             # 종목별 당일 시가/거래량/등락률
+        self.depth_cache = SnapshotCache()         # 호가 스냅샷 JSON (호가창 version 이 같으면 재사용)
+        # 외부 주문(agent_id 가 EXTERNAL_PREFIX 로 시작, 예: 웹 유저) 체결 콜백
+        # handler(ticker, order, price, qty, sim_time) - 엔진은 상대 에이전트 쪽만 정산합니다.
+        self.external_fill_handler = None
+        # 시세 푸시 허브 (core.market_stream.MarketStream 이 스스로 연결함) - 체결 직후 on_fills 호출
+        self.stream = None
+
+        if settlement_mode not in SETTLEMENT_MODES:
+            raise ValueError(f"알 수 없는 정산 방식: {settlement_mode}")
+        self.settlement_mode = settlement_mode
+        # 계좌 저장소(AccountStore)가 있으면 잔고/보유량은 메모리가 기준이고 DB 저장은 write-behind
+        self.account_store = account_store
+        self.ledger = SettlementLedger(account_store)
+        # 마지막으로 비운 뒤 체결에 참여한 에이전트 (인구 엔진이 배열을 다시 맞출 때 씀)
+        self.touched_agents = set()
+
+    def get_book(self, ticker: str) -> OrderBook:
+        book = self.order_books.get(ticker)
+        if book is None:
+            book = self.order_books[ticker] = OrderBook()
+        return book
 
     def place_order(self, db: Session, order: Order, sim_time: datetime = None):
         """
@@ -15,11 +52,14 @@ class MarketEngine:
         sim_time: 시뮬레이션 상의 현재 시간 (None이면 현실 시간 사용)
         """
         ticker = order.ticker
-        if ticker not in self.order_books:
-            self.order_books[ticker] = {'BUY': [], 'SELL': []}
+        book = self.get_book(ticker)
 
         # 1. 유효성 검사 (돈/주식 있는지)
-        agent = db.query(DBAgent).filter(DBAgent.agent_id == order.agent_id).first()
+        if self.account_store is not None:
+            self.account_store.load(db, [order.agent_id])
+            agent = self.account_store.get(order.agent_id)
+        else:
+            agent = db.query(DBAgent).filter(DBAgent.agent_id == order.agent_id).first()
         if not agent: return {"status": "FAIL", "msg": "에이전트 없음"}
         
         # (간단한 검증: 주문 넣을 때 자산 가압류는 안 하고, 체결될 때 다시 체크함 - 현실은 가압류가 맞지만 시뮬레이션 편의상)
@@ -27,6 +67,7 @@ class MarketEngine:
         # 2. 주문서 작성 (가격을 AI가 정한 가격으로)
         # 지정가 주문으로 간주합니다.
         new_order = {
+            "order_id": order.order_id,
             "agent_id": order.agent_id,
             "price": int(order.price) if order.price else 0, # 시장가면 0이지만 여기선 다 지정가로 옴
             "quantity": order.quantity,
@@ -34,57 +75,113 @@ class MarketEngine:
             "timestamp": sim_time or datetime.now() # [수정] 가상 시간 적용
         }
 
-        # 3. 호가창에 등록
-        book = self.order_books[ticker]
-        if order.side == OrderSide.BUY:
-            book['BUY'].append(new_order)
-            # 매수: 비싼 가격 부른 사람이 우선순위 (내림차순 정렬)
-            book['BUY'].sort(key=lambda x: x['price'], reverse=True)
-        else:
-            book['SELL'].append(new_order)
-            # 매도: 싼 가격 부른 사람이 우선순위 (오름차순 정렬)
-            book['SELL'].sort(key=lambda x: x['price'])
+        # 3. 호가창에 등록 (가격대 대기열 맨 뒤에 붙으므로 같은 가격이면 먼저 온 주문이 우선)
+        book.add(new_order)
 
         # 4. 매칭 엔진 가동 (거래 성사 확인)
         return self._match_orders(db, ticker, sim_time)
 
+    def add_resting(self, db: Session, ticker: str, order: dict, sim_time: datetime = None):
+        """
+        이미 만들어진 주문 dict 를 검증 없이 호가창에 올리고 매칭합니다.
+        (마켓 메이커처럼 엔진이 직접 관리하는 호가용)
+        """
+        self.get_book(ticker).add(order)
+        return self._match_orders(db, ticker, sim_time)
+
+    def submit_batch(self, db: Session, ticker: str, orders: list, sim_time: datetime = None, ioc: bool = True):
+        """
+        주문 dict 여러 개를 검증 없이 한꺼번에 올린 뒤 매칭은 한 번만 돌립니다. (인구 엔진용)
+        ioc=True 면 체결되지 못한 나머지는 바로 취소해서 호가창에 쌓이지 않게 합니다.
+        반환: 체결 목록 [(매수 주문, 매도 주문, 체결가, 체결수량), ...]
+        """
+        book = self.get_book(ticker)
+        for order in orders:
+            book.add(order)
+        fills = self._run_match(db, ticker, sim_time)
+        if ioc:
+            for order in orders:
+                if order["order_id"] in book.orders:
+                    book.cancel(order["order_id"])
+        return fills
+
+    def depth_payload(self, ticker: str, n: int, render, variant: str = "default", price=None):
+        """
+        상위 n호가 스냅샷을 render(snapshot) 으로 만든 JSON 의 (etag, body).
+        호가창 version 과 price 가 그대로면 직렬화까지 끝난 캐시를 돌려줍니다.
+        """
+        book = self.get_book(ticker)
+        return self.depth_cache.get((variant, ticker, n), (book.version, price), lambda: render(book.snapshot(n)))
+
+    def drain_touched(self):
+        """체결로 계좌가 바뀐 에이전트 id 를 돌려주고 비웁니다."""
+        touched, self.touched_agents = self.touched_agents, set()
+        return touched
+
+    def cancel_order(self, ticker: str, order_id: str):
+        book = self.order_books.get(ticker)
+        return book.cancel(order_id) if book else None
+
     def _match_orders(self, db: Session, ticker: str, sim_time: datetime = None):
-        book = self.order_books[ticker]
-        logs = []
-        
-        # 매칭 반복: (가장 비싼 매수 호가) >= (가장 싼 매도 호가) 일 때 거래 성사
-        while book['BUY'] and book['SELL']:
-            best_buy = book['BUY'][0]   # 최고가 매수 주문
-            best_sell = book['SELL'][0] # 최저가 매도 주문
-            
-            # 가격이 안 맞으면 거래 안 됨 (스프레드 존재)
-            if best_buy['price'] < best_sell['price']:
-                break
-            
-            # --- 거래 체결! ---
-            # 체결 가격은 먼저 주문 낸 사람 기준(Maker) 혹은 중간값 등 규칙이 있지만,
-            # 여기서는 '매도자가 부른 가격(체결 가능 최저가)'으로 즉시 체결시킴
-            trade_price = best_sell['price'] 
-            trade_qty = min(best_buy['quantity'], best_sell['quantity'])
-            
-            # DB 업데이트 (돈/주식 교환)
-            # [수정] sim_time 전달
-            self._execute_trade(db, ticker, best_buy, best_sell, trade_price, trade_qty, sim_time)
-            
-            logs.append(f"✅ 체결! {trade_price}원 ({trade_qty}주)")
-            
-            # 수량 차감 및 주문 삭제
-            best_buy['quantity'] -= trade_qty
-            best_sell['quantity'] -= trade_qty
-            
-            if best_buy['quantity'] <= 0: book['BUY'].pop(0)
-            if best_sell['quantity'] <= 0: book['SELL'].pop(0)
+        fills = self._run_match(db, ticker, sim_time)
+        logs = [f"✅ 체결! {trade_price}원 ({trade_qty}주)" for _, _, trade_price, trade_qty in fills]
 
         if logs:
             return {"status": "SUCCESS", "msg": ", ".join(logs)}
         else:
             return {"status": "PENDING", "msg": "주문 접수됨 (체결 대기 중)"}
 
+    def _run_match(self, db: Session, ticker: str, sim_time: datetime = None):
+        book = self.order_books[ticker]
+
+        # 매칭: (가장 비싼 매수 호가) >= (가장 싼 매도 호가) 일 때 거래 성사
+        # 체결 가격은 '매도자가 부른 가격(체결 가능 최저가)'
+        fills = book.match()
+
+        # (계좌 저장소를 쓰는 중이면 DB를 직접 고치는 fill 방식은 쓰지 않고 장부로 정산)
+        if self.settlement_mode == "fill" and self.account_store is None:
+            for best_buy, best_sell, trade_price, trade_qty in fills:
+                # DB 업데이트 (돈/주식 교환)
+                # [수정] sim_time 전달
+                self._execute_trade(db, ticker, best_buy, best_sell, trade_price, trade_qty, sim_time)
+        elif fills:
+            self._settle_fills(db, ticker, fills, sim_time)
+
+        if fills and self.external_fill_handler is not None:
+            for buy_order, sell_order, trade_price, trade_qty in fills:
+                for order in (buy_order, sell_order):
+                    if is_external(order["agent_id"]):
+                        self.external_fill_handler(ticker, order, trade_price, trade_qty, sim_time)
+
+        if fills:
+            window = self.windows.get(ticker)
+            for _, _, trade_price, trade_qty in fills:
+                window.record(trade_price, trade_qty, sim_time)
+                self.candles.record(ticker, trade_price, trade_qty, sim_time)
+                self.summary.record(ticker, trade_price, trade_qty, sim_time)
+            self.last_prices[ticker] = float(fills[-1][2])
+            if self.stream is not None:
+                self.stream.on_fills(ticker, fills, sim_time)
+        return fills
+
+    def _settle_fills(self, db: Session, ticker, fills, sim_time=None):
+        # 관련 에이전트는 한 번에 불러오고, 체결은 순서대로 장부에 반영
+        agent_ids = {b["agent_id"] for b, _, _, _ in fills} | {s["agent_id"] for _, s, _, _ in fills}
+        agent_ids = {a for a in agent_ids if not is_external(a)}
+        self.ledger.load(db, agent_ids)
+        self.touched_agents |= agent_ids
+        for buy_order, sell_order, price, qty in fills:
+            self.ledger.apply(ticker, buy_order["agent_id"], sell_order["agent_id"], price, qty, sim_time)
+
+        if self.settlement_mode != "tick":
+            self.flush_settlement(db)
+
+    def flush_settlement(self, db: Session):
+        """장부에 모인 체결을 DB에 한 번에 기록합니다. (tick 모드에서는 틱 끝에 호출)"""
+        written = self.ledger.flush(db)
+        self.ledger.reset()
+        return written
+
     def _execute_trade(self, db: Session, ticker, buy_order, sell_order, price, qty, sim_time=None):
         # 구매자/판매자 DB 로드
         buyer = db.query(DBAgent).filter(DBAgent.agent_id == buy_order['agent_id']).first()
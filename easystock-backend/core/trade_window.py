@@ -0,0 +1,96 @@
+from collections import deque
+from sqlalchemy import desc
+from sqlalchemy.orm import Session
+from database import DBTrade
+
+# ------------------------------------------------------------------
+# 종목별 최근 체결 링 버퍼 (Rolling Trade Window)
+# - 매칭 엔진이 체결을 바로 밀어 넣으므로, 추세/현재가/VWAP/거래량을 DB 조회 없이 O(1)로 꺼냅니다.
+# - trades 테이블은 시작할 때 버퍼를 데우려고 한 번만 읽습니다.
+# ------------------------------------------------------------------
+
+class TradeWindow:
+    """한 종목의 최근 N건 체결 (가격, 수량, 시각)"""
+    __slots__ = ("fills", "volume", "notional")
+
+    def __init__(self, size: int = 20):
+        self.fills = deque(maxlen=size)
+        self.volume = 0        # 버퍼 안 체결 수량 합
+        self.notional = 0.0    # 버퍼 안 체결 금액 합 (VWAP 용)
+
+    def __len__(self):
+        return len(self.fills)
+
+    def record(self, price, qty, timestamp=None):
+        # 가득 찼으면 밀려나는 체결만큼 합계를 빼서 항상 O(1)로 유지합니다.
+        if len(self.fills) == self.fills.maxlen:
+            old_price, old_qty, _ = self.fills[0]
+            self.volume -= old_qty
+            self.notional -= old_price * old_qty
+        self.fills.append((price, qty, timestamp))
+        self.volume += qty
+        self.notional += price * qty
+
+    @property
+    def last_price(self):
+        return self.fills[-1][0] if self.fills else None
+
+    @property
+    def vwap(self):
+        return self.notional / self.volume if self.volume > 0 else None
+
+    def trend(self):
+        """analyze_market_trend 와 같은 기준: 버퍼에서 가장 오래된 체결 대비 최신 체결"""
+        if not self.fills: return "정보 없음 (탐색 단계)"
+
+        start_p = self.fills[0][0]
+        end_p = self.fills[-1][0]
+
+        if end_p > start_p * 1.02: return "🔥 급등세 (매수세 강함)"
+        elif end_p > start_p: return "📈 완만한 상승"
+        elif end_p < start_p * 0.98: return "😱 급락세 (투매 발생)"
+        elif end_p < start_p: return "📉 하락세"
+        else: return "⚖️ 보합세 (눈치보기)"
+
+
+class TradeWindows:
+    """ticker -> TradeWindow"""
+
+    def __init__(self, size: int = 20):
+        self.size = size
+        self.windows = {}
+
+    def get(self, ticker: str) -> TradeWindow:
+        window = self.windows.get(ticker)
+        if window is None:
+            window = self.windows[ticker] = TradeWindow(self.size)
+        return window
+
+    def record(self, ticker, price, qty, timestamp=None):
+        self.get(ticker).record(price, qty, timestamp)
+
+    def trend(self, ticker):
+        return self.get(ticker).trend()
+
+    def last_price(self, ticker):
+        return self.get(ticker).last_price
+
+    def warm(self, db: Session, tickers):
+        """시작할 때 종목별 최근 N건을 읽어서 버퍼를 채웁니다. (오래된 것부터 넣음)"""
+        for ticker in tickers:
+            rows = db.query(DBTrade.price, DBTrade.quantity, DBTrade.timestamp) \
+                     .filter(DBTrade.ticker == ticker) \
+                     .order_by(desc(DBTrade.timestamp)).limit(self.size).all()
+            window = self.windows[ticker] = TradeWindow(self.size)
+            for price, qty, ts in reversed(rows):
+                window.record(price, qty or 0, ts)
+
+    def snapshot(self, ticker):
+        window = self.get(ticker)
+        return {
+            "last_price": window.last_price,
+            "vwap": round(window.vwap, 2) if window.vwap is not None else None,
+            "volume": window.volume,
+            "trades": len(window),
+            "trend": window.trend(),
+        }
@@ -0,0 +1,140 @@
+import asyncio
+import time
+import aiosqlite
+from core.sqlite_pool import DEFAULT_PRAGMAS
+
+# ------------------------------------------------------------------
+# SQLite 단일 작성자 (Single Writer) 큐
+# - SQLite 는 쓰기 락이 DB 전체에 하나뿐이라, 여러 커넥션이 BEGIN IMMEDIATE 로 다투면
+#   "database is locked" 가 납니다.
+# - 쓰기 의도(write intent)를 asyncio 큐에 넣으면 전용 작성자 태스크 하나가
+#   짧은 시간(max_delay) 또는 개수(max_batch) 단위로 모아 한 트랜잭션으로 커밋합니다. (group commit)
+# - 의도마다 SAVEPOINT 를 걸어서 하나가 실패해도 그 의도만 되돌리고 나머지는 커밋됩니다.
+# - 호출한 쪽은 submit() 을 await 해서 자기 의도의 결과(또는 예외)를 그대로 받습니다.
+#
+# 쓰기 의도 = 작성자 커넥션을 인자로 받는 async 함수. 안에서 읽고 검사하고 써도 되지만
+# commit/rollback 은 직접 하지 않습니다. (작성자가 묶어서 처리)
+# ------------------------------------------------------------------
+
+class SQLiteWriter:
+    def __init__(self, path: str, max_batch: int = 64, max_delay: float = 0.005, pragmas=DEFAULT_PRAGMAS):
+        self.path = path
+        self.max_batch = max_batch
+        self.max_delay = max_delay     # 첫 의도가 온 뒤 이만큼 더 기다리며 모읍니다. (초)
+        self.pragmas = pragmas
+
+        self._queue = None
+        self._conn = None
+        self._task = None
+        self._start_lock = None
+
+        self.stats = {"intents": 0, "batches": 0, "failed_intents": 0, "failed_batches": 0,
+                      "max_batch": 0, "commit_total_sec": 0.0}
+
+    async def start(self):
+        if self._task is not None and not self._task.done():
+            return
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._task is not None and not self._task.done():
+                return
+            # isolation_level=None: 트랜잭션(BEGIN/SAVEPOINT/COMMIT)은 작성자가 직접 엽니다.
+            self._conn = await aiosqlite.connect(self.path, timeout=30.0, isolation_level=None)
+            self._conn.row_factory = aiosqlite.Row
+            for pragma in self.pragmas:
+                await self._conn.execute(pragma)
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def submit(self, intent):
+        """쓰기 의도를 큐에 넣고, 커밋까지 끝나면 그 결과를 돌려줍니다."""
+        if self._task is None or self._task.done():
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((intent, future))
+        return await future
+
+    async def _collect(self):
+        first = await self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get_nowait() if remaining <= 0 else \
+                       await asyncio.wait_for(self._queue.get(), timeout=remaining)
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+            if item is None:
+                self._queue.put_nowait(None)  # 종료 신호는 이번 묶음을 끝낸 뒤 처리
+                break
+            batch.append(item)
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            if batch is None:
+                return
+            await self._commit_batch(batch)
+
+    async def _commit_batch(self, batch):
+        conn = self._conn
+        started = time.monotonic()
+        results = []
+        try:
+            await conn.execute("BEGIN IMMEDIATE")
+            for intent, future in batch:
+                await conn.execute("SAVEPOINT intent")
+                try:
+                    value = await intent(conn)
+                except Exception as e:
+                    await conn.execute("ROLLBACK TO intent")
+                    await conn.execute("RELEASE intent")
+                    results.append((future, False, e))
+                    self.stats["failed_intents"] += 1
+                    continue
+                await conn.execute("RELEASE intent")
+                results.append((future, True, value))
+            await conn.execute("COMMIT")
+        except Exception as e:
+            # 커밋 자체가 실패하면 이번 묶음 전체가 실패입니다.
+            try: await conn.execute("ROLLBACK")
+            except Exception: pass
+            self.stats["failed_batches"] += 1
+            results = [(future, False, e) for _, future in batch]
+
+        self.stats["intents"] += len(batch)
+        self.stats["batches"] += 1
+        self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+        self.stats["commit_total_sec"] += time.monotonic() - started
+
+        for future, ok, value in results:
+            if future.done():
+                continue  # 기다리던 요청이 이미 취소됨
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    async def stop(self):
+        """남은 의도를 모두 커밋한 뒤 작성자 커넥션을 닫습니다."""
+        if self._task is not None and not self._task.done():
+            self._queue.put_nowait(None)
+            await self._task
+        self._task = None
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    def snapshot(self):
+        batches = self.stats["batches"]
+        return {
+            **{k: v for k, v in self.stats.items() if k != "commit_total_sec"},
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "avg_batch": round(self.stats["intents"] / batches, 2) if batches else 0.0,
+            "avg_commit_ms": round(self.stats["commit_total_sec"] / batches * 1000, 3) if batches else 0.0,
+        }
@@ -5,8 +5,12 @@ from datetime import datetime
 from dotenv import load_dotenv
 
 # 임포트
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, JSON
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, JSON, Index
 from sqlalchemy.orm import declarative_base, sessionmaker
+from core.sqlite_pool import SQLitePool
+from core.write_queue import SQLiteWriter
+from services.order_execution import PENDING_INDEX_SQL
+from services.news_search import ensure_index as ensure_news_index
 
 DB_PATH = "/home/site/wwwroot/stock_game.db" if os.getenv("WEBSITE_HOSTNAME") else "stock_game.db"
 
@@ -60,6 +64,39 @@ class DBTrade(Base):
     seller_id = Column(String)
     timestamp = Column(DateTime, default=datetime.now)
 
+    # 종목별 시간 범위 조회 (당일 시가/거래량, 추세 버퍼 워밍)
+    __table_args__ = (
+        Index("ix_trades_ticker_timestamp", "ticker", "timestamp"),
+    )
+
+class DBCandle(Base):
+    __tablename__ = "candles"
+    id = Column(Integer, primary_key=True, index=True)
+    ticker = Column(String, nullable=False)
+    interval = Column(String, nullable=False)      # 1m / 5m / 1h / 1d
+    bucket_start = Column(DateTime, nullable=False)  # 시뮬레이션 시간 기준 봉 시작
+    open = Column(Float)
+    high = Column(Float)
+    low = Column(Float)
+    close = Column(Float)
+    volume = Column(Integer, default=0)
+    trades = Column(Integer, default=0)
+
+    __table_args__ = (
+        Index("ix_candles_ticker_interval_bucket", "ticker", "interval", "bucket_start", unique=True),
+    )
+
+class DBAgentWealth(Base):
+    # 시뮬레이션이 틱마다 다시 채우는 에이전트 자산 순위 (대시보드는 이 테이블만 읽음)
+    __tablename__ = "agent_wealth"
+    rank = Column(Integer, primary_key=True)
+    agent_id = Column(String, nullable=False)
+    total = Column(Float)
+    cash = Column(Float)
+    stock = Column(Float)
+    sim_time = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.now)
+
 class DBNews(Base):
     __tablename__ = "news_pool" 
     id = Column(Integer, primary_key=True, index=True)
@@ -94,11 +131,19 @@ class DBDiscussion(Base):
 
 # 뉴스 & 랭킹 & 자산 관리용 (aiosqlite)
 
+# 요청마다 새 연결을 열지 않고 미리 열어 둔 연결을 돌려 씁니다. (PRAGMA 는 연결 열 때 한 번)
+db_pool = SQLitePool(DB_PATH, size=int(os.getenv("SQLITE_POOL_SIZE", "8")))
+
+# 쓰기는 전용 작성자 하나가 큐로 받아서 묶어서 커밋합니다. ("database is locked" 방지)
+db_writer = SQLiteWriter(DB_PATH)
+
 async def get_db_connection():
-    """FastAPI 라우터에서 쓸 DB 연결 생성기"""
-    conn = await aiosqlite.connect(DB_PATH, timeout=30.0)
-    conn.row_factory = aiosqlite.Row
-    return conn
+    """FastAPI 라우터에서 쓸 DB 연결 생성기 (요청이 끝나면 풀에 반납)"""
+    conn = await db_pool.checkout()
+    try:
+        yield conn
+    finally:
+        await db_pool.release(conn)
 
 
 
@@ -109,6 +154,10 @@ async def init_db():
     # --- 1) 팀원 DB 초기화 (SQLAlchemy 방식) ---
     try:
         Base.metadata.create_all(bind=engine)
+        # create_all 은 이미 있는 테이블에 새로 추가된 인덱스는 만들지 않으므로 따로 보강합니다.
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=engine, checkfirst=True)
         print("✅ [팀원 시스템] SQLAlchemy 모델 초기화 완료")
     except Exception as e:
         print(f"❌ [팀원 시스템] 테이블 생성 실패: {e}")
@@ -163,6 +212,10 @@ async def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
         """)
+        # 호가창에서 나눠 체결된 수량 (services/user_orders.py)
+        try: await db.execute("ALTER TABLE orders ADD COLUMN filled_quantity INTEGER DEFAULT 0")
+        except: pass
+        await db.execute(PENDING_INDEX_SQL)
 
         # 4. holdings 테이블
         await db.execute("""
@@ -221,6 +274,7 @@ async def init_db():
         except: pass
         try: await db.execute("ALTER TABLE news ADD COLUMN published_at TEXT")
         except: pass
+        await ensure_news_index(db)  # 전문 검색 색인 + 동기화 트리거
 
         # 8. quests 목록
         await db.execute("""
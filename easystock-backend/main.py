@@ -1,4 +1,4 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
@@ -8,7 +8,6 @@ from datetime import datetime
 import aiosqlite
 from pydantic import BaseModel
 from urllib.parse import unquote
-from collections import defaultdict
 from sqlalchemy import or_
 from core.mentor_brain import chat_with_mentor
 import os
@@ -16,12 +15,18 @@ from database import DB_PATH
 
 # 엔진과 모델 임포트
 
-from database import init_db, SessionLocal, DBCompany, DBAgent
-from routers import trade, social, news
+from database import init_db, SessionLocal, DBCompany, DBAgent, db_pool, db_writer
+from routers import trade, social, news, stream, rank
 from models.domain_models import Order, OrderType, OrderSide, Agent # 주문 모델
 from team_api import router as team_router
+from core.candle_builder import CHART_PERIODS, INTERVALS, load_chart
 from main_simulation import market_engine as engine, run_simulation_loop
 import main_simulation
+from services.user_orders import user_orders
+from services.leaderboard import leaderboard
+from services.mentor_advice import mentor_advice
+from services.news_search import ensure_index as ensure_news_index, mention_filter, list_news
+from core.compression import compressed_json
 
 # [전역 설정]
 TARGET_TICKERS = [
@@ -71,36 +76,6 @@ current_mentor_comments = {ticker: [] for ticker in TARGET_TICKERS}
 news_history_storage = []
 
 
-# 시뮬레이션 엔진
-async def simulate_market_background():
-    global current_news_display, price_history, current_mentor_comments
-    
-    print("🚀 [시스템] 유저 주문 모니터링 시작 (기존 엔진 로직 제거됨)")
-    
-    # 1. DB 연결 (유지)
-    db = await aiosqlite.connect("DB_PATH", timeout=30.0)
-    await db.execute("PRAGMA journal_mode=WAL;") 
-    db.row_factory = aiosqlite.Row
-
-    try:     
-        # 3. [무한 루프] 
-        loop_count = 0
-        while True:
-            await asyncio.sleep(1) 
-            loop_count += 1
-            """
-            async with db.execute("SELECT * FROM orders WHERE status = 'PENDING'") as cursor:
-                pending_orders = await cursor.fetchall()
-
-            for db_order in pending_orders:
-                # ... 기존 체결 로직 ...
-            """
-
-    except Exception as e:
-        print(f"❌ 모니터링 에러: {e}")
-    finally:
-        await db.close()
-
 def seed_database():
     with SessionLocal() as db:
         print("🌱 [시스템] DB 데이터를 보존하며 INITIAL_PRICES를 동기화합니다...")
@@ -138,6 +113,18 @@ def seed_database():
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     seed_database() 
+    await db_pool.open()  # 라우터용 aiosqlite 연결을 미리 열어 둠
+    await db_writer.start()  # 쓰기 전용 작성자 태스크
+    restored = await user_orders.restore()  # 미체결 유저 주문을 호가창에 다시 올림
+    user_orders.start()
+    main_simulation.market_stream.start()  # 호가 변화 푸시 (WebSocket/SSE)
+    print(f"📥 [유저 주문] 미체결 주문 {restored}건 호가창 복원")
+    indexed = await db_writer.submit(ensure_news_index)  # 뉴스 전문 검색 색인 (처음 한 번만 기존 기사 색인)
+    if indexed:
+        print(f"🔎 [뉴스 검색] 기존 기사 {indexed}건 색인")
+    ranked = await leaderboard.load()  # 유저 총자산 랭킹을 메모리에 올림
+    leaderboard.start()
+    print(f"🏆 [랭킹] 유저 {ranked}명 로드")
     
     # 2. 기존 시뮬레이션 가동 코드 (유지)
     main_simulation.running = True
@@ -149,7 +136,16 @@ async def lifespan(app: FastAPI):
     # 3. 종료 코드 (유지)
     print("🛑 서버 종료 신호 감지! 시뮬레이션을 안전하게 중단합니다.")
     main_simulation.running = False
+    await main_simulation.market_stream.stop()
+    await leaderboard.stop()
     await asyncio.sleep(1)
+    saved = main_simulation.account_store.close()
+    print(f"💾 에이전트 계좌 {saved}건 저장 완료")
+    with SessionLocal() as db:
+        engine.candles.flush(db)
+    await user_orders.stop()  # 남은 유저 체결을 작성자 큐에 넘긴 뒤
+    await db_writer.stop()  # 큐에 남은 쓰기를 모두 커밋한 뒤 종료
+    await db_pool.close()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -167,11 +163,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Before-Id"],  # 뉴스 목록 다음 페이지 키
 )
 
 app.include_router(trade.router)
 app.include_router(social.router, prefix="/api/social", tags=["Social & Ranking"])
 app.include_router(news.router)
+app.include_router(stream.router)
+app.include_router(rank.router)
 app.include_router(team_router, prefix="/team", tags=["Team API"])
 
 @app.get("/api/market-data")
@@ -187,11 +186,11 @@ async def get_market_data(ticker: str = "삼송전자"):
         #print(f"[내 관심] '{ticker}' 조회수 UP! (현재 점수: {hot_scores[ticker]})")
 
     comp = engine.companies[ticker]
-    book = engine.order_books.get(ticker, {"BUY": [], "SELL": []})
+    book = engine.get_book(ticker)
     
     # 엔진 호가
-    buy_orders = [o.dict() for o in book["BUY"][:5]] #테스트
-    sell_orders = [o.dict() for o in book["SELL"][:5]]
+    buy_orders = [{"price": p, "quantity": q} for p, q in book.depth("BUY", 5)] #테스트
+    sell_orders = [{"price": p, "quantity": q} for p, q in book.depth("SELL", 5)]
 
     if ticker in hot_scores:
         hot_scores[ticker] += 1
@@ -207,6 +206,28 @@ async def get_market_data(ticker: str = "삼송전자"):
         "mentors": current_mentor_comments.get(ticker, [])
     }
 
+# 시뮬레이션 성능 지표 (틱 소요 시간, LLM 지연/타임아웃, 마켓 메이커 호가 변경)
+@app.get("/api/simulation/metrics")
+async def get_simulation_metrics():
+    return {
+        "scheduler": main_simulation.llm_scheduler.snapshot(),
+        "decision_cache": main_simulation.decision_cache.snapshot(),
+        "market_maker": {
+            "last_tick": main_simulation.market_maker.last_tick_stats,
+            "total_saved": main_simulation.market_maker.total_saved,
+        },
+        "population": main_simulation.population_engine.last_stats if main_simulation.population_engine else None,
+        "db_pool": db_pool.snapshot(),
+        "db_writer": db_writer.snapshot(),
+        "user_orders": user_orders.snapshot(),
+        "depth_cache": engine.depth_cache.snapshot(),
+        "stream": main_simulation.market_stream.snapshot(),
+        "leaderboard": leaderboard.snapshot(),
+        "mentor_advice": mentor_advice.snapshot(),
+        "trade_windows": {t: main_simulation.market_engine.windows.snapshot(t)
+                          for t in list(main_simulation.market_engine.windows.windows)},
+    }
+
 @app.get("/api/stocks")
 async def get_all_stocks():
     try:
@@ -349,63 +370,50 @@ async def get_stock_detail(ticker: str):
 # 2. 차트 데이터 API (프론트엔드 fetchStockChart 대응)
 @app.get("/api/stocks/{ticker}/chart")
 async def get_stock_chart(ticker: str, period: str = "1d"):
-    if ticker not in price_history:
-        return []
-    return price_history.get(ticker, [])
+    # period -> 봉 간격/기간 (1h: 1분봉, 1d: 5분봉, 1w: 1시간봉, 1mo/1y: 일봉)
+    if period not in CHART_PERIODS:
+        return {"error": f"지원하지 않는 기간입니다: {period}", "periods": list(CHART_PERIODS)}
+    actual_ticker = TICKER_MAP.get(ticker, ticker)
+    interval, span = CHART_PERIODS[period]
+    limit = int(span.total_seconds() // INTERVALS[interval])
 
-# 3. 호가창 데이터 API (프론트엔드 fetchOrderBook 대응)
-@app.get("/api/stocks/{ticker}/orderbook")
-async def get_stock_orderbook(ticker: str):
     with SessionLocal() as db:
-        company = db.query(DBCompany).filter(
-            or_(DBCompany.ticker == ticker, DBCompany.name == ticker)
-        ).first()
-
-        if not company:
-            return {"error": "Stock not found"}
-
-        actual_ticker = company.ticker
-        current_price = int(company.current_price)
+        return load_chart(db, actual_ticker, interval, limit, engine.candles.live_bar(actual_ticker, interval))
 
-    book = engine.order_books.get(actual_ticker, {"SELL": [], "BUY": []})
-
-    # 💡 1. 매도(SELL) 주문을 같은 가격끼리 묶어서 수량(volume)을 더합니다!
-    ask_summary = defaultdict(int)
-    for o in book.get("SELL", []):
-        ask_summary[int(o["price"])] += o["quantity"]
-        
-    # 💡 2. 매수(BUY) 주문도 같은 가격끼리 묶어줍니다!
-    bid_summary = defaultdict(int)
-    for o in book.get("BUY", []):
-        bid_summary[int(o["price"])] += o["quantity"]
+# 3. 호가창 데이터 API (프론트엔드 fetchOrderBook 대응)
+@app.get("/api/stocks/{ticker}/orderbook")
+async def get_stock_orderbook(ticker: str, request: Request, depth: int = 5):
+    # 종목 코드는 한 번만 DB에서 찾고, 호가는 엔진이 가격대별로 묶어 둔 잔량에서 바로 꺼냅니다.
+    actual_ticker = user_orders.resolve_ticker(ticker)
+    if actual_ticker is None:
+        return {"error": "Stock not found"}
 
-    # 3. 묶여진 데이터를 가격 순서대로 정렬하고 5개만 자릅니다.
-    asks = [{"price": p, "volume": v} for p, v in sorted(ask_summary.items())][:5]
-    bids = [{"price": p, "volume": v} for p, v in sorted(bid_summary.items(), reverse=True)][:5]
+    current_price = int(user_orders.reference_price(actual_ticker) or 0)
 
-    return {
-        "ticker": actual_ticker,
-        "current_price": current_price,
-        "asks": asks,
-        "bids": bids
-    }
+    def render(snap):
+        return {
+            "ticker": actual_ticker,
+            "current_price": current_price,
+            "version": snap["version"],
+            "asks": [{"price": int(p), "volume": v} for p, v in snap["asks"]],
+            "bids": [{"price": int(p), "volume": v} for p, v in snap["bids"]],
+        }
+    return trade.orderbook_response(request, actual_ticker, max(1, min(depth, 50)), render, variant="stocks", price=current_price)
 
 @app.get("/api/stocks/{ticker}/news")
-async def get_stock_news(ticker: str):
+async def get_stock_news(ticker: str, request: Request, before_id: int = None, limit: int = 50):
     decoded_ticker = unquote(ticker)
-    
-    async with aiosqlite.connect("DB_PATH") as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("""
-            SELECT id, ticker, title, source, created_at as time, category, content, summary 
-            FROM news 
-            WHERE ticker LIKE ? OR title LIKE ?
-            ORDER BY id DESC 
-            LIMIT 50
-        """, (f"%{decoded_ticker}%", f"%{decoded_ticker}%")) 
-        
-        rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
+    # 제목 부분 일치는 전문 검색 색인(news_fts)으로 찾고, 목록 열만 id 역순 키셋 페이지로 읽습니다.
+    condition, params = mention_filter("ticker", decoded_ticker)
+
+    async with db_pool.acquire() as db:
+        rows, next_before_id = await list_news(
+            db, "id, ticker, title, source, created_at as time, category, summary",
+            condition, params, before_id, max(1, min(limit, 200)),
+        )
+
+    headers = {"X-Next-Before-Id": str(next_before_id)} if next_before_id else None
+    return compressed_json(request, [dict(row) for row in rows], headers)
 
 @app.get("/api/ranking/hot")
 def get_hot_ranking():
@@ -414,7 +422,7 @@ def get_hot_ranking():
     
     response_data = []
     with SessionLocal() as db:
-        for rank, (ticker_name, score) in enumerate(sorted_ranking, 1):
+        for position, (ticker_name, score) in enumerate(sorted_ranking, 1):
             company = db.query(DBCompany).filter(
                 or_(DBCompany.ticker == ticker_name, DBCompany.name == ticker_name)
             ).first()
@@ -432,7 +440,7 @@ def get_hot_ranking():
                 symbol = ticker_name
 
             response_data.append({
-                "rank": rank,
+                "rank": position,
                 "ticker": symbol,
                 "name": name,
                 "score": score,
@@ -441,34 +449,6 @@ def get_hot_ranking():
             })
             
     return response_data
-@app.get("/api/news")
-async def get_all_news():
-    async with aiosqlite.connect("DB_PATH") as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("""
-            SELECT id, ticker, title, source, created_at as time 
-            FROM news 
-            ORDER BY id DESC 
-            LIMIT 20
-        """)
-        rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
-
-# 시장(Market) 상세화면용: 특정 종목 뉴스만 가져옴
-@app.get("/api/stocks/{ticker}/news")
-async def get_stock_news(ticker: str):
-    async with aiosqlite.connect("DB_PATH") as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("""
-            SELECT id, ticker, title, source, created_at as time 
-            FROM news 
-            WHERE ticker = ? 
-            ORDER BY id DESC
-            LIMIT 20
-        """, (ticker,))
-        rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
-
 app.mount("/", StaticFiles(directory="static", html=True), name="static")
 
 if __name__ == "__main__":
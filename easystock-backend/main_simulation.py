@@ -4,11 +4,17 @@ import random
 from datetime import datetime, timedelta 
 from sqlalchemy.orm import Session
 from sqlalchemy import desc, asc
-from database import SessionLocal, DBAgent, DBNews, DBCompany, DBTrade, DBDiscussion
+from database import SessionLocal, DBAgent, DBNews, DBCompany, DBTrade, DBDiscussion, DBCandle
 from core.team_market_engine import MarketEngine
+from core.account_store import AccountStore
+from core.market_maker import MarketMaker, MM_ID
+from core.market_stream import MarketStream, post_to_dict
+from core.agent_wealth import WealthSnapshot
 from community_manager import post_comment 
 from models.domain_models import Order, OrderSide, OrderType, AgentState
-from core.agent_society_brain import agent_society_think
+from core.agent_society_brain import agent_society_think, persona_rule_decision, get_agent_persona
+from core.decision_cache import DecisionCache
+from core.llm_scheduler import LLMScheduler
 import os
 
 # ------------------------------------------------------------------
@@ -21,7 +27,54 @@ logger = logging.getLogger("GlobalMarket")
 logging.getLogger("httpx").setLevel(logging.WARNING)
 logging.getLogger("httpcore").setLevel(logging.WARNING)
 
-market_engine = MarketEngine()
+# 에이전트 계좌는 메모리(AccountStore)가 기준이고, 바뀐 계좌만 주기적으로 DB에 저장합니다.
+account_store = AccountStore(flush_interval=float(os.getenv("ACCOUNT_FLUSH_INTERVAL", "5")))
+
+# 정산 방식: fill(체결마다 commit) / pass(매칭 1회마다 commit) / tick(틱마다 commit)
+market_engine = MarketEngine(settlement_mode=os.getenv("SETTLEMENT_MODE", "pass"), account_store=account_store)
+market_maker = MarketMaker(market_engine)
+
+# 시세 푸시 허브: 체결/호가/캔들/토론 글을 WebSocket·SSE 구독자에게 밀어 줌 (routers/stream.py)
+market_stream = MarketStream(
+    market_engine,
+    depth=int(os.getenv("STREAM_DEPTH", "10")),
+    interval=float(os.getenv("STREAM_INTERVAL", "0.2")),
+)
+
+# 에이전트 자산 순위: 틱마다 메모리 계좌로 한 번 계산해서 agent_wealth 에 저장 (dashboard.py 가 읽음)
+wealth_snapshot = WealthSnapshot(top_n=int(os.getenv("WEALTH_TOP_N", "100")), exclude={MM_ID})
+
+# LLM 호출 스케줄러: 동시 호출 수/초당 호출 수 제한 + 틱 마감 시간 (늦으면 규칙 기반 결정으로 대체)
+llm_scheduler = LLMScheduler(
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+    call_timeout=float(os.getenv("LLM_CALL_TIMEOUT", "8")),
+    rate_per_sec=float(os.getenv("LLM_RATE_PER_SEC", "5")),
+    burst=int(os.getenv("LLM_BURST", "10")),
+    tick_deadline=float(os.getenv("TICK_DEADLINE", "10")),
+)
+
+# 의사결정 캐시: 비슷한 시장 상태의 LLM 결정을 재사용 (TTL 은 시뮬레이션 시간 기준 초)
+decision_cache = DecisionCache(
+    max_entries=int(os.getenv("DECISION_CACHE_SIZE", "5000")),
+    ttl=float(os.getenv("DECISION_CACHE_TTL", "600")),
+)
+
+# LLM 으로 판단하는 에이전트 수 (매 틱 무작위 표본)
+LLM_ACTIVE_AGENTS = int(os.getenv("LLM_ACTIVE_AGENTS", "30"))
+
+# 벡터화 인구 엔진: 나머지 에이전트 전체를 규칙 기반으로 한 번에 판단 (numpy 필요)
+population_engine = None
+POPULATION_ENABLED = os.getenv("POPULATION_ENGINE", "0") == "1"
+if POPULATION_ENABLED:
+    try:
+        from core.population_engine import PopulationEngine
+    except ImportError:
+        logger.warning("⚠️ numpy 가 없어 인구 엔진을 끕니다. (pip install numpy)")
+        POPULATION_ENABLED = False
+
+# 뉴스 제목으로 호재/악재를 가르는 키워드
+GOOD_NEWS_KEYWORDS = ["호재", "상승", "돌파", "계약", "성공", "출시", "인수", "흑자", "성장", "수주", "개발", "혁신", "M&A", "체결"]
+BAD_NEWS_KEYWORDS = ["악재", "하락", "쇼크", "횡령", "소송", "결함", "위반", "붕괴", "적자", "포기", "실패", "우려", "매각", "논란"]
 
 running = True # 🟢 서버 실행 상태 플래그
 
@@ -42,53 +95,68 @@ current_sim_time = get_latest_sim_time()
 # ------------------------------------------------------------------
 # 1. 마켓 메이커 (Market Maker)
 # ------------------------------------------------------------------
-def run_global_market_maker(db: Session, all_tickers: list, sim_time: datetime):
-    mm_id = "MARKET_MAKER"
-    mm_agent = db.query(DBAgent).filter(DBAgent.agent_id == mm_id).first()
+def ensure_market_maker(db: Session, all_tickers: list):
+    """마켓 메이커 계좌가 없으면 만듭니다. (시작할 때 한 번만)"""
+    mm_agent = db.query(DBAgent).filter(DBAgent.agent_id == MM_ID).first()
     
     if not mm_agent:
         initial_portfolio = {ticker: 1000000 for ticker in all_tickers}
-        mm_agent = DBAgent(agent_id=mm_id, cash_balance=1e15, portfolio=initial_portfolio, psychology={})
+        mm_agent = DBAgent(agent_id=MM_ID, cash_balance=1e15, portfolio=initial_portfolio, psychology={})
         db.add(mm_agent)
         db.commit()
+    account_store.load(db, [MM_ID])
+
+def run_global_market_maker(db: Session, prices: dict, sim_time: datetime):
+    # 💡 5호가 벽은 지속 호가로 유지하고, 기준가가 움직인 층만 교체합니다. (DB 조회 없음)
+    try:
+        stats = market_maker.refresh_all(db, prices, sim_time)
+    except Exception as e:
+        logger.error(f"🚨 마켓 메이커 호가 갱신 실패: {e}")
+        return
+    if sim_time.minute == 0:
+        logger.info(f"🧱 [마켓 메이커] 호가 변경 {stats['mutations']}건 (기존 방식 대비 {stats['saved']}건 절약, 누적 {market_maker.total_saved}건)")
 
-    for ticker in all_tickers:
-        company = db.query(DBCompany).filter(DBCompany.ticker == ticker).first()
-        if not company: continue
-
-        curr_price = int(company.current_price)
-        
-        # 💡 [핵심 수정] 1개만 걸던 주문을 반복문을 통해 5개로 늘려 5호가를 만듭니다!
-        for step in range(1, 6):
-            # step이 커질수록 현재가에서 더 멀리 떨어진 가격(0.15% 간격)으로 호가를 만듭니다.
-            spread = max(1, int(curr_price * 0.0015 * step)) 
-            # 각 층마다 수량도 30주~250주 사이로 리얼하게 랜덤으로 깝니다.
-            qty_buy = random.randint(30, 250)
-            qty_sell = random.randint(30, 250)
+# ------------------------------------------------------------------
+# [Helper] 추세 분석 (엔진의 체결 링 버퍼에서 바로 계산, DB 조회 없음)
+# ------------------------------------------------------------------
+def analyze_market_trend(ticker: str):
+    return market_engine.windows.trend(ticker)
 
-            try:
-                # 매수 호가 (현재가보다 싼 가격들: 1층, 2층... 5층)
-                market_engine.place_order(db, Order(agent_id=mm_id, ticker=ticker, side=OrderSide.BUY, order_type=OrderType.LIMIT, quantity=qty_buy, price=curr_price - spread), sim_time)
-                # 매도 호가 (현재가보다 비싼 가격들: 1층, 2층... 5층)
-                market_engine.place_order(db, Order(agent_id=mm_id, ticker=ticker, side=OrderSide.SELL, order_type=OrderType.LIMIT, quantity=qty_sell, price=curr_price + spread), sim_time)
-            except: 
-                pass
+# ------------------------------------------------------------------
+# [Helper] 종목별 최신 뉴스 영향 (-1 ~ 1, 인구 엔진 입력)
+# ------------------------------------------------------------------
+def latest_news_impact(db: Session, companies):
+    ticker_by_name = {c.name: c.ticker for c in companies}
+    rows = db.query(DBNews.company_name, DBNews.title, DBNews.impact_score) \
+             .order_by(desc(DBNews.id)).limit(max(50, len(companies) * 10)).all()
+
+    impact = {}
+    for name, title, score in rows:
+        ticker = ticker_by_name.get(name)
+        if ticker is None or ticker in impact:
+            continue  # 종목마다 가장 최근 뉴스 하나만
+        title = title or ""
+        sign = 1 if any(kw in title for kw in GOOD_NEWS_KEYWORDS) else -1 if any(kw in title for kw in BAD_NEWS_KEYWORDS) else 0
+        impact[ticker] = sign * min(1.0, (score or 50) / 100)
+    return impact
 
 # ------------------------------------------------------------------
-# [Helper] 추세 분석
+# 2-0. 인구 엔진 (규칙 기반 벡터화 매매)
 # ------------------------------------------------------------------
-def analyze_market_trend(db: Session, ticker: str):
-    trades = db.query(DBTrade).filter(DBTrade.ticker == ticker).order_by(desc(DBTrade.timestamp)).limit(20).all()
-    if not trades: return "정보 없음 (탐색 단계)"
-    
-    start_p = trades[-1].price
-    end_p = trades[0].price
-    
-    if end_p > start_p * 1.02: return "🔥 급등세 (매수세 강함)"
-    elif end_p > start_p: return "📈 완만한 상승"
-    elif end_p < start_p * 0.98: return "😱 급락세 (투매 발생)"
-    elif end_p < start_p: return "📉 하락세"
-    else: return "⚖️ 보합세 (눈치보기)"
+def run_population_step(db: Session, companies, prices: dict, llm_agents, sim_time: datetime):
+    # 지난 틱 이후 체결로 바뀐 계좌만 배열에 다시 맞춥니다.
+    touched = market_engine.drain_touched()
+    population_engine.sync(account_store.get(a) for a in touched if account_store.get(a))
+
+    batches = population_engine.step(prices, latest_news_impact(db, companies), exclude=set(llm_agents), sim_time=sim_time)
+    fills = 0
+    for ticker, orders in batches.items():
+        fills += len(market_engine.submit_batch(db, ticker, orders, sim_time))
+
+    if sim_time.minute == 0:
+        stats = population_engine.last_stats
+        logger.info(f"👥 [인구 엔진] {stats['agents']}명 중 {stats['decided']}명 판단 | "
+                    f"매수 {stats['buy']} / 매도 {stats['sell']} / 관망 {stats['hold']} | 체결 {fills}건")
 
 # ------------------------------------------------------------------
 # 2. 에이전트 거래 실행
@@ -96,7 +164,7 @@ def analyze_market_trend(db: Session, ticker: str):
 async def run_agent_trade(agent_id: str, ticker: str, sim_time: datetime):
     with SessionLocal() as db:
         try:
-            agent = db.query(DBAgent).filter(DBAgent.agent_id == agent_id).first()
+            agent = account_store.get(agent_id)
             company = db.query(DBCompany).filter(DBCompany.ticker == ticker).first()
             if not agent or not company: return
 
@@ -105,25 +173,43 @@ async def run_agent_trade(agent_id: str, ticker: str, sim_time: datetime):
 
             news_obj = db.query(DBNews).filter(DBNews.company_name == company.name).order_by(desc(DBNews.id)).first()
             news_text = news_obj.title if news_obj else "특이사항 없음"
-            trend_info = analyze_market_trend(db, ticker)
+            trend_info = analyze_market_trend(ticker)
 
-            portfolio_qty = agent.portfolio.get(ticker, 0)
-            avg_price = agent.psychology.get(f"avg_price_{ticker}", 0)
+            portfolio_qty = agent.positions.get(ticker, 0)
+            avg_price = agent.avg_prices.get(ticker, 0)
             if portfolio_qty > 0 and avg_price == 0: avg_price = company.current_price
             last_thought = agent.psychology.get(f"last_thought_{ticker}", None)
 
+            agent_state = AgentState(**agent.psychology)
+            cache_key = DecisionCache.make_key(
+                get_agent_persona(agent.agent_id)[0], ticker, trend_info,
+                news_obj.id if news_obj else None, company.current_price, portfolio_qty, agent.cash
+            )
+            cache_now = sim_time.timestamp()
             try:
-                decision = await agent_society_think(
-                    agent_name=agent.agent_id, 
-                    agent_state=AgentState(**agent.psychology),
-                    context_info=news_text, 
-                    current_price=company.current_price, 
-                    cash=agent.cash_balance,
-                    portfolio_qty=portfolio_qty,
-                    avg_price=avg_price,
-                    last_action_desc=last_thought,
-                    market_sentiment=trend_info
-                )
+                decision = decision_cache.get(cache_key, agent.agent_id, cache_now,
+                                              company.current_price, agent.cash, portfolio_qty)
+                if decision is None:
+                    decision = await llm_scheduler.run(
+                        lambda: agent_society_think(
+                            agent_name=agent.agent_id, 
+                            agent_state=agent_state,
+                            context_info=news_text, 
+                            current_price=company.current_price, 
+                            cash=agent.cash,
+                            portfolio_qty=portfolio_qty,
+                            avg_price=avg_price,
+                            last_action_desc=last_thought,
+                            market_sentiment=trend_info
+                        ),
+                        # 틱 마감을 놓치면 페르소나 규칙으로 즉시 결정
+                        fallback=lambda: persona_rule_decision(
+                            agent.agent_id, agent_state, company.current_price, agent.cash,
+                            portfolio_qty=portfolio_qty, market_sentiment=trend_info
+                        )
+                    )
+                    if decision.get("source") not in ("rule", "error"):
+                        decision_cache.put(cache_key, decision, cache_now, company.current_price)
                 # logger.info(f"🔎 [추적 2] {agent_id} 정상적으로 생각 완료!")
             except Exception as e:
                 logger.error(f"🚨 [에러 발생] AI 생각 실패 ({agent_id}): {e}")
@@ -144,11 +230,8 @@ async def run_agent_trade(agent_id: str, ticker: str, sim_time: datetime):
                 qty = 0
 
             # 🚀 [강력한 뉴스 반응 엔진 (News Impact Engine) 탑재!]
-            good_keywords = ["호재", "상승", "돌파", "계약", "성공", "출시", "인수", "흑자", "성장", "수주", "개발", "혁신", "M&A", "체결"]
-            bad_keywords = ["악재", "하락", "쇼크", "횡령", "소송", "결함", "위반", "붕괴", "적자", "포기", "실패", "우려", "매각", "논란"]
-
-            is_good_news = any(kw in news_text for kw in good_keywords)
-            is_bad_news = any(kw in news_text for kw in bad_keywords)
+            is_good_news = any(kw in news_text for kw in GOOD_NEWS_KEYWORDS)
+            is_bad_news = any(kw in news_text for kw in BAD_NEWS_KEYWORDS)
             
             impact_multiplier = 1
             if news_obj and hasattr(news_obj, 'impact_score') and news_obj.impact_score:
@@ -224,13 +307,15 @@ async def run_agent_trade(agent_id: str, ticker: str, sim_time: datetime):
                 if result['status'] == 'SUCCESS':
                     #logger.info(f"⚡ {ticker} 체결! | {agent_id} | {action} {qty}주")
                     try:
-                        post_comment(db, agent_id, ticker, action, company.name, sim_time=sim_time)
+                        post = post_comment(db, agent_id, ticker, action, company.name, sim_time=sim_time)
+                        if post is not None:
+                            market_stream.publish_post(post_to_dict(post))
                     except: pass
                     
                     # 💡 [무적의 등락률 계산기 장착!] 
-                    latest_trade = db.query(DBTrade).filter(DBTrade.ticker == ticker).order_by(desc(DBTrade.timestamp)).first()
-                    if latest_trade:
-                        company.current_price = latest_trade.price
+                    latest_price = market_engine.windows.last_price(ticker)
+                    if latest_price is not None:
+                        company.current_price = latest_price
                         
                         # 과거 DB 데이터 꼬임을 방지하기 위해 기획된 가격을 직접 기준으로 삼습니다.
                         BASE_PRICES = {
@@ -238,10 +323,10 @@ async def run_agent_trade(agent_id: str, ticker: str, sim_time: datetime):
                             "SH001": 62000, "ND008": 34000, "JH005": 89000, "SE002": 54000,
                             "IA009": 41000, "SW006": 22000, "QD007": 115000, "YJ003": 198000
                         }
-                        base_price = BASE_PRICES.get(ticker, latest_trade.price)
+                        base_price = BASE_PRICES.get(ticker, latest_price)
                         
                         if base_price > 0:
-                            company.change_rate = ((latest_trade.price - base_price) / base_price) * 100
+                            company.change_rate = ((latest_price - base_price) / base_price) * 100
                             
                         db.commit()
                         #logger.info(f"📈 [간판 교체] {company.name}: {company.current_price}원 ({company.change_rate:.2f}%)")
@@ -257,30 +342,34 @@ async def run_global_chatter(agent_id: str, sim_time: datetime):
     
     with SessionLocal() as db:
         try:
-            agent = db.query(DBAgent).filter(DBAgent.agent_id == agent_id).first()
+            agent = account_store.get(agent_id)
             if not agent: return
             
-            port_summary = ", ".join([f"{k} {v}주" for k, v in agent.portfolio.items()]) or "보유 주식 없음"
+            port_summary = ", ".join([f"{k} {v}주" for k, v in agent.positions.items()]) or "보유 주식 없음"
             
             context_prompt = (
-                f"현재 당신의 계좌 상태 - 잔고: {agent.cash_balance}원, 보유주식: {port_summary}. "
+                f"현재 당신의 계좌 상태 - 잔고: {agent.cash}원, 보유주식: {port_summary}. "
                 "당신은 방금 주식 시장을 확인하고 투자자 커뮤니티 라운지에 접속했습니다. "
                 "당신의 성향과 현재 계좌 상태를 바탕으로, 지금 느끼는 감정이나 시장에 대한 생각을 자연스러운 커뮤니티 게시글(1문장)로 작성하세요. "
                 "반드시 아래 JSON 형식으로 응답해야 시스템이 인식합니다:\n"
                 '{"action": "HOLD", "quantity": 0, "price": 0, "thought_process": "게시글 내용"}'
             )
             
-            decision = await agent_society_think(
-                agent_name=agent.agent_id, 
-                agent_state=AgentState(**agent.psychology),
-                context_info=context_prompt, 
-                current_price=0, 
-                cash=agent.cash_balance,
-                portfolio_qty=0,
-                avg_price=0,
-                last_action_desc="커뮤니티에서 다른 사람들의 반응을 지켜보는 중",
-                market_sentiment="자유게시판 (수다 떠는 곳)"
+            decision = await llm_scheduler.run(
+                lambda: agent_society_think(
+                    agent_name=agent.agent_id, 
+                    agent_state=AgentState(**agent.psychology),
+                    context_info=context_prompt, 
+                    current_price=0, 
+                    cash=agent.cash,
+                    portfolio_qty=0,
+                    avg_price=0,
+                    last_action_desc="커뮤니티에서 다른 사람들의 반응을 지켜보는 중",
+                    market_sentiment="자유게시판 (수다 떠는 곳)"
+                ),
+                fallback=lambda: None  # 수다는 마감을 놓치면 이번 턴엔 생략
             )
+            if decision is None: return
             
             chatter = decision.get("thought_process", "")
             
@@ -300,6 +389,7 @@ async def run_global_chatter(agent_id: str, sim_time: datetime):
             )
             db.add(new_post)
             db.commit()
+            market_stream.publish_post(post_to_dict(new_post))
             
             logger.info(f"💬 [시장 라운지] {agent_id}: {chatter}")
             
@@ -312,6 +402,29 @@ async def run_global_chatter(agent_id: str, sim_time: datetime):
 async def run_simulation_loop():
     global current_sim_time
     logger.info(f"🚀 [Time Warp] 시뮬레이션 가동! 시작 시간: {current_sim_time.strftime('%H:%M')}")
+
+    # 에이전트 계좌를 한 번만 읽어 두고, 이후 의사결정은 DB 조회 없이 메모리에서 처리합니다.
+    with SessionLocal() as db:
+        account_store.load_all(db)
+        tickers = [c.ticker for c in db.query(DBCompany.ticker).all()]
+        ensure_market_maker(db, tickers)
+        # init_db() 를 거치지 않은 기존 DB 에는 candles 테이블이 없으므로 여기서 보강합니다.
+        DBCandle.__table__.create(bind=db.get_bind(), checkfirst=True)
+        # 같은 이유로 trades 의 (ticker, timestamp) 인덱스도 보강합니다. (시세 요약 워밍이 이 인덱스를 탐)
+        for index in DBTrade.__table__.indexes:
+            index.create(bind=db.get_bind(), checkfirst=True)
+        # trades 테이블은 여기서 한 번만 읽어 종목별 체결 버퍼를 데웁니다.
+        market_engine.windows.warm(db, tickers)
+        market_engine.candles.warm(db, tickers)
+        market_engine.summary.warm(db, tickers, current_sim_time)
+    account_store.start()
+
+    global population_engine
+    if POPULATION_ENABLED:
+        population_engine = PopulationEngine(tickers)
+        population_engine.load_accounts(account_store.accounts.values(), exclude={MM_ID})
+        market_engine.drain_touched()
+        logger.info(f"👥 [인구 엔진] 에이전트 {len(population_engine)}명 벡터화 완료")
     
     while True:
         try:
@@ -320,28 +433,30 @@ async def run_simulation_loop():
             if current_sim_time.minute == 0:
                 logger.info(f"⏰ 현재 가상 시간: {current_sim_time.strftime('%H:%M')}")
 
-            # 💡 [여기서부터 수정] 시간 계산 대신 "마켓메이커"의 주문만 콕 집어서 삭제합니다.
-            for ticker, book in market_engine.order_books.items():
-                # AI의 주문은 살려두고, 마켓 메이커의 거대한 벽만 매 턴마다 허물어줍니다.
-                book["BUY"] = [o for o in book["BUY"] if o["agent_id"] != "MARKET_MAKER"]
-                book["SELL"] = [o for o in book["SELL"] if o["agent_id"] != "MARKET_MAKER"]
-            # 💡 [여기까지 수정 완료]
-
             # 현실 10분마다 하루가 지나도록 설정 (19시 마감)
             if current_sim_time.hour >= 19:
                  logger.info("🌙 장 마감! 다음날 아침으로 점프합니다.")
                  current_sim_time += timedelta(days=1)
                  current_sim_time = current_sim_time.replace(hour=9, minute=0)
+                 market_engine.summary.reset_day(current_sim_time)
             
+            all_agents = [a for a in account_store.agent_ids() if a != MM_ID]
+
+            # 💡 1번 수정: 한 턴에 LLM 으로 움직이는 봇은 소수 표본만 뽑습니다. (나머지는 인구 엔진 담당)
+            active_agents = random.sample(all_agents, k=LLM_ACTIVE_AGENTS) if len(all_agents) > LLM_ACTIVE_AGENTS + 10 else all_agents
+
             with SessionLocal() as db:
                 all_companies = db.query(DBCompany).all()
                 all_tickers = [c.ticker for c in all_companies] 
+                # 기준가: 엔진이 기억하는 마지막 체결가가 있으면 그걸, 없으면 DB 현재가
+                ref_prices = {c.ticker: market_engine.last_prices.get(c.ticker, c.current_price) for c in all_companies}
                 
-                run_global_market_maker(db, all_tickers, current_sim_time)
-                all_agents = [a.agent_id for a in db.query(DBAgent.agent_id).all() if a.agent_id != "MARKET_MAKER"]
-
-            # 💡 1번 수정: 한 턴에 움직이는 봇의 수를 30명 -> 5명으로 줄입니다. (서버 부하 1/6로 감소!)
-            active_agents = random.sample(all_agents, k=30) if len(all_agents) > 40 else all_agents
+                run_global_market_maker(db, ref_prices, current_sim_time)
+                if population_engine is not None:
+                    try:
+                        run_population_step(db, all_companies, ref_prices, active_agents, current_sim_time)
+                    except Exception as e:
+                        logger.error(f"🚨 인구 엔진 에러: {e}")
             
             tasks = []
             
@@ -353,7 +468,29 @@ async def run_simulation_loop():
                 chatty_agent = random.choice(active_agents)
                 tasks.append(run_global_chatter(chatty_agent, current_sim_time))
             
+            llm_scheduler.begin_tick()
             await asyncio.gather(*tasks) 
+            tick_stats = llm_scheduler.end_tick()
+            if tick_stats["fallbacks"] or current_sim_time.minute == 0:
+                logger.info(
+                    f"⏱️ [틱 지표] {tick_stats['tick_sec']}s | LLM {tick_stats['llm_calls']}건 "
+                    f"p50 {tick_stats['llm_p50_sec']}s / p95 {tick_stats['llm_p95_sec']}s / p99 {tick_stats['llm_p99_sec']}s | "
+                    f"타임아웃 {tick_stats['timeouts']} / 규칙 대체 {tick_stats['fallbacks']}"
+                )
+
+            # 이번 틱 마감 가격 (자산 순위와 구독자 틱 요약이 같이 씀)
+            tick_prices = {t: market_engine.last_prices.get(t, p) for t, p in ref_prices.items()}
+
+            # tick 정산 모드라면 이번 턴에 쌓인 체결을 한 번에 기록하고, 바뀐 캔들과 자산 순위도 함께 저장합니다.
+            with SessionLocal() as db:
+                if market_engine.settlement_mode == "tick":
+                    market_engine.flush_settlement(db)
+                market_engine.candles.flush(db)
+                wealth_snapshot.compute(account_store.accounts.values(), tick_prices, current_sim_time)
+                wealth_snapshot.flush(db)
+
+            # 구독자에게 틱 요약 (가상 시계 + 전 종목 현재가)
+            market_stream.on_tick(current_sim_time, tick_prices)
             
             # 💡 2번 수정: 1초마다 돌던 루프를 3초~5초마다 돌도록 휴식 시간을 줍니다.
             await asyncio.sleep(1)
@@ -363,4 +500,10 @@ async def run_simulation_loop():
             await asyncio.sleep(5)
 
 if __name__ == "__main__":
-    asyncio.run(run_simulation_loop())
\ No newline at end of file
+    try:
+        asyncio.run(run_simulation_loop())
+    finally:
+        # 종료 시 메모리에만 있던 계좌 변경과 캔들을 저장합니다.
+        account_store.close()
+        with SessionLocal() as db:
+            market_engine.candles.flush(db)
\ No newline at end of file
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, HTTPException, Depends, Header, Path, Query
+from fastapi import APIRouter, HTTPException, Depends, Header, Path, Query, Request
 import aiosqlite
 from database import get_db_connection
 import os
 from database import DB_PATH
+from services.news_search import search_news, mention_filter, list_news
+from core.compression import compressed_json
 
 try:
     from services.gamification import gain_exp, check_quest
@@ -15,36 +17,24 @@ router = APIRouter(prefix="/api/news", tags=["News"])
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DB_PATH = os.path.join(BASE_DIR, "DB_PATH")
 
-# 1. 뉴스 목록 조회 (회사명 필터링 추가)
+# 목록에 필요한 열만 읽습니다. (본문 content 는 상세 조회에서만)
+NEWS_LIST_COLUMNS = "id, title, summary, sentiment, impact_score, category, source, company_name, published_at"
+
+# 1. 뉴스 목록 조회 (회사명 필터링 + 키셋 페이지: 응답 헤더 X-Next-Before-Id 를 다음 요청의 before_id 로)
 @router.get("")
 @router.get("/")
 @router.get("/news")
 async def get_published_news(
+    request: Request,
     company: str = Query(None, description="필터링할 회사 이름"),
+    before_id: int = Query(None, ge=1, description="이 id 보다 오래된 기사부터"),
+    limit: int = Query(1000, ge=1, le=1000),
     db: aiosqlite.Connection = Depends(get_db_connection)
 ):
     try:
-        db.row_factory = aiosqlite.Row
-
-        if company:
-            query = """
-                SELECT * FROM news 
-                WHERE company_name = ? OR title LIKE ? OR summary LIKE ?
-                ORDER BY id DESC 
-                LIMIT 1000
-            """
-            search_term = f"%{company}%"
-            cursor = await db.execute(query, (company, search_term, search_term))
-        else:
-            query = """
-                SELECT * FROM news 
-                ORDER BY id DESC 
-                LIMIT 1000
-            """
-            cursor = await db.execute(query)
+        condition, params = mention_filter("company_name", company) if company else (None, None)
+        rows, next_before_id = await list_news(db, NEWS_LIST_COLUMNS, condition, params, before_id, limit)
 
-        rows = await cursor.fetchall()
-            
         result = []
         for d in rows:
             result.append({
@@ -52,19 +42,35 @@ async def get_published_news(
                 "title": d["title"],
                 "summary": d["summary"],
                 "sentiment": d["sentiment"],
-                "impact_score": d["impact_score"] if "impact_score" in d.keys() else 0,
+                "impact_score": d["impact_score"] or 0,
                 "category": d["category"] if d["category"] else "일반",
                 "source": d["source"] if d["source"] else "Stocky News",
                 "company_name": d["company_name"] if d["company_name"] else "미분류", 
                 "published_at": d["published_at"]
             })
-            
-        return result
+
+        headers = {"X-Next-Before-Id": str(next_before_id)} if next_before_id else None
+        return compressed_json(request, result, headers)
             
     except Exception as e:
         print(f"❌ 뉴스 목록 조회 에러: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# 2. 뉴스 검색 (전문 검색 색인, 관련도/최신순 + 커서 페이지)
+@router.get("/search")
+async def search_published_news(
+    q: str = Query(..., min_length=1, description="검색어 (공백으로 나누면 모두 포함하는 기사)"),
+    company: str = Query(None, description="회사 이름 또는 종목 코드로 좁히기"),
+    sort: str = Query("relevance", pattern="^(relevance|recent)$"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str = Query(None, description="이전 응답의 next_cursor"),
+    db: aiosqlite.Connection = Depends(get_db_connection)
+):
+    try:
+        return await search_news(db, q, limit=limit, cursor=cursor, sort=sort, company=company)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 # 3. 뉴스 상세 조회 API
 @router.get("/{news_id}")
 async def get_news_detail(
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, HTTPException
-from database import get_db_connection
+from database import db_pool
+from services.leaderboard import leaderboard
 import os
 
 # 진짜 레벨업 조건표(정답지)를 가져옵니다.
@@ -13,78 +14,14 @@ router = APIRouter()
 # 🏆 [랭킹 시스템] 총 자산(현금 + 주식) 순위 TOP 10 조회
 @router.get("/ranking")
 async def get_ranking():
-    conn = await get_db_connection()
-    try:
-        # 1. 모든 유저 정보 가져오기
-        async with conn.execute("SELECT id, username, level, balance, exp FROM users") as cursor:
-            users = await cursor.fetchall()
-            
-        ranking_list = []
-        
-        # 2. 각 유저별로 '총 자산' 계산하기
-        for user in users:
-            user_id = user["id"]
-            cash = user["balance"]
-            
-            # 이 유저의 보유 주식 가져오기
-            async with conn.execute("""
-                SELECT h.quantity, h.average_price, s.current_price 
-                FROM holdings h
-                JOIN stocks s ON h.company_name = s.company_name
-                WHERE h.user_id = ?
-            """, (user_id,)) as cursor:
-                holdings = await cursor.fetchall()
-            
-            total_stock_value = 0
-            total_invested = 0
-            
-            for h in holdings:
-                current_price = h["current_price"]
-                qty = h["quantity"]
-                avg_price = h["average_price"]
-                
-                total_stock_value += (current_price * qty)
-                total_invested += (avg_price * qty)
-                
-            # 총 자산 = 현금 + 주식 평가금
-            total_assets = cash + total_stock_value
-            
-            # 통합 수익률 계산 (투자 원금 대비)
-            profit_rate = 0.0
-            if total_invested > 0:
-                profit_rate = ((total_stock_value - total_invested) / total_invested) * 100
-            
-            ranking_list.append({
-                "username": user["username"],
-                "level": user["level"] if user["level"] else 1,
-                "total_assets": int(total_assets),
-                "profit_rate": round(profit_rate, 2),
-                "exp": user["exp"]
-            })
-            
-        # 3. 총 자산 순서대로 내림차순 정렬 (부자가 1등!)
-        ranking_list.sort(key=lambda x: x["total_assets"], reverse=True)
-        
-        # 4. 랭킹 번호 매겨서 반환 (상위 10명만)
-        result = []
-        for i, item in enumerate(ranking_list[:100], 1):
-            result.append({
-                "rank": i,
-                "username": item["username"],
-                "level": item["level"],
-                "total_assets": item["total_assets"],
-                "profit_rate": item["profit_rate"],
-                "exp": item["exp"]
-            })
-            
-        return result
-    finally:
-        await conn.close()
+    # 총 자산은 랭킹 서비스가 메모리에서 증분으로 유지합니다. (유저마다 DB를 다시 읽지 않음)
+    return [{key: row[key] for key in ("rank", "username", "level", "total_assets", "profit_rate", "exp")}
+            for row in leaderboard.top(100)]
 
 # 레벨 및 경험치 조회 (기존 코드 그대로 유지)
 @router.get("/my-profile/{user_id}")
 async def get_my_profile(user_id: str):
-    conn = await get_db_connection()
+    conn = await db_pool.checkout()
     try:
         # 1. 내 정보 가져오기
         async with conn.execute("SELECT * FROM users WHERE username = ?", (user_id,)) as cursor:
@@ -114,4 +51,4 @@ async def get_my_profile(user_id: str):
             "next_level_exp": next_goal
         }
     finally:
-        await conn.close()
\ No newline at end of file
+        await db_pool.release(conn)
\ No newline at end of file
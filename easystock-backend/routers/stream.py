@@ -0,0 +1,95 @@
+import json
+import asyncio
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Request
+from fastapi.responses import StreamingResponse
+from main_simulation import market_stream
+from services.user_orders import user_orders
+from core.market_stream import ALL_TICKERS
+
+router = APIRouter(tags=["Stream"])
+
+# 연결이 조용할 때 프록시가 끊지 않도록 보내는 SSE 주석 간격 (초)
+HEARTBEAT_SEC = 15.0
+
+
+def resolve_tickers(raw):
+    """'삼송전자,JW004' 처럼 이름/코드를 섞어 보내도 엔진 ticker 로 바꿉니다. ('*' 은 전체)"""
+    names = raw.split(",") if isinstance(raw, str) else (raw if isinstance(raw, list) else [])
+    tickers = []
+    for name in (n.strip() for n in names if isinstance(n, str)):
+        if not name:
+            continue
+        ticker = ALL_TICKERS if name == ALL_TICKERS else user_orders.resolve_ticker(name)
+        if ticker:
+            tickers.append(ticker)
+    return tickers
+
+
+async def wait_disconnect(request: Request):
+    """SSE 클라이언트가 연결을 끊을 때까지 기다립니다. (응답을 보내는 중에도 http.disconnect 를 바로 알아챔)"""
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+# 1. WebSocket: ws://.../ws/market?tickers=SS011,JW004
+#    구독 변경은 {"action": "subscribe" | "unsubscribe", "tickers": [...]} 메시지로
+@router.websocket("/ws/market")
+async def market_socket(websocket: WebSocket, tickers: str = ""):
+    await websocket.accept()
+    sub = market_stream.subscribe(resolve_tickers(tickers))
+
+    async def read_commands():
+        while True:
+            try:
+                msg = json.loads(await websocket.receive_text())
+            except json.JSONDecodeError:
+                continue
+            if not isinstance(msg, dict):
+                continue
+            names = resolve_tickers(msg.get("tickers"))
+            if msg.get("action") == "subscribe":
+                market_stream.update(sub, add=names)
+            elif msg.get("action") == "unsubscribe":
+                market_stream.update(sub, remove=names)
+
+    reader = asyncio.create_task(read_commands())
+    try:
+        while not reader.done():
+            # 보내는 동안 쌓인 프레임은 구독자 버퍼에서 합쳐지거나(호가) 오래된 것부터 버려집니다.(체결/글)
+            # 클라이언트가 끊으면 reader 가 끝나므로 보낼 프레임을 기다리지 않고 바로 빠져나옵니다.
+            for text in await sub.next_frames(stop=reader):
+                await websocket.send_text(text)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        reader.cancel()
+        market_stream.unsubscribe(sub)
+        if reader.done() and not reader.cancelled():
+            error = reader.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                print(f"⚠️ [시세 스트림] 명령 수신 실패: {error!r}")
+
+
+# 2. Server-Sent Events: GET /api/stream?tickers=SS011,JW004 (받기 전용, 프레임 JSON 의 type 으로 구분)
+@router.get("/api/stream")
+async def market_events(request: Request, tickers: str = ""):
+    sub = market_stream.subscribe(resolve_tickers(tickers))
+
+    async def event_source():
+        disconnected = asyncio.create_task(wait_disconnect(request))
+        try:
+            yield "retry: 3000\n\n"
+            while not disconnected.done():
+                frames = await sub.next_frames(timeout=HEARTBEAT_SEC, stop=disconnected)
+                if disconnected.done():
+                    break
+                if not frames:
+                    yield ": ping\n\n"
+                    continue
+                yield "".join(f"data: {text}\n\n" for text in frames)
+        finally:
+            disconnected.cancel()
+            market_stream.unsubscribe(sub)
+
+    return StreamingResponse(event_source(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -1,16 +1,16 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from pydantic import BaseModel
 import aiosqlite
-from database import get_db_connection
+from database import get_db_connection, db_writer, db_pool
 from services.gamification import gain_exp, check_quest
+from services.user_orders import user_orders
+from core.snapshot_cache import SnapshotCache
+from main_simulation import market_engine
 from models.domain_models import Order, OrderType, OrderSide
-from database import DB_PATH
-import os
+import time
 
 router = APIRouter(prefix="/api/trade", tags=["Trade"])
 
-DB_PATH = "/home/site/wwwroot/stock_game.db" if os.getenv("WEBSITE_HOSTNAME") else "stock_game.db"
-
 # 1. 데이터 모델 (Schema)
 class UserCreate(BaseModel):
     username: str
@@ -27,25 +27,26 @@ async def init_user(user: UserCreate, db: aiosqlite.Connection = Depends(get_db_
     """
     [안전 호환 모드] 유저 생성 및 초기 자금 지급
     """
-    try:
+    async def create_user(conn):
         # 1. 유저 생성 (INSERT 실행)
-        cursor = await db.execute(
+        cursor = await conn.execute(
             "INSERT INTO users (username, balance) VALUES (?, 1000000)", 
             (user.username,)
         )
-        await db.commit()
         
         # 2. 방금 만든 유저의 ID 확인 (RETURNING 대신 lastrowid 사용)
         user_id = cursor.lastrowid
-        balance = 1000000.0
         
         # 3. 원장(Ledger)에 가입 축하금 기록
-        await db.execute("""
+        await conn.execute("""
             INSERT INTO transactions (user_id, transaction_type, amount, balance_after, description)
             VALUES (?, 'DEPOSIT', 1000000, 1000000, '신규 가입 축하금')
         """, (user_id,))
-        
-        await db.commit()
+        return user_id
+
+    try:
+        user_id = await db_writer.submit(create_user)
+        balance = 1000000.0
         
         return {
             "status": "created", 
@@ -177,18 +178,16 @@ class RewardRequest(BaseModel):
     description: str
 
 @router.post("/reward")
-async def give_reward(reward: RewardRequest, db: aiosqlite.Connection = Depends(get_db_connection)):
+async def give_reward(reward: RewardRequest):
     """
     [보상 지급 시스템]
     - 특정 유저에게 돈을 지급합니다.
     - 퀘스트 완료, 레벨업 축하금, 배당금 지급 등에 사용됩니다.
     - 거래 장부(Ledger)에 'REWARD' 타입으로 기록됩니다.
     """
-    try:
-        await db.execute("BEGIN IMMEDIATE")
-
+    async def pay_reward(conn):
         # 1. 유저 존재 확인 및 현재 잔액 조회
-        cursor = await db.execute("SELECT balance FROM users WHERE id = ?", (reward.user_id,))
+        cursor = await conn.execute("SELECT balance FROM users WHERE id = ?", (reward.user_id,))
         row = await cursor.fetchone()
         
         if not row:
@@ -198,15 +197,17 @@ async def give_reward(reward: RewardRequest, db: aiosqlite.Connection = Depends(
         
         # 2. 잔액 증가 (더하기)
         new_balance = balance + reward.amount
-        await db.execute("UPDATE users SET balance = ? WHERE id = ?", (new_balance, reward.user_id))
+        await conn.execute("UPDATE users SET balance = ? WHERE id = ?", (new_balance, reward.user_id))
 
         # 3. 거래 원장(Ledger)에 기록 (돈의 출처 남기기)
-        await db.execute("""
+        await conn.execute("""
             INSERT INTO transactions (user_id, transaction_type, amount, balance_after, description)
             VALUES (?, 'REWARD', ?, ?, ?)
         """, (reward.user_id, reward.amount, new_balance, reward.description))
+        return new_balance
 
-        await db.commit()
+    try:
+        new_balance = await db_writer.submit(pay_reward)
 
         return {
             "status": "success",
@@ -216,7 +217,6 @@ async def give_reward(reward: RewardRequest, db: aiosqlite.Connection = Depends(
         }
 
     except Exception as e:
-        await db.rollback()
         raise HTTPException(status_code=500, detail=f"보상 지급 실패: {str(e)}")
 
 
@@ -314,118 +314,96 @@ class OrderRequest(BaseModel):
 
 @router.post("/order")
 async def place_order(req: OrderRequest):
+    """
+    [지정가/시장가 주문]
+    돈(매수) 또는 주식(매도)을 먼저 묶어 두고 PENDING 주문을 기록한 뒤,
+    에이전트들이 거래하는 시뮬레이션 호가창에 그대로 올립니다.
+    체결분은 services/user_orders 가 비동기로 잔고/보유 주식에 반영합니다.
+    """
+    submitted_at = time.monotonic()
+
     # 1. 기본 설정
     target_ticker = req.ticker if req.ticker else req.company_name
     side = req.side.upper() if req.side else "BUY"
+    if side not in ("BUY", "SELL") or req.quantity <= 0:
+        return {"success": False, "msg": "잘못된 주문입니다."}
+
+    engine_ticker = user_orders.resolve_ticker(target_ticker)
+    if engine_ticker is None:
+        return {"success": False, "msg": f"{target_ticker} 종목을 찾을 수 없습니다."}
+
+    # 2. 시장가는 현재가에서 2% 여유를 둔 지정가로 바꿔서 바로 맞은편 호가와 체결되게 합니다.
+    if req.order_type == "MARKET":
+        ref_price = user_orders.reference_price(engine_ticker)
+        if not ref_price:
+            return {"success": False, "msg": "현재가를 알 수 없어 시장가 주문을 받을 수 없습니다."}
+        req.price = int(ref_price * (1.02 if side == "BUY" else 0.98))
+    if req.price <= 0:
+        return {"success": False, "msg": "주문 가격이 올바르지 않습니다."}
+
+    # 잔고 확인 ~ 주문 기록까지를 쓰기 의도 하나로 묶어서 작성자 큐에 넘깁니다. (커밋은 작성자가)
+    async def escrow_order(db):
+        # 3. 자산 선 차감 (체결 전이어도 돈/주식 먼저 묶어 둠)
+        total_amount = req.price * req.quantity
+
+        if side == "BUY":
+            cursor = await db.execute("SELECT balance FROM users WHERE id = ?", (req.user_id,))
+            user = await cursor.fetchone()
+            if not user or user['balance'] < total_amount:
+                return None, "현금이 부족합니다."
+            await db.execute("UPDATE users SET balance = balance - ? WHERE id = ?", (total_amount, req.user_id))
+
+        else:
+            cursor = await db.execute("SELECT quantity FROM holdings WHERE user_id = ? AND company_name = ?", (req.user_id, target_ticker))
+            holding = await cursor.fetchone()
+            if not holding or holding['quantity'] < req.quantity:
+                return None, "보유 주식이 부족합니다."
+            await db.execute("UPDATE holdings SET quantity = quantity - ? WHERE user_id = ? AND company_name = ?", (req.quantity, req.user_id, target_ticker))
+
+        # 4. 주문 기록 저장 (체결은 호가창에서)
+        cursor = await db.execute("""
+            INSERT INTO orders (user_id, company_name, order_type, price, quantity, status, game_date, created_at, filled_quantity)
+            VALUES (?, ?, ?, ?, ?, 'PENDING', ?, CURRENT_TIMESTAMP, 0)
+        """, (req.user_id, target_ticker, side, req.price, req.quantity, req.game_date))
+        return cursor.lastrowid, None
 
-    async with aiosqlite.connect("DB_PATH", timeout=30.0) as db:
-        db.row_factory = aiosqlite.Row
+    try:
+        order_id, error = await db_writer.submit(escrow_order)
+        if error:
+            return {"success": False, "msg": error}
+    except Exception as e:
+        print(f"🔥 주문 오류: {e}")
+        return {"success": False, "msg": f"서버 오류: {str(e)}"}
 
-        try:
-            # 2. 현재가 조회
-            current_market_price = None
+    # 5. 호가창에 올리고 바로 매칭 (체결분 반영은 비동기)
+    try:
+        filled = user_orders.submit(order_id, req.user_id, engine_ticker, target_ticker, side, req.price, req.quantity, submitted_at)
+    except Exception as e:
+        # 돈/주식은 이미 묶였으므로 호가창에서 내리고 남은 수량만큼 돌려준 뒤 주문을 취소 처리합니다.
+        # (실패 전에 체결된 수량은 그대로 정산되고, 되돌리기도 실패하면 주문을 다시 올려 PENDING 으로 둡니다)
+        print(f"🔥 호가창 등록 오류 (주문 {order_id}): {e}")
+        book_order = user_orders.open_orders.get(order_id)
+        remaining = user_orders.cancel(order_id)
+        if remaining == 0:
+            user_orders.reattach(order_id, book_order, 0)
+            filled = req.quantity
+        else:
             try:
-                # 1차 시도: 원래 있던 stocks 테이블에서 기호(symbol)로 찾기
-                cursor = await db.execute("SELECT current_price FROM stocks WHERE symbol = ?", (target_ticker,))
-                row = await cursor.fetchone()
-                if row: current_market_price = row[0]
-            except Exception:
-                pass
-
-            # 2차 시도: stocks에 없다면 혹시 companies 테이블에 있을까?
-            if current_market_price is None:
-                try:
-                    cursor = await db.execute("SELECT current_price FROM companies WHERE ticker = ? OR symbol = ?", (target_ticker, target_ticker))
-                    row = await cursor.fetchone()
-                    if row: current_market_price = row[0]
-                except Exception:
-                    pass
-
-            if current_market_price is None:
-                print(f"⚠️ [경고] DB에서 {target_ticker}의 가격을 못 찾았습니다. 유저 입력가({req.price}원)로 즉시 체결시킵니다.")
-                current_market_price = req.price
-
-            print(f"▶️ [주문 점검 완료] 대상: {target_ticker}, 현재가: {current_market_price}, 입력가: {req.price}")
-
-
-            # 3. 체결 조건 계산 (진짜 주식시장 로직 반영)
-            is_immediate_fill = False
-            
-            if current_market_price:
-                if req.order_type == "MARKET":
-                    is_immediate_fill = True
-                    req.price = current_market_price
-                else: # 지정가(LIMIT)일 경우
-                    if side == "BUY":
-                        # 내가 사려는 가격이 현재가보다 같거나 더 비싸면 -> 싼 현재가로 즉시 득템!
-                        if req.price >= current_market_price:
-                            is_immediate_fill = True
-                            req.price = current_market_price 
-                    elif side == "SELL":
-                        # 내가 팔려는 가격이 현재가보다 같거나 더 싸면 -> 비싼 현재가로 즉시 처분!
-                        if req.price <= current_market_price:
-                            is_immediate_fill = True
-                            req.price = current_market_price
-
-            # 자산 선 차감 로직 (미체결이어도 돈/주식 먼저 뺌)
-            total_amount = req.price * req.quantity
-            
-            if side == "BUY":
-                # 현금 확인
-                cursor = await db.execute("SELECT balance FROM users WHERE id = ?", (req.user_id,))
-                user = await cursor.fetchone()
-                if not user or user['balance'] < total_amount:
-                    return {"success": False, "msg": "현금이 부족합니다."}
-                
-                # 돈을 먼저 뺍니다! (PENDING 상태여도 차감됨)
-                await db.execute("UPDATE users SET balance = balance - ? WHERE id = ?", (total_amount, req.user_id))
-
-            elif side == "SELL":
-                # 주식 확인
-                cursor = await db.execute("SELECT quantity FROM holdings WHERE user_id = ? AND company_name = ?", (req.user_id, target_ticker))
-                holding = await cursor.fetchone()
-                if not holding or holding['quantity'] < req.quantity:
-                    return {"success": False, "msg": "보유 주식이 부족합니다."}
-                
-                # 주식을 먼저 뺍니다!
-                await db.execute("UPDATE holdings SET quantity = quantity - ? WHERE user_id = ? AND company_name = ?", (req.quantity, req.user_id, target_ticker))
-
-
-            # 5. 즉시 체결(FILLED) 시 후처리 (이미 뺀 자산 말고, 받을 자산만 지급)
-            status = "PENDING"
-            msg = "주문이 접수되었습니다. (미체결)"
-
-            if is_immediate_fill:
-                if side == "BUY":
-                    # 돈은 이미 뺐으니 주식만 넣어줌
-                    cursor = await db.execute("SELECT quantity FROM holdings WHERE user_id = ? AND company_name = ?", (req.user_id, target_ticker))
-                    holding = await cursor.fetchone()
-                    if holding:
-                        await db.execute("UPDATE holdings SET quantity = quantity + ? WHERE user_id = ? AND company_name = ?", (req.quantity, req.user_id, target_ticker))
-                    else:
-                        await db.execute("INSERT INTO holdings (user_id, company_name, quantity, average_price) VALUES (?, ?, ?, ?)", (req.user_id, target_ticker, req.quantity, req.price))
-                
-                elif side == "SELL":
-                    # 주식은 이미 뺐으니 돈만 넣어줌
-                    await db.execute("UPDATE users SET balance = balance + ? WHERE id = ?", (total_amount, req.user_id))
-
-                status = "FILLED"
-                msg = "즉시 체결 완료!"
-
-            # 6. 주문 기록 저장
-            await db.execute("""
-                INSERT INTO orders (user_id, company_name, order_type, price, quantity, status, game_date, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-            """, (req.user_id, target_ticker, side, req.price, req.quantity, status, req.game_date))
-            
-            order_id = cursor.lastrowid
-            await db.commit()
-            
-            return {"success": True, "status": status, "msg": msg, "order_id": order_id}
-
-        except Exception as e:
-            print(f"🔥 주문 오류: {e}")
-            return {"success": False, "msg": f"서버 오류: {str(e)}"}
+                await db_writer.submit(lambda db: cancel_and_refund(db, order_id, remaining))
+                return {"success": False, "msg": f"서버 오류: {str(e)} (묶어 둔 자산은 돌려드렸습니다)"}
+            except Exception as refund_error:
+                print(f"🔥 주문 되돌리기 실패 (주문 {order_id}): {refund_error}")
+                if remaining is not None:
+                    user_orders.reattach(order_id, book_order, remaining)
+                filled = req.quantity - (remaining if remaining is not None else req.quantity)
+
+    if filled >= req.quantity:
+        status, msg = "FILLED", "즉시 체결 완료!"
+    elif filled > 0:
+        status, msg = "PENDING", f"{filled}주 체결, {req.quantity - filled}주 미체결"
+    else:
+        status, msg = "PENDING", "주문이 접수되었습니다. (미체결)"
+    return {"success": True, "status": status, "msg": msg, "order_id": order_id, "filled_quantity": filled}
 
 @router.get("/orders/{user_id}")
 async def get_my_orders(user_id: int, db: aiosqlite.Connection = Depends(get_db_connection)):
@@ -444,144 +422,119 @@ async def get_my_orders(user_id: int, db: aiosqlite.Connection = Depends(get_db_
     rows = await cursor.fetchall()
     return [dict(row) for row in rows]
 
-@router.delete("/order/{order_id}")
-async def cancel_order(order_id: int, db: aiosqlite.Connection = Depends(get_db_connection)):
+async def cancel_and_refund(db, order_id, remaining):
     """
-    [주문 취소 - 디버깅 모드]
-    서버가 보는 실제 데이터를 터미널에 출력합니다.
+    주문을 CANCELLED 로 바꾸고 묶어 둔 돈/주식을 돌려주는 쓰기 의도.
+    remaining: 호가창에 남아 있던 수량 (호가창에 없던 주문이면 None -> DB 기준)
     """
-    print(f"\n🔍 [주문 취소 시도] 요청된 주문 ID: {order_id}")
+    # 1. 주문 조회
+    cursor = await db.execute("SELECT * FROM orders WHERE id = ?", (order_id,))
+    columns = [description[0] for description in cursor.description]
+    row = await cursor.fetchone()
     
-    try:
-        await db.execute("BEGIN IMMEDIATE")
+    if not row:
+        print(f"❌ [오류] ID {order_id}번 주문이 DB에 아예 없습니다.")
+        raise HTTPException(status_code=404, detail="주문을 찾을 수 없습니다.")
         
-        # 1. 주문 조회
-        cursor = await db.execute("SELECT * FROM orders WHERE id = ?", (order_id,))
-        columns = [description[0] for description in cursor.description]
-        row = await cursor.fetchone()
-        
-        if not row:
-            print(f"❌ [오류] ID {order_id}번 주문이 DB에 아예 없습니다.")
-            raise HTTPException(status_code=404, detail="주문을 찾을 수 없습니다.")
-            
-        # 데이터를 딕셔너리로 만듦 (안전장치)
-        order = dict(zip(columns, row))
-        
-        print(f"📄 [DB 데이터 확인] {order}")
-        print(f"🧐 [상태 점검] DB에 저장된 상태: '{order['status']}'")
+    # 데이터를 딕셔너리로 만듦 (안전장치)
+    order = dict(zip(columns, row))
+    
+    print(f"📄 [DB 데이터 확인] {order}")
+    print(f"🧐 [상태 점검] DB에 저장된 상태: '{order['status']}'")
 
-        # 2. 상태 확인 (공백 제거 후 비교)
-        current_status = order['status'].strip()
+    # 2. 상태 확인 (공백 제거 후 비교)
+    current_status = order['status'].strip()
+    
+    if current_status != 'PENDING':
+        print(f"🚫 [거절] 상태가 PENDING이 아니라서 취소 불가. (현재: {current_status})")
+        raise HTTPException(status_code=400, detail=f"취소 불가: 현재 상태가 '{current_status}' 입니다.")
+        
+    # 3. 환불 절차 (호가창에 남아 있던 수량 기준, 호가창에 없던 주문이면 DB 기준)
+    user_id = order['user_id']
+    price = order['price']
+    quantity = remaining if remaining is not None else order['quantity'] - (order.get('filled_quantity') or 0)
+    
+    if order['order_type'] == 'BUY':
+        refund = price * quantity
+        await db.execute("UPDATE users SET balance = balance + ? WHERE id = ?", (refund, user_id))
+        print(f"💰 [환불] 유저 {user_id}에게 {refund}원 환불 완료")
         
-        if current_status != 'PENDING':
-            print(f"🚫 [거절] 상태가 PENDING이 아니라서 취소 불가. (현재: {current_status})")
-            raise HTTPException(status_code=400, detail=f"취소 불가: 현재 상태가 '{current_status}' 입니다.")
-            
-        # 3. 환불 절차
-        user_id = order['user_id']
-        price = order['price']
-        quantity = order['quantity']
+    elif order['order_type'] == 'SELL':
+        await db.execute("UPDATE holdings SET quantity = quantity + ? WHERE user_id = ? AND company_name = ?", (quantity, user_id, order['company_name']))
+        print(f"📦 [반환] 유저 {user_id}에게 {order['company_name']} {quantity}주 반환 완료")
         
-        if order['order_type'] == 'BUY':
-            refund = price * quantity
-            await db.execute("UPDATE users SET balance = balance + ? WHERE id = ?", (refund, user_id))
-            print(f"💰 [환불] 유저 {user_id}에게 {refund}원 환불 완료")
-            
-        elif order['order_type'] == 'SELL':
-            await db.execute("UPDATE holdings SET quantity = quantity + ? WHERE user_id = ? AND company_name = ?", (quantity, user_id, order['company_name']))
-            print(f"📦 [반환] 유저 {user_id}에게 {order['company_name']} {quantity}주 반환 완료")
-            
-        # 4. 상태 변경
-        await db.execute("UPDATE orders SET status = 'CANCELLED' WHERE id = ?", (order_id,))
-        await db.commit()
+    # 4. 상태 변경
+    await db.execute("UPDATE orders SET status = 'CANCELLED' WHERE id = ?", (order_id,))
+
+@router.delete("/order/{order_id}")
+async def cancel_order(order_id: int):
+    """
+    [주문 취소 - 디버깅 모드]
+    서버가 보는 실제 데이터를 터미널에 출력합니다.
+    """
+    print(f"\n🔍 [주문 취소 시도] 요청된 주문 ID: {order_id}")
+
+    # 먼저 호가창에서 내려야 취소 도중에 더 체결되지 않습니다.
+    # DB 반영이 실패하면 주문은 여전히 PENDING 이므로 남은 수량 그대로 호가창에 되돌립니다.
+    book_order = user_orders.open_orders.get(order_id)
+    remaining = user_orders.cancel(order_id)
+    if remaining == 0:
+        user_orders.reattach(order_id, book_order, 0)   # 체결 반영이 끝날 때까지 다른 취소 요청도 거절
+        raise HTTPException(status_code=400, detail="취소 불가: 이미 모두 체결된 주문입니다.")
+
+    try:
+        await db_writer.submit(lambda db: cancel_and_refund(db, order_id, remaining))
         
         print("✅ [성공] 주문 취소 및 환불 완료\n")
         return {"status": "success", "message": "주문이 취소되었습니다."}
         
     except HTTPException as he:
-        await db.rollback()
+        if remaining is not None:
+            user_orders.reattach(order_id, book_order, remaining)
         raise he
     except Exception as e:
-        await db.rollback()
+        if remaining is not None:
+            user_orders.reattach(order_id, book_order, remaining)
         print(f"🔥 [시스템 에러] {str(e)}")
         raise HTTPException(status_code=500, detail=f"서버 에러: {str(e)}")
     
 # 테스트용 강제 체결 API (나중에 자동화될 예정)
 @router.post("/process_orders")
-async def process_market_price_change(company_name: str, current_price: float, db: aiosqlite.Connection = Depends(get_db_connection)):
+async def process_market_price_change(company_name: str, current_price: float):
     """
     [체결 엔진 시뮬레이션]
     특정 종목의 현재 가격이 변했다고 가정하고, 조건이 맞는 대기 주문을 체결시킵니다.
     - 매수 주문: 지정가 >= 현재가 (싸게 샀으니 이득, 체결)
     - 매도 주문: 지정가 <= 현재가 (비싸게 팔았으니 이득, 체결)
     """
-    processed_count = 0
-    
-    try:
-        await db.execute("BEGIN IMMEDIATE")
+    async def fill_pending(db):
+        # 주문별 SELECT/UPDATE 대신 집합 SQL 로 한꺼번에 체결 (호가창에 올라간 주문은 먼저 내림)
+        return await user_orders.execute_crossing(db, company_name, current_price)
         
-        # 1. 체결 가능한 매수 주문 찾기 (내가 건 가격보다 현재가가 싸거나 같으면 체결)
-        cursor = await db.execute("""
-            SELECT id, user_id, quantity, price FROM orders 
-            WHERE company_name = ? AND order_type = 'BUY' AND status = 'PENDING' AND price >= ?
-        """, (company_name, current_price))
-        buy_orders = await cursor.fetchall()
-        
-        for order in buy_orders:
-            # 주식 지급
-            h_cursor = await db.execute("SELECT quantity, average_price FROM holdings WHERE user_id = ? AND company_name = ?", (order['user_id'], company_name))
-            holding = await h_cursor.fetchone()
-            
-            if holding:
-                # 평단가 갱신 로직 (생략 가능하나 넣으면 좋음)
-                new_qty = holding['quantity'] + order['quantity']
-                new_avg = ((holding['quantity'] * holding['average_price']) + (order['quantity'] * order['price'])) / new_qty
-                await db.execute("UPDATE holdings SET quantity = ?, average_price = ? WHERE user_id = ? AND company_name = ?", (new_qty, new_avg, order['user_id'], company_name))
-            else:
-                await db.execute("INSERT INTO holdings (user_id, company_name, quantity, average_price) VALUES (?, ?, ?, ?)", (order['user_id'], company_name, order['quantity'], order['price']))
-            
-            # 주문 완료 처리
-            await db.execute("UPDATE orders SET status = 'FILLED' WHERE id = ?", (order['id'],))
-            
-            # 거래 기록 남기기
-            await db.execute("INSERT INTO transactions (user_id, transaction_type, amount, balance_after, description) VALUES (?, 'BUY', ?, 0, ?)", 
-                             (order['user_id'], -(order['price'] * order['quantity']), f"{company_name} {order['quantity']}주 지정가 체결"))
-            processed_count += 1
-
-        # 2. 체결 가능한 매도 주문 찾기 (내가 건 가격보다 현재가가 비싸거나 같으면 체결)
-        cursor = await db.execute("""
-            SELECT id, user_id, quantity, price FROM orders 
-            WHERE company_name = ? AND order_type = 'SELL' AND status = 'PENDING' AND price <= ?
-        """, (company_name, current_price))
-        sell_orders = await cursor.fetchall()
-        
-        for order in sell_orders:
-            # 판매 대금 지급
-            income = order['price'] * order['quantity']
-            await db.execute("UPDATE users SET balance = balance + ? WHERE id = ?", (income, order['user_id']))
-            
-            # 주문 완료 처리
-            await db.execute("UPDATE orders SET status = 'FILLED' WHERE id = ?", (order['id'],))
-            
-            # 거래 기록
-            await db.execute("INSERT INTO transactions (user_id, transaction_type, amount, balance_after, description) VALUES (?, 'SELL', ?, 0, ?)",
-                                (order['user_id'], income, f"{company_name} {order['quantity']}주 지정가 체결"))
-            processed_count += 1
-            
-        await db.commit()
+    try:
+        processed_count = await db_writer.submit(fill_pending)
         return {"status": "success", "message": f"{processed_count}건의 주문이 체결되었습니다."}
         
     except Exception as e:
-        await db.rollback()
         raise HTTPException(500, str(e))
     
 # 레벨 체크 디펜던시
-async def verify_level_5(db: aiosqlite.Connection = Depends(get_db_connection)):
+# 레벨은 내려가지 않으므로 LV.5 이상으로 확인된 유저는 다시 조회하지 않고,
+# 아직 못 미친 유저만 LEVEL_CACHE_TTL 초마다 다시 확인합니다.
+LEVEL_CACHE_TTL = 30.0
+_level_cache = {}   # user_id -> (레벨, 확인한 시각)
+
+async def verify_level_5():
     user_id = 1
-    cursor = await db.execute("SELECT level FROM users WHERE id = ?", (user_id,))
-    row = await cursor.fetchone()
-    
-    current_level = row[0] if row else 1
+    cached = _level_cache.get(user_id)
+    if cached and (cached[0] >= 5 or time.monotonic() - cached[1] < LEVEL_CACHE_TTL):
+        current_level = cached[0]
+    else:
+        async with db_pool.acquire() as db:
+            cursor = await db.execute("SELECT level FROM users WHERE id = ?", (user_id,))
+            row = await cursor.fetchone()
+        current_level = row[0] if row else 1
+        _level_cache[user_id] = (current_level, time.monotonic())
     
     if current_level < 5:
         raise HTTPException(
@@ -590,21 +543,42 @@ async def verify_level_5(db: aiosqlite.Connection = Depends(get_db_connection)):
         )
     return True
 
+def orderbook_response(request: Request, ticker: str, depth: int, render, variant: str, price=None):
+    """
+    엔진 호가 스냅샷을 ETag 와 함께 돌려줍니다.
+    호가창이 그대로면 캐시된 JSON 을 쓰고, 클라이언트가 같은 ETag 를 들고 오면 304.
+    """
+    etag, body = market_engine.depth_payload(ticker, depth, render, variant=variant, price=price)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if SnapshotCache.matches(request.headers.get("if-none-match"), etag):
+        market_engine.depth_cache.stats["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 # 호가창 API
 @router.get("/orderbook/{company_name}")
 async def get_order_book(
     company_name: str, 
+    request: Request,
+    depth: int = 5,
     is_authorized: bool = Depends(verify_level_5)
 ):
     """
     [호가창 조회]
     레벨 5 이상인 유저만 주식의 매수/매도 대기 물량을 볼 수 있습니다.
     """
-    return {
-        "company": company_name,
-        "asks": [{"price": 81000, "qty": 10}, {"price": 82000, "qty": 50}], # 팔려는 사람
-        "bids": [{"price": 79000, "qty": 20}, {"price": 78000, "qty": 100}] # 살려는 사람
-    }
+    ticker = user_orders.resolve_ticker(company_name)
+    if ticker is None:
+        raise HTTPException(status_code=404, detail="종목을 찾을 수 없습니다.")
+
+    def render(snap):
+        return {
+            "company": company_name,
+            "version": snap["version"],
+            "asks": [{"price": p, "qty": q} for p, q in snap["asks"]], # 팔려는 사람
+            "bids": [{"price": p, "qty": q} for p, q in snap["bids"]], # 살려는 사람
+        }
+    return orderbook_response(request, ticker, max(1, min(depth, 50)), render, variant=f"trade:{company_name}")
 
 @router.get("/orders/all/{user_id}")
 async def get_all_orders_all(user_id: int, db: aiosqlite.Connection = Depends(get_db_connection)):
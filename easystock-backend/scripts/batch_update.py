@@ -1,10 +1,15 @@
 import os
+import re
 import sys
-import sqlite3
+import json
 import time
+import asyncio
+import sqlite3
+import hashlib
+import unicodedata
 import requests
-import xml.etree.ElementTree as ET 
-import random
+import xml.etree.ElementTree as ET
+from urllib.parse import quote
 
 # 1. 경로 설정
 current_file = os.path.abspath(__file__)
@@ -15,7 +20,7 @@ os.chdir(backend_root)
 
 try:
     from core.agent_service import StockAgentService
-    from database import DB_NAME 
+    from database import DB_PATH
 except ImportError:
     DB_PATH = "/home/site/wwwroot/stock_game.db" if os.getenv("WEBSITE_HOSTNAME") else "stock_game.db"
     from core.agent_service import StockAgentService
@@ -23,51 +28,134 @@ except ImportError:
 # 기업 매핑 규칙
 REAL_NEWS_TARGETS = [
     {
-        "real_name": "삼성전자", 
-        "game_name": "삼송전자", 
+        "real_name": "삼성전자",
+        "game_name": "삼송전자",
         "category": "전자",
         "replacements": {"삼성전자": "삼송전자", "삼성": "삼송", "Samsung": "Samsong", "갤럭시": "갤락수"}
     },
     {
-        "real_name": "Microsoft", 
-        "game_name": "마이크로하드", 
+        "real_name": "Microsoft",
+        "game_name": "마이크로하드",
         "category": "IT",
         "replacements": {"Microsoft": "Microhard", "마이크로소프트": "마이크로하드", "Windows": "Doors"}
     }
 ]
 
-def fetch_real_news_headlines(query, count=10):
-    """Google News RSS에서 제목과 실제 언론사 이름을 추출합니다."""
-    url = f"https://news.google.com/rss/search?q={query}&hl=ko&gl=KR&ceid=KR:ko"
+# ------------------------------------------------------------------
+# 실제 뉴스 수집 파이프라인: 수집 -> 중복 제거 -> 변환 -> 일괄 저장
+# - 수집: 대상별 RSS 를 동시에 받고, ETag/Last-Modified 를 파일에 남겨 다음 실행 때 조건부 GET.
+#   (304 면 그 피드는 새 기사가 없으므로 건너뜀)
+# - 중복 제거: 원문 제목을 정규화한 해시를 news.source_hash 에 저장해 두고, 이미 있는 기사는
+#   LLM 에 보내지 않습니다.
+# - 변환: 최대 TRANSFORM_CONCURRENCY 개 LLM 호출을 동시에 (큐 + 워커)
+# - 저장: 변환된 기사를 한 트랜잭션으로 넣습니다.
+# 변환에 실패한 기사가 있는 피드는 검증값(ETag)을 갱신하지 않아서 다음 실행에 다시 시도됩니다.
+# RSS 주소는 NEWS_RSS_URL 로 바꿀 수 있습니다. (로컬 픽스처 서버 테스트용, {query} 자리에 검색어)
+# ------------------------------------------------------------------
+RSS_URL = os.getenv("NEWS_RSS_URL", "https://news.google.com/rss/search?q={query}&hl=ko&gl=KR&ceid=KR:ko")
+FETCH_TIMEOUT = 10
+ARTICLES_PER_TARGET = 10
+TRANSFORM_CONCURRENCY = int(os.getenv("BATCH_TRANSFORM_CONCURRENCY", "4"))
+TRANSFORM_CACHE = os.getenv("BATCH_CACHE", "reuse")     # 같은 기사 + 같은 규칙이면 이전 변환 결과 재사용 (fresh / off)
+HTTP_CACHE_PATH = os.path.join(scripts_folder, "batch_update.http_cache.json")
+HASH_CHUNK = 500        # IN (...) 한 번에 넣는 해시 수 (SQLite 변수 개수 제한)
+
+INSERT_SQL = """
+    INSERT INTO news (
+        company_name, category, title, content, summary,
+        sentiment, impact_score, ticker, source, published_at, source_hash
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'), ?)
+"""
+
+
+def rss_url(query):
+    return RSS_URL.format(query=quote(query))
+
+
+def title_hash(title, source=None):
+    """언론사 꼬리(' - 언론사'), 대소문자, 공백/문장부호 차이를 무시한 제목 해시"""
+    title = unicodedata.normalize("NFKC", title or "")
+    if source and title.endswith(f" - {source}"):
+        title = title[: -len(source) - 3]
+    normalized = re.sub(r"[\W_]+", "", title.casefold())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def load_http_cache():
+    if not os.path.exists(HTTP_CACHE_PATH):
+        return {}
+    try:
+        with open(HTTP_CACHE_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_http_cache(cache):
+    tmp_path = HTTP_CACHE_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, HTTP_CACHE_PATH)
+
+
+def fetch_real_news_headlines(query, count=10, validators=None):
+    """
+    Google News RSS에서 제목과 실제 언론사 이름을 추출합니다.
+    validators: 이전 응답의 {"etag", "last_modified"} - 있으면 조건부 GET 을 하고,
+    새 응답의 검증값은 validators["next"] 에 담아 돌려줍니다. (304 면 빈 목록)
+    """
+    validators = validators if validators is not None else {}
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
     try:
-        response = requests.get(url, timeout=10)
+        response = requests.get(rss_url(query), headers=headers, timeout=FETCH_TIMEOUT)
+        if response.status_code == 304:
+            validators["not_modified"] = True
+            return []
+        response.raise_for_status()
+        validators["next"] = {"etag": response.headers.get("ETag"),
+                              "last_modified": response.headers.get("Last-Modified")}
         root = ET.fromstring(response.content)
         articles = []
         for item in root.findall('.//item')[:count]:
-            title = item.find('title').text
+            title = item.findtext('title')
+            if not title:
+                continue
             source_element = item.find('source')
             source_name = source_element.text if source_element is not None else "경제신문"
-            articles.append({"title": title, "source": source_name})
+            articles.append({"title": title, "source": source_name, "hash": title_hash(title, source_name)})
         return articles
-    except: return []
+    except Exception as e:
+        print(f" -> ⚠️ RSS 수집 실패 ({query}): {e}")
+        return []
 
-def run_real_news_batch():
-    agent = StockAgentService()
-    db_path = os.path.join(backend_root, DB_NAME)
-    print(f"\n🌍 [Real-World Connect] 실제 언론사 정보를 포함하여 수집을 시작합니다.")
 
-    for target in REAL_NEWS_TARGETS:
-        real_name = target['real_name']
-        game_name = target['game_name']
-        
-        real_articles = fetch_real_news_headlines(real_name, count=10)
-        if not real_articles: continue
-
-        for article in real_articles:
-            print(f" ✍️ [{article['source']}] 실제 기사 변환 중...", end="", flush=True)
-            
-            prompt = f"""
-            아래 실제 기사(출처: {article['source']})를 바탕으로 '{game_name}'의 패러디 기사를 만드세요.
+def ensure_news_columns(conn):
+    """source / source_hash 컬럼이 없으면 추가 (자동 수리), 해시 조회용 색인"""
+    cols = {c[1] for c in conn.execute("PRAGMA table_info(news)")}
+    if 'source' not in cols:
+        conn.execute("ALTER TABLE news ADD COLUMN source TEXT")
+    if 'source_hash' not in cols:
+        conn.execute("ALTER TABLE news ADD COLUMN source_hash TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_news_source_hash ON news(source_hash) WHERE source_hash IS NOT NULL")
+
+
+def known_hashes(conn, hashes):
+    hashes = list(hashes)
+    found = set()
+    for i in range(0, len(hashes), HASH_CHUNK):
+        chunk = hashes[i:i + HASH_CHUNK]
+        placeholders = ",".join("?" * len(chunk))
+        found.update(r[0] for r in conn.execute(f"SELECT source_hash FROM news WHERE source_hash IN ({placeholders})", chunk))
+    return found
+
+
+def parody_prompt(target, article):
+    return f"""
+            아래 실제 기사(출처: {article['source']})를 바탕으로 '{target['game_name']}'의 패러디 기사를 만드세요.
             실제 제목: {article['title']}
             변환 규칙: {target['replacements']}
 
@@ -82,64 +170,136 @@ def run_real_news_batch():
                 }}
             ]
             """
-            analysis = agent.analyze_stock_news(prompt, mode="direct") 
-            
-            if analysis:
-                # 리스트라면 첫 번째 항목만 꺼내서 딕셔너리로 만듭니다.
-                if isinstance(analysis, list) and len(analysis) > 0:
-                    final_news = analysis[0]
-                else:
-                    final_news = analysis
-                
-                # 실제 RSS에서 가져온 언론사 이름을 AI 응답 데이터에 합칩니다.
-                if isinstance(final_news, dict):
-                    final_news['source'] = article['source']
-                    # 저장 함수 호출
-                    save_to_db(db_path, game_name, target['category'], real_name, final_news)
-                    print(f" -> ✅ 저장 완료 ({article['source']})")
-                else:
-                    print(" -> ❌ 데이터 변환 실패")
-            
-            time.sleep(1)
-
-def save_to_db(db_path, game_name, category, real_name, news):
-    """DB에 뉴스를 저장합니다 (source 컬럼 포함)."""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
+
+
+def to_row(target, article, news):
+    # 점수 보정 (Negative는 음수로)
     try:
-        # source 컬럼이 있는지 확인하고 없으면 추가 (자동 수리)
-        cursor.execute("PRAGMA table_info(news)")
-        cols = [c[1] for c in cursor.fetchall()]
-        if 'source' not in cols:
-            cursor.execute("ALTER TABLE news ADD COLUMN source TEXT")
-
-        # 점수 보정 (Negative는 음수로)
-        score = abs(news.get('impact_score', 0))
-        if 'negative' in str(news.get('sentiment', '')).lower(): 
-            score = -score
-
-        cursor.execute("""
-            INSERT INTO news (
-                company_name, category, title, content, summary, 
-                sentiment, impact_score, ticker, source, published_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))
-        """, (
-            game_name,
-            category,
-            news.get('title'),
-            news.get('content'),
-            news.get('summary'),
-            news.get('sentiment'),
-            score,
-            real_name,
-            news.get('source')
-        ))
-        conn.commit()
-    except Exception as e:
-        print(f" -> ❌ DB 저장 중 에러: {e}")
+        score = abs(int(news.get('impact_score', 0)))
+    except (TypeError, ValueError):
+        score = 0
+    if 'negative' in str(news.get('sentiment', '')).lower():
+        score = -score
+    return (
+        target['game_name'],
+        target['category'],
+        news.get('title'),
+        news.get('content'),
+        news.get('summary'),
+        news.get('sentiment'),
+        score,
+        target['real_name'],
+        article['source'],      # 실제 RSS에서 가져온 언론사 이름
+        article['hash'],
+    )
+
+
+def save_to_db(db_path, rows):
+    """변환된 뉴스를 한 트랜잭션으로 저장합니다. 저장한 행 수를 반환합니다."""
+    if not rows:
+        return 0
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        with conn:
+            ensure_news_columns(conn)
+            conn.executemany(INSERT_SQL, rows)
+    finally:
+        conn.close()
+    return len(rows)
+
+
+async def transform_all(agent, jobs):
+    """(target, article) 목록을 워커 TRANSFORM_CONCURRENCY 개로 변환합니다. (성공한 행 목록, 실패한 피드 URL 집합)"""
+    queue = asyncio.Queue(maxsize=TRANSFORM_CONCURRENCY * 2)
+    rows, failed_urls = [], set()
+
+    async def worker():
+        while True:
+            job = await queue.get()
+            if job is None:
+                return
+            target, article = job
+            try:
+                analysis = await agent.generate_news_async(parody_prompt(target, article), cache=TRANSFORM_CACHE)
+            except Exception as e:
+                print(f" -> ⚠️ 변환 오류: {e}")
+                analysis = None
+            # 리스트라면 첫 번째 항목만 꺼내서 딕셔너리로 만듭니다.
+            final_news = analysis[0] if isinstance(analysis, list) and analysis else analysis
+            if isinstance(final_news, dict):
+                rows.append(to_row(target, article, final_news))
+                print(f" ✍️ [{article['source']}] {target['game_name']} 변환 완료")
+            else:
+                failed_urls.add(rss_url(target['real_name']))
+                print(f" ❌ [{article['source']}] 데이터 변환 실패")
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, TRANSFORM_CONCURRENCY))]
+    for job in jobs:
+        await queue.put(job)
+    for _ in workers:
+        await queue.put(None)
+    await asyncio.gather(*workers)
+    return rows, failed_urls
+
+
+async def run_pipeline(agent, targets=REAL_NEWS_TARGETS, db_path=None):
+    db_path = db_path or os.path.join(backend_root, DB_PATH)
+    started = time.perf_counter()
+    cache = load_http_cache()
+
+    # 1. 수집 (대상별 동시, 조건부 GET)
+    validators = {rss_url(t['real_name']): dict(cache.get(rss_url(t['real_name']), {})) for t in targets}
+    fetched = await asyncio.gather(*(
+        asyncio.to_thread(fetch_real_news_headlines, t['real_name'], ARTICLES_PER_TARGET, validators[rss_url(t['real_name'])])
+        for t in targets
+    ))
+    fetch_sec = time.perf_counter() - started
+    not_modified = sum(1 for v in validators.values() if v.get("not_modified"))
+
+    # 2. 중복 제거 (이번 수집분 안에서 + news 테이블에 이미 있는 기사)
+    candidates = {}
+    for target, articles in zip(targets, fetched):
+        for article in articles:
+            candidates.setdefault(article['hash'], (target, article))
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        with conn:
+            ensure_news_columns(conn)
+        existing = known_hashes(conn, candidates)
     finally:
         conn.close()
+    jobs = [job for h, job in candidates.items() if h not in existing]
+
+    # 3. 변환 (LLM, 동시 호출 제한)
+    transform_started = time.perf_counter()
+    rows, failed_urls = await transform_all(agent, jobs) if jobs else ([], set())
+    transform_sec = time.perf_counter() - transform_started
+
+    # 4. 일괄 저장
+    saved = save_to_db(db_path, rows)
+
+    # 저장까지 끝난 피드만 검증값 갱신 (실패한 기사가 있으면 다음 실행에서 다시 받기)
+    for url, v in validators.items():
+        if "next" in v and url not in failed_urls:
+            cache[url] = v["next"]
+    save_http_cache(cache)
+
+    elapsed = time.perf_counter() - started
+    total_articles = sum(len(a) for a in fetched)
+    print(f"\n📊 피드 {len(targets)}개 (304 {not_modified}개, {fetch_sec * 1000:.0f}ms) | 기사 {total_articles}건 중 "
+          f"중복 {total_articles - len(jobs)}건 건너뜀 | 변환 {len(rows)}/{len(jobs)}건 ({transform_sec:.1f}초) | 저장 {saved}건")
+    print(f"⏱️ 총 {elapsed:.1f}초")
+    cache_stats = agent.cache_snapshot()
+    if cache_stats:
+        print(f"🗄️ LLM 캐시 ({TRANSFORM_CACHE}): {json.dumps(cache_stats, ensure_ascii=False)}")
+    return {"fetched": total_articles, "not_modified": not_modified, "transformed": len(rows),
+            "skipped": total_articles - len(jobs), "saved": saved, "elapsed_sec": round(elapsed, 3)}
+
+
+def run_real_news_batch():
+    print(f"\n🌍 [Real-World Connect] 실제 언론사 정보를 포함하여 수집을 시작합니다.")
+    agent = StockAgentService()
+    return asyncio.run(run_pipeline(agent))
 
 if __name__ == "__main__":
-    run_real_news_batch()
\ No newline at end of file
+    run_real_news_batch()
@@ -0,0 +1,214 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+from types import SimpleNamespace as NS
+
+# 1. 경로 설정
+current_file = os.path.abspath(__file__)
+scripts_folder = os.path.dirname(current_file)
+backend_root = os.path.dirname(scripts_folder)
+if backend_root not in sys.path: sys.path.insert(0, backend_root)
+
+from core.agent_service import StockAgentService
+
+# 오프라인 벤치마크: Azure 대신 메모리 안의 가짜 Assistants API 로
+# 예전 1초 폴링 루프와 스트리밍 / 적응형 폴링 / chat 직통 경로의 호출 지연과 왕복 횟수를 비교합니다.
+# 가짜 서버의 run 처리 시간은 RUN_SEC 근처에서 흔들리고, 요청 한 번마다 RTT_SEC 만큼 걸립니다.
+RUN_SEC = 1.3
+RTT_SEC = 0.03
+CALLS = 8
+CONCURRENCY = 4
+ANSWER = json.dumps([{"title": "가짜 헤드라인", "content": "본문", "summary": "요약",
+                      "sentiment": "negative", "impact_score": 42}], ensure_ascii=False)
+
+
+def assistant_message():
+    return NS(role="assistant", content=[NS(text=NS(value=ANSWER))])
+
+
+class FakeServer:
+    """runs 는 만든 시각 + 처리 시간이 지나면 completed 로 보입니다."""
+    def __init__(self, seed=7):
+        self.rng = random.Random(seed)
+        self.runs = {}
+        self.requests = 0
+
+    def new_run(self, thread_id):
+        run_id = f"run_{len(self.runs)}"
+        self.runs[run_id] = (thread_id, time.monotonic() + RUN_SEC * self.rng.uniform(0.7, 1.3))
+        return self.run(thread_id, run_id)
+
+    def run(self, thread_id, run_id):
+        done_at = self.runs[run_id][1]
+        status = "completed" if time.monotonic() >= done_at else "in_progress"
+        return NS(id=run_id, thread_id=thread_id, status=status, last_error=None)
+
+    def remaining(self, run_id):
+        return max(0.0, self.runs[run_id][1] - time.monotonic())
+
+
+# ------------------------------------------------------------------
+# 동기 클라이언트 (예전 _call_llm / 새 _call_llm)
+# ------------------------------------------------------------------
+class SyncStream:
+    def __init__(self, server, run):
+        self.server, self.run = server, run
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+
+    def __iter__(self):
+        yield NS(event="thread.run.created", data=self.run)
+        time.sleep(self.server.remaining(self.run.id))
+        yield NS(event="thread.message.completed", data=assistant_message())
+        yield NS(event="thread.run.completed", data=self.server.run(self.run.thread_id, self.run.id))
+
+
+class FakeClient:
+    def __init__(self, server):
+        s = server
+
+        def call(fn):
+            def wrapped(*args, **kwargs):
+                s.requests += 1
+                time.sleep(RTT_SEC)
+                return fn(*args, **kwargs)
+            return wrapped
+
+        def create_and_run(assistant_id, thread, stream=False):
+            run = s.new_run(f"thread_{len(s.runs)}")
+            return SyncStream(s, run) if stream else run
+
+        self.beta = NS(threads=NS(
+            create=call(lambda: NS(id=f"thread_{len(s.runs)}")),
+            create_and_run=call(create_and_run),
+            messages=NS(create=call(lambda **kw: None),
+                        list=call(lambda thread_id, **kw: NS(data=[assistant_message()]))),
+            runs=NS(create=call(lambda thread_id, assistant_id: s.new_run(thread_id)),
+                    retrieve=call(lambda thread_id, run_id: s.run(thread_id, run_id))),
+        ))
+        self.chat = NS(completions=NS(create=call(self._chat)))
+        self.server = s
+
+    def _chat(self, model, messages):
+        # chat 경로는 스레드/런 관리 없이 생성 시간만큼만 걸린다고 봅니다.
+        time.sleep(RUN_SEC * self.server.rng.uniform(0.7, 1.3))
+        return NS(choices=[NS(message=NS(content=ANSWER))])
+
+
+# ------------------------------------------------------------------
+# 비동기 클라이언트 (새 _acall_llm)
+# ------------------------------------------------------------------
+class AsyncStream:
+    def __init__(self, server, run):
+        self.server, self.run = server, run
+
+    async def __aenter__(self): return self
+    async def __aexit__(self, *exc): return False
+
+    async def __aiter__(self):
+        yield NS(event="thread.run.created", data=self.run)
+        await asyncio.sleep(self.server.remaining(self.run.id))
+        yield NS(event="thread.message.completed", data=assistant_message())
+        yield NS(event="thread.run.completed", data=self.server.run(self.run.thread_id, self.run.id))
+
+
+class FakeAsyncClient:
+    def __init__(self, server):
+        s = server
+
+        def call(fn):
+            async def wrapped(*args, **kwargs):
+                s.requests += 1
+                await asyncio.sleep(RTT_SEC)
+                return await fn(*args, **kwargs) if asyncio.iscoroutinefunction(fn) else fn(*args, **kwargs)
+            return wrapped
+
+        def create_and_run(assistant_id, thread, stream=False):
+            run = s.new_run(f"thread_{len(s.runs)}")
+            return AsyncStream(s, run) if stream else run
+
+        async def chat(model, messages):
+            await asyncio.sleep(RUN_SEC * s.rng.uniform(0.7, 1.3))
+            return NS(choices=[NS(message=NS(content=ANSWER))])
+
+        self.beta = NS(threads=NS(
+            create_and_run=call(create_and_run),
+            messages=NS(list=call(lambda thread_id, **kw: NS(data=[assistant_message()]))),
+            runs=NS(retrieve=call(lambda thread_id, run_id: s.run(thread_id, run_id))),
+        ))
+        self.chat = NS(completions=NS(create=call(chat)))
+
+
+def legacy_call_llm(client, agent_id, prompt):
+    # 예전 _call_llm: 스레드/메시지/런을 따로 만들고 1초마다 상태 조회
+    thread = client.beta.threads.create()
+    client.beta.threads.messages.create(thread_id=thread.id, role="user", content=prompt)
+    run = client.beta.threads.runs.create(thread_id=thread.id, assistant_id=agent_id)
+    while run.status in ['queued', 'in_progress', 'cancelling']:
+        time.sleep(1)
+        run = client.beta.threads.runs.retrieve(thread_id=thread.id, run_id=run.id)
+    messages = client.beta.threads.messages.list(thread_id=thread.id)
+    return next(m.content[0].text.value for m in messages.data if m.role == "assistant")
+
+
+def make_agent(server, transport):
+    agent = StockAgentService(mode="virtual", transport=transport, use_cache=False)
+    agent.client = FakeClient(server)
+    agent.async_client = FakeAsyncClient(server)
+    agent.agent_id = "asst_fake"
+    return agent
+
+
+def report(label, server, elapsed, calls):
+    print(f"{label:<34} 평균 {elapsed / calls * 1000:7.0f} ms/건   요청 {server.requests / calls:5.1f}회/건")
+
+
+async def bench_async(transport):
+    server = FakeServer()
+    agent = make_agent(server, transport)
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def one():
+        async with semaphore:
+            return await agent.analyze_stock_news_async("재웅시스템", mode="virtual", count=1)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one() for _ in range(CALLS)))
+    elapsed = time.perf_counter() - started
+    assert all(r and r[0]["impact_score"] == 42 for r in results)
+    print(f"{'async ' + transport + f' (동시 {CONCURRENCY})':<34} 전체 {elapsed * 1000:7.0f} ms        "
+          f"요청 {server.requests / CALLS:5.1f}회/건")
+    return agent
+
+
+def main():
+    print(f"가짜 run 처리 시간 ~{RUN_SEC}s, 요청당 RTT {RTT_SEC * 1000:.0f}ms, {CALLS}건\n")
+
+    server = FakeServer()
+    client = FakeClient(server)
+    started = time.perf_counter()
+    for _ in range(CALLS):
+        legacy_call_llm(client, "asst_fake", "프롬프트")
+    report("예전 1초 폴링 (순차)", server, time.perf_counter() - started, CALLS)
+
+    for transport in ("poll", "stream", "chat"):
+        server = FakeServer()
+        agent = make_agent(server, transport)
+        started = time.perf_counter()
+        for _ in range(CALLS):
+            assert agent.analyze_stock_news("재웅시스템", mode="virtual", count=1)
+        report(f"sync {transport} (순차)", server, time.perf_counter() - started, CALLS)
+
+    print()
+    for transport in ("poll", "stream", "chat"):
+        agent = asyncio.run(bench_async(transport))
+    print("\n지연 히스토그램 (마지막 async 실행):")
+    print(json.dumps(agent.latency_snapshot(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
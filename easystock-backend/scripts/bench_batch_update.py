@@ -0,0 +1,124 @@
+import os
+import sys
+import time
+import asyncio
+import hashlib
+import sqlite3
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# 1. 경로 설정
+current_file = os.path.abspath(__file__)
+scripts_folder = os.path.dirname(current_file)
+backend_root = os.path.dirname(scripts_folder)
+if backend_root not in sys.path: sys.path.insert(0, backend_root)
+
+from scripts import batch_update
+
+# 오프라인 벤치마크: 로컬 RSS 픽스처 서버(ETag 지원)와 가짜 LLM 으로 batch_update 파이프라인을 세 번 돌립니다.
+# 1회차: 전부 수집/변환, 2회차: 피드가 그대로라 304 -> LLM 호출 0, 3회차: 새 기사만 변환.
+FEED_DELAY = 0.3        # 피드 응답 지연 (초)
+LLM_DELAY = 0.2         # 기사 한 건 변환 시간 (초)
+SOURCES = ["연합뉴스", "한국경제", "매일경제", "조선비즈", "ZDNet Korea"]
+
+
+class Feeds:
+    def __init__(self):
+        self.items = {t["real_name"]: [f"{t['real_name']} 관련 소식 {i}번째" for i in range(8)]
+                      for t in batch_update.REAL_NEWS_TARGETS}
+        self.requests = 0
+        self.not_modified = 0
+
+    def body(self, query):
+        items = "".join(
+            f"<item><title>{title} - {SOURCES[i % len(SOURCES)]}</title>"
+            f"<source url='https://example.com'>{SOURCES[i % len(SOURCES)]}</source></item>"
+            for i, title in enumerate(reversed(self.items.get(query, [])))
+        )
+        return f"<?xml version='1.0' encoding='UTF-8'?><rss><channel>{items}</channel></rss>".encode("utf-8")
+
+
+def make_handler(feeds):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            feeds.requests += 1
+            time.sleep(FEED_DELAY)
+            query = parse_qs(urlparse(self.path).query).get("q", [""])[0]
+            body = feeds.body(query)
+            etag = '"' + hashlib.md5(body).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                feeds.not_modified += 1
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/rss+xml; charset=utf-8")
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+    return Handler
+
+
+class FakeAgent:
+    def __init__(self):
+        self.calls = 0
+
+    def cache_snapshot(self):
+        return None
+
+    async def generate_news_async(self, prompt, cache="reuse"):
+        self.calls += 1
+        await asyncio.sleep(LLM_DELAY)
+        title = prompt.split("실제 제목:")[1].split("\n")[0].strip()
+        return [{"title": f"[패러디] {title}", "content": "본문", "summary": "요약",
+                 "sentiment": "negative" if self.calls % 2 else "positive", "impact_score": 40}]
+
+
+def main():
+    folder = tempfile.mkdtemp()
+    db_path = os.path.join(folder, "news.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("""CREATE TABLE news (id INTEGER PRIMARY KEY AUTOINCREMENT, ticker TEXT, company_name TEXT, category TEXT,
+                        title TEXT, content TEXT, summary TEXT, sentiment TEXT, impact_score INTEGER, published_at TEXT)""")
+
+    feeds = Feeds()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(feeds))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    batch_update.RSS_URL = f"http://127.0.0.1:{server.server_port}/rss?q={{query}}"
+    batch_update.HTTP_CACHE_PATH = os.path.join(folder, "http_cache.json")
+
+    n_articles = sum(len(v) for v in feeds.items.values())
+    legacy = len(feeds.items) * FEED_DELAY + n_articles * (LLM_DELAY + 1)
+    print(f"예전 순차 처리 추정 (피드 순차 + 기사마다 변환 후 1초 대기): {legacy:.1f}초, 매 실행 LLM {n_articles}회")
+
+    agent = FakeAgent()
+    for label, change in (("1회차 (처음)", None), ("2회차 (피드 변화 없음)", None), ("3회차 (기사 2건 추가)", "Microsoft")):
+        if change:
+            feeds.items[change] += [f"{change} 새 소식 A", f"{change} 새 소식 B"]
+        calls_before, requests_before = agent.calls, feeds.requests
+        print(f"\n=== {label} ===")
+        asyncio.run(batch_update.run_pipeline(agent, db_path=db_path))
+        print(f"  · RSS 요청 {feeds.requests - requests_before}회 (누적 304 {feeds.not_modified}회), LLM 호출 {agent.calls - calls_before}회")
+
+    with sqlite3.connect(db_path) as conn:
+        total, distinct = conn.execute("SELECT COUNT(*), COUNT(DISTINCT source_hash) FROM news").fetchone()
+    print(f"\nnews 테이블: {total}건 (source_hash 중복 {total - distinct}건)")
+
+    # ETag 캐시를 잃어도 (항상 200) 해시 중복 제거로 LLM 호출이 생기지 않는지 확인
+    os.remove(batch_update.HTTP_CACHE_PATH)
+    calls_before = agent.calls
+    print("\n=== ETag 캐시 삭제 후 재실행 ===")
+    asyncio.run(batch_update.run_pipeline(agent, db_path=db_path))
+    print(f"  · LLM 호출 {agent.calls - calls_before}회")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import os
+import sys
+import random
+from datetime import datetime, timedelta
+from collections import deque
+
+# 1. 경로 설정
+current_file = os.path.abspath(__file__)
+scripts_folder = os.path.dirname(current_file)
+backend_root = os.path.dirname(scripts_folder)
+if backend_root not in sys.path: sys.path.insert(0, backend_root)
+
+from core.decision_cache import DecisionCache
+
+# 오프라인 벤치마크: LLM 없이 시뮬레이션 1시간(60틱)을 흉내 내서
+# 결정 캐시가 있을 때/없을 때의 LLM 호출 수를 비교합니다.
+TICKERS = ["SS011", "JW004", "AT010", "MH012", "SH001", "ND008",
+           "JH005", "SE002", "IA009", "SW006", "QD007", "YJ003"]
+AGENTS = [f"WHALE_{i:03d}" for i in range(1, 26)] + [f"Citizen_{i:03d}" for i in range(1, 476)]
+ACTIVE_PER_TICK = 30
+TICKS_PER_HOUR = 60
+HOURS = 6
+
+def persona_of(agent_name):
+    # agent_society_brain.get_agent_persona 와 같은 구간 (LLM 클라이언트 없이 쓰려고 숫자만 계산)
+    mod = int(agent_name.split("_")[-1]) % 10
+    return ["Value", "Value", "Value", "Value", "Institutional", "Institutional",
+            "Contrarian", "Contrarian", "Aggressive", "Aggressive"][mod]
+
+def trend_of(history):
+    if len(history) < 2: return "정보 없음 (탐색 단계)"
+    start_p, end_p = history[0], history[-1]
+    if end_p > start_p * 1.02: return "🔥 급등세 (매수세 강함)"
+    elif end_p > start_p: return "📈 완만한 상승"
+    elif end_p < start_p * 0.98: return "😱 급락세 (투매 발생)"
+    elif end_p < start_p: return "📉 하락세"
+    return "⚖️ 보합세 (눈치보기)"
+
+def run(ttl):
+    rng = random.Random(7)
+    cache = DecisionCache(ttl=ttl)
+    prices = {t: rng.randint(10_000, 500_000) for t in TICKERS}
+    history = {t: deque([prices[t]], maxlen=20) for t in TICKERS}
+    news_id = {t: rng.randint(1, 100) for t in TICKERS}
+    cash = {a: (rng.randint(100_000_000, 500_000_000) if a.startswith("WHALE") else rng.randint(2_000_000, 5_000_000)) for a in AGENTS}
+    position = {a: {} for a in AGENTS}
+
+    sim_time = datetime(2026, 1, 5, 9, 0)
+    llm_calls = 0
+    for _ in range(TICKS_PER_HOUR * HOURS):
+        sim_time += timedelta(minutes=1)
+        for t in TICKERS:
+            prices[t] = max(100, int(prices[t] * (1 + rng.gauss(0, 0.002))))
+            history[t].append(prices[t])
+            if rng.random() < 0.02:   # 가끔 새 뉴스
+                news_id[t] += 1
+
+        for agent in rng.sample(AGENTS, ACTIVE_PER_TICK):
+            t = rng.choice(TICKERS)
+            qty = position[agent].get(t, 0)
+            key = DecisionCache.make_key(persona_of(agent), t, trend_of(history[t]), news_id[t], prices[t], qty, cash[agent])
+            now = sim_time.timestamp()
+            decision = cache.get(key, agent, now, prices[t], cash[agent], qty)
+            if decision is None:
+                llm_calls += 1
+                decision = {"action": rng.choice(["BUY", "SELL", "HOLD"]), "quantity": rng.randint(1, 50), "price": prices[t]}
+                cache.put(key, decision, now, prices[t])
+            if decision["action"] == "BUY":
+                position[agent][t] = qty + decision["quantity"]
+
+    total = TICKS_PER_HOUR * HOURS * ACTIVE_PER_TICK
+    stats = cache.snapshot()
+    print(f"📊 TTL {int(ttl):>5}s | LLM 호출/시뮬레이션 1시간: {llm_calls / HOURS:>7.1f} "
+          f"(캐시 없으면 {total / HOURS:.0f}) | 절감 {100 * (1 - llm_calls / total):5.1f}% | hit_rate {stats['hit_rate']}")
+
+if __name__ == "__main__":
+    for ttl in [300, 600, 1800, 3600]:
+        run(ttl)
@@ -0,0 +1,141 @@
+import os
+import sys
+import time
+import random
+import asyncio
+import tempfile
+import aiosqlite
+
+# 1. 경로 설정
+current_file = os.path.abspath(__file__)
+scripts_folder = os.path.dirname(current_file)
+backend_root = os.path.dirname(scripts_folder)
+if backend_root not in sys.path: sys.path.insert(0, backend_root)
+
+from core.leaderboard import Leaderboard
+from services.leaderboard import SNAPSHOT_SQL, INITIAL_CAPITAL
+
+# 오프라인 벤치마크: 유저 10만 명(종목 12개 중 평균 3개 보유)으로
+# 메모리 랭킹의 증분 갱신/조회 비용과, ranking_snapshot 을 채우는 예전 유저별 루프(N+1 쿼리)와 집합 SQL 한 번을 비교합니다.
+N_USERS = 100_000
+COMPANIES = [f"종목{i:02d}" for i in range(12)]
+
+def make_data(seed=7):
+    rng = random.Random(seed)
+    prices = {name: rng.randint(10, 500) * 100 for name in COMPANIES}
+    users = {}
+    for uid in range(1, N_USERS + 1):
+        picks = rng.sample(COMPANIES, rng.randint(1, 5))
+        holdings = {name: (rng.randint(1, 200), prices[name] * rng.uniform(0.8, 1.2)) for name in picks}
+        users[uid] = (f"user{uid}", rng.randint(0, 3_000_000), holdings)
+    return rng, prices, users
+
+def timed(label, fn, repeat=1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    elapsed = (time.perf_counter() - started) / repeat
+    print(f"{label:<40} {elapsed * 1000:10.3f} ms")
+    return result
+
+def bench_memory(rng, prices, users):
+    board = Leaderboard()
+
+    def build():
+        for name, price in prices.items():
+            board.prices[name] = price
+        for uid, (username, cash, holdings) in users.items():
+            board.upsert_user(uid, username, cash, holdings=holdings)
+        return board.top(100)
+    timed("메모리 적재 + 첫 정렬 (10만 명)", build)
+
+    name = COMPANIES[0]
+    print(f"  · {name} 보유자 {len(board.holders[name]):,}명")
+    timed("가격 변경 1종목 + 재정렬", lambda: (board.set_price(name, board.prices[name] + 100), board.top(100)), repeat=5)
+
+    def one_user():
+        uid = rng.randint(1, N_USERS)
+        username, cash, holdings = users[uid]
+        board.upsert_user(uid, username, cash + rng.randint(-50_000, 50_000), holdings=holdings)
+        return board.rank(uid)
+    timed("유저 1명 잔고 변경 + 순위 조회", one_user, repeat=1000)
+
+    sample = [rng.randint(1, N_USERS) for _ in range(10_000)]
+    timed("순위 조회 1건 (이분 탐색)", lambda: [board.rank(uid) for uid in sample][-1], repeat=1)
+    print("  · (위 값은 10,000건 합계)")
+    timed("상위 100명", lambda: board.top(100), repeat=100)
+
+    # 정렬 리스트가 전체 재계산과 같은지 확인
+    expected = sorted((-(e.cash + sum(q * board.prices.get(n, 0) for n, (q, _) in e.holdings.items())), uid)
+                      for uid, e in board.users.items())
+    top = [uid for _, uid, _ in board.top(1000)]
+    print("  · 정렬 결과 일치:", top == [uid for _, uid in expected[:1000]],
+          all(board.rank(uid) == i + 1 for i, uid in enumerate(top)))
+    return board
+
+async def seed(path, prices, users):
+    async with aiosqlite.connect(path) as db:
+        await db.execute("PRAGMA journal_mode=WAL")
+        await db.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT, balance INTEGER, level INTEGER DEFAULT 1, exp INTEGER DEFAULT 0)")
+        await db.execute("CREATE TABLE holdings (user_id INTEGER, company_name TEXT, quantity INTEGER, average_price REAL, PRIMARY KEY (user_id, company_name))")
+        await db.execute("CREATE TABLE stocks (company_name TEXT PRIMARY KEY, current_price INTEGER)")
+        await db.execute("""CREATE TABLE ranking_snapshot (rank INTEGER, user_id INTEGER, username TEXT, total_asset REAL,
+                            profit_rate REAL, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)""")
+        await db.executemany("INSERT INTO users (id, username, balance) VALUES (?, ?, ?)",
+                             [(uid, username, cash) for uid, (username, cash, _) in users.items()])
+        await db.executemany("INSERT INTO holdings VALUES (?, ?, ?, ?)",
+                             [(uid, name, qty, avg) for uid, (_, _, h) in users.items() for name, (qty, avg) in h.items()])
+        await db.executemany("INSERT INTO stocks VALUES (?, ?)", list(prices.items()))
+        await db.commit()
+
+async def per_user_loop(db, prices):
+    """기존 rank.py 의 유저별 루프 (비교용)"""
+    cursor = await db.execute("SELECT company_name, current_price FROM stocks")
+    current_prices = {row[0]: row[1] for row in await cursor.fetchall()}
+    cursor = await db.execute("SELECT id, username, balance FROM users")
+    ranking = []
+    for user_id, username, cash in await cursor.fetchall():
+        cursor = await db.execute("SELECT company_name, quantity FROM holdings WHERE user_id = ?", (user_id,))
+        total = cash + sum(current_prices.get(name, 0) * qty for name, qty in await cursor.fetchall())
+        ranking.append((user_id, username, total, round((total - INITIAL_CAPITAL) / INITIAL_CAPITAL * 100, 2)))
+    ranking.sort(key=lambda x: (-x[2], x[0]))
+    await db.execute("DELETE FROM ranking_snapshot")
+    await db.executemany("INSERT INTO ranking_snapshot (rank, user_id, username, total_asset, profit_rate) VALUES (?, ?, ?, ?, ?)",
+                         [(i + 1, *row) for i, row in enumerate(ranking)])
+
+async def set_based(db, prices):
+    await db.execute("CREATE TEMP TABLE IF NOT EXISTS live_prices (company_name TEXT PRIMARY KEY, price REAL)")
+    await db.execute("DELETE FROM live_prices")
+    await db.executemany("INSERT INTO live_prices VALUES (?, ?)", list(prices.items()))
+    await db.execute("DELETE FROM ranking_snapshot")
+    await db.execute(SNAPSHOT_SQL, {"capital": INITIAL_CAPITAL})
+
+async def bench_snapshot(prices, users, board):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    await seed(path, prices, users)
+    results = []
+    async with aiosqlite.connect(path, isolation_level=None) as db:
+        for label, fn in (("ranking_snapshot 유저별 루프 (N+1)", per_user_loop), ("ranking_snapshot 집합 SQL 1회", set_based)):
+            started = time.perf_counter()
+            await db.execute("BEGIN IMMEDIATE")
+            await fn(db, prices)
+            await db.execute("COMMIT")
+            print(f"{label:<40} {(time.perf_counter() - started) * 1000:10.1f} ms")
+            cursor = await db.execute("SELECT rank, user_id, ROUND(total_asset, 2) FROM ranking_snapshot ORDER BY rank LIMIT 1000")
+            results.append([tuple(r) for r in await cursor.fetchall()])
+    memory = [(rank, uid, round(e.total, 2)) for rank, uid, e in board.top(1000)]
+    print("  · 스냅샷 결과 일치 (루프 = 집합 SQL = 메모리):", results[0] == results[1] == memory)
+
+async def main():
+    rng, prices, users = make_data()
+    print(f"유저 {N_USERS:,}명, 종목 {len(COMPANIES)}개, 보유 {sum(len(h) for _, _, h in users.values()):,}건")
+    board = bench_memory(rng, prices, users)
+    # 메모리 쪽 잔고 변경은 DB 에 없으므로 비교 전에 DB 와 같은 상태로 다시 적재합니다.
+    board = Leaderboard()
+    board.prices.update(prices)
+    for uid, (username, cash, holdings) in users.items():
+        board.upsert_user(uid, username, cash, holdings=holdings)
+    await bench_snapshot(prices, users, board)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+import asyncio
+import tempfile
+
+# 1. 경로 설정
+current_file = os.path.abspath(__file__)
+scripts_folder = os.path.dirname(current_file)
+backend_root = os.path.dirname(scripts_folder)
+if backend_root not in sys.path: sys.path.insert(0, backend_root)
+
+from core.llm_cache import LLMCache
+from scripts.bench_agent_llm import FakeServer, make_agent
+from scripts.bulk_generate_virtual import TARGET_COMPANIES
+from scripts.batch_update import REAL_NEWS_TARGETS, parody_prompt
+
+# 오프라인 벤치마크: 가짜 Assistants API(bench_agent_llm) 위에서 LLM 응답 캐시를 켜고
+# 가상 뉴스 일괄 생성 / 실제 기사 패러디 변환을 두 번씩 돌려 재실행 시간과 적중률을 봅니다.
+CONCURRENCY = 4
+
+
+async def bulk_generate(agent, policy):
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def one(company):
+        async with semaphore:
+            return await agent.analyze_stock_news_async(company["name"], mode="virtual", count=10,
+                                                        company_desc=company["desc"], cache=policy)
+    return await asyncio.gather(*(one(c) for c in TARGET_COMPANIES))
+
+
+async def parody_all(agent, policy):
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    jobs = [(t, {"title": f"{t['real_name']} 관련 소식 {i}번째 - 연합뉴스", "source": "연합뉴스"})
+            for t in REAL_NEWS_TARGETS for i in range(8)]
+
+    async def one(target, article):
+        async with semaphore:
+            return await agent.generate_news_async(parody_prompt(target, article), cache=policy)
+    return await asyncio.gather(*(one(t, a) for t, a in jobs))
+
+
+def timed_run(label, agent, server, coro):
+    requests_before, started = server.requests, time.perf_counter()
+    results = asyncio.run(coro)
+    assert all(results)
+    print(f"{label:<36} {time.perf_counter() - started:6.2f}초   LLM 요청 {server.requests - requests_before:3d}회")
+
+
+def main():
+    folder = tempfile.mkdtemp()
+    server = FakeServer()
+    agent = make_agent(server, "stream")
+    agent.cache = LLMCache(os.path.join(folder, "llm_cache.db"))
+
+    timed_run("가상 뉴스 1회차 (reuse, 빈 캐시)", agent, server, bulk_generate(agent, "reuse"))
+    timed_run("가상 뉴스 2회차 (reuse)", agent, server, bulk_generate(agent, "reuse"))
+    timed_run("가상 뉴스 3회차 (fresh, 변형 추가)", agent, server, bulk_generate(agent, "fresh"))
+    timed_run("패러디 변환 1회차 (reuse)", agent, server, parody_all(agent, "reuse"))
+    timed_run("패러디 변환 2회차 (reuse)", agent, server, parody_all(agent, "reuse"))
+    print("캐시 지표:", agent.cache.snapshot())
+
+    # 다른 프로세스(다음 실행)에서 같은 파일을 열어도 그대로 적중하는지
+    agent.cache.close()
+    agent.cache = LLMCache(os.path.join(folder, "llm_cache.db"))
+    timed_run("새 프로세스 가정, 가상 뉴스 (reuse)", agent, server, bulk_generate(agent, "reuse"))
+    print("캐시 지표:", agent.cache.snapshot())
+
+    # 크기 제한: 1KB 짜리 응답 500개를 64KB 캐시에 넣으면 오래 안 쓴 것부터 지워져 한도 아래로 유지
+    small = LLMCache(os.path.join(folder, "small.db"), max_bytes=64 * 1024)
+    for i in range(500):
+        small.put(LLMCache.key("gpt-4o-mini", "bench:v1", {"i": i}), "가" * 340)
+    rows = small._conn.execute("SELECT COUNT(*), SUM(size) FROM llm_cache").fetchone()
+    print(f"크기 제한 64KB: 저장 {small.stores}건, 삭제 {small.evictions}건, 남은 {rows[0]}건 / {rows[1] / 1024:.1f}KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import os
+import sys
+import time
+import asyncio
+import tempfile
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# 1. 경로 설정
+current_file = os.path.abspath(__file__)
+scripts_folder = os.path.dirname(current_file)
+backend_root = os.path.dirname(scripts_folder)
+if backend_root not in sys.path: sys.path.insert(0, backend_root)
+
+from database import Base, DBCompany, DBAgent, DBNews
+from services.mentor_advice import MentorAdviceService
+
+# 오프라인 벤치마크: 임시 SQLite 에 종목/유저/뉴스를 만들고, 멘토 4명 호출을 흉내 내는 가짜 생성기(LLM_SEC)로
+# 같은 종목에 몰리는 요청을 캐시 없이 / 조언 캐시(single-flight + stale-while-revalidate)로 비교합니다.
+LLM_SEC = 0.8           # GPT-4o 4건 동시 호출 한 번 (가장 느린 멘토 기준)
+USERS = 200
+CONCURRENT = 50
+
+
+def setup():
+    path = os.path.join(tempfile.mkdtemp(), "team.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with Session() as db:
+        db.add(DBCompany(ticker="IT008", name="소현컴퍼니", sector="IT", current_price=50000))
+        db.add(DBNews(company_name="소현컴퍼니", title="소현컴퍼니 클라우드 수주", summary="대형 계약"))
+        for i in range(USERS):
+            # 보유량/평단가가 제각각인 유저 (구간으로 묶이면 키가 몇 개 안 됨)
+            qty = [0, 3, 12, 40][i % 4]
+            avg = [0, 48000, 52000, 30000][i % 4] + (i % 7) * 100
+            db.add(DBAgent(agent_id=f"USER_{i:03d}", portfolio={"IT008": qty} if qty else {},
+                           psychology={"avg_price_IT008": avg} if qty else {}))
+        db.commit()
+    return Session
+
+
+class FakeMentors:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, db, ticker, user_id, user_state=None):
+        self.calls += 1
+        price = db.query(DBCompany.current_price).filter(DBCompany.ticker == ticker).scalar()
+        db.rollback()   # generate_all_mentors_advice 처럼 LLM 을 기다리기 전에 커넥션 반납
+        await asyncio.sleep(LLM_SEC)
+        return {"neutral": {"opinion": "HOLD", "core_logic": f"{price}원"},
+                "generated_at": datetime.now().isoformat()}
+
+
+async def burst(Session, fetch, n=CONCURRENT):
+    async def one(i):
+        with Session() as db:
+            started = time.perf_counter()
+            await fetch(db, "IT008", f"USER_{i % USERS:03d}")
+            return time.perf_counter() - started
+    latencies = sorted(await asyncio.gather(*(one(i) for i in range(n))))
+    return latencies[len(latencies) // 2], latencies[-1]
+
+
+async def main():
+    Session = setup()
+
+    fake = FakeMentors()
+    started = time.perf_counter()
+    p50, worst = await burst(Session, fake)
+    print(f"{'캐시 없음: 동시 요청 ' + str(CONCURRENT) + '건':<36} 전체 {time.perf_counter() - started:5.2f}초  "
+          f"p50 {p50 * 1000:6.0f}ms  최대 {worst * 1000:6.0f}ms  생성 {fake.calls}회")
+
+    fake = FakeMentors()
+    service = MentorAdviceService(ttl=300, session_factory=Session, generate=fake)
+
+    async def step(label, before=None):
+        if before:
+            before()
+        calls = fake.calls
+        started = time.perf_counter()
+        p50, worst = await burst(Session, service.get)
+        elapsed = time.perf_counter() - started
+        await asyncio.sleep(LLM_SEC * 1.5)   # 백그라운드 갱신이 끝날 때까지
+        print(f"{label:<36} 전체 {elapsed:5.2f}초  p50 {p50 * 1000:6.0f}ms  최대 {worst * 1000:6.0f}ms  "
+              f"생성 {fake.calls - calls}회")
+
+    def move_price(ratio):
+        def run():
+            with Session() as db:
+                c = db.query(DBCompany).filter(DBCompany.ticker == "IT008").first()
+                c.current_price = c.current_price * ratio
+                db.commit()
+        return run
+
+    def publish_news():
+        with Session() as db:
+            db.add(DBNews(company_name="소현컴퍼니", title="소현컴퍼니 실적 쇼크", summary="영업이익 급감"))
+            db.commit()
+
+    await step(f"캐시: 첫 동시 요청 {CONCURRENT}건 (빈 캐시)")
+    await step("캐시: 같은 요청 다시")
+    await step("캐시: 체결로 가격 0.3% 변동 (같은 구간)", move_price(1.003))
+    await step("캐시: 체결로 가격 2% 상승 (SWR)", move_price(1.02))
+    await step("캐시: 새 뉴스 발행 (SWR)", publish_news)
+    print("지표:", service.snapshot())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+import os
+import sys
+import gzip
+import json
+import time
+import asyncio
+import tempfile
+import aiosqlite
+
+# 1. 경로 설정
+current_file = os.path.abspath(__file__)
+scripts_folder = os.path.dirname(current_file)
+backend_root = os.path.dirname(scripts_folder)
+if backend_root not in sys.path: sys.path.insert(0, backend_root)
+
+from services.news_search import ensure_index, list_news
+from scripts.bench_news_search import make_rows, SCHEMA, INSERT_SQL
+
+# 오프라인 벤치마크: 기사 10만 건에서 뉴스 목록 API 의
+# 예전 SELECT * LIMIT 1000 (본문 포함) 과 목록 열만 읽는 키셋 페이지 + gzip 응답을 비교합니다.
+LIST_COLUMNS = "id, title, summary, sentiment, impact_score, category, source, company_name, published_at"
+
+async def timed(label, coro_fn, repeat=5):
+    result = await coro_fn()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = await coro_fn()
+    print(f"{label:<40} {(time.perf_counter() - started) / repeat * 1000:9.2f} ms")
+    return result
+
+def encode(rows):
+    return json.dumps(rows, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+async def main():
+    path = os.path.join(tempfile.mkdtemp(), "news.db")
+    async with aiosqlite.connect(path) as db:
+        await db.execute(SCHEMA)
+        await db.executemany(INSERT_SQL, make_rows())
+        await db.commit()
+
+    async with aiosqlite.connect(path) as db:
+        db.row_factory = aiosqlite.Row
+
+        async def old_list():
+            cursor = await db.execute("SELECT * FROM news ORDER BY id DESC LIMIT 1000")
+            return encode([dict(r) for r in await cursor.fetchall()])
+
+        async def old_offset(page):
+            cursor = await db.execute("SELECT * FROM news ORDER BY id DESC LIMIT 50 OFFSET ?", (page * 50,))
+            return [dict(r) for r in await cursor.fetchall()]
+
+        old_body = await timed("예전 SELECT * 1000건 (색인 없음)", old_list)
+        await timed("예전 OFFSET 페이지 (1800번째 페이지)", lambda: old_offset(1800))
+
+        await ensure_index(db)
+        await db.commit()
+
+        async def new_list(limit=1000, before_id=None):
+            rows, _ = await list_news(db, LIST_COLUMNS, None, None, before_id, limit)
+            return encode([dict(r) for r in rows])
+
+        new_body = await timed("목록 열 1000건 (커버링 색인)", new_list)
+        await timed("목록 열 50건 키셋 (before_id=10000)", lambda: new_list(50, 10000))
+        started = time.perf_counter()
+        gz = gzip.compress(new_body, compresslevel=6)
+        print(f"{'gzip 압축 (1000건)':<40} {(time.perf_counter() - started) * 1000:9.2f} ms")
+
+        plan = await (await db.execute(f"EXPLAIN QUERY PLAN SELECT {LIST_COLUMNS} FROM news WHERE id < 10000 ORDER BY id DESC LIMIT 51")).fetchall()
+        print("  · 실행 계획:", plan[0][-1])
+        print(f"\n응답 크기: 예전 {len(old_body) / 1024:,.0f} KB -> 목록 열 {len(new_body) / 1024:,.0f} KB -> gzip {len(gz) / 1024:,.0f} KB")
+
+        # 키셋으로 끝까지 넘겨도 빠지거나 겹치는 기사가 없는지 확인
+        seen, before_id = 0, None
+        while True:
+            rows, before_id = await list_news(db, "id", None, None, before_id, 5000)
+            seen += len(rows)
+            if before_id is None:
+                break
+        print("키셋 페이지 전체 기사 수:", seen)
+
+if __name__ == "__main__":
+    asyncio.run(main())
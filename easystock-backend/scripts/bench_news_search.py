@@ -0,0 +1,122 @@
+import os
+import sys
+import time
+import random
+import asyncio
+import tempfile
+import aiosqlite
+
+# 1. 경로 설정
+current_file = os.path.abspath(__file__)
+scripts_folder = os.path.dirname(current_file)
+backend_root = os.path.dirname(scripts_folder)
+if backend_root not in sys.path: sys.path.insert(0, backend_root)
+
+from services.news_search import ensure_index, search_news, mention_filter
+
+# 오프라인 벤치마크: 임시 SQLite 파일에 기사 10만 건을 만들고
+# 예전 LIKE '%x%' 전체 스캔과 FTS5(trigram) 색인 검색의 응답 시간을 비교합니다.
+N_NEWS = 100_000
+COMPANIES = ["삼송전자", "재웅시스템", "에이펙스테크", "마이크로하드", "소현컴퍼니", "넥스트데이터",
+             "진호랩", "상은테크놀로지", "인사이트애널리틱스", "선우솔루션", "퀀텀디지털", "예진캐피탈"]
+WORDS = ["반도체", "수주", "계약을", "체결했다", "실적", "개선", "전망", "하락", "상승", "신제품", "출시",
+         "투자", "확대", "소송", "리스크", "배터리", "인공지능", "플랫폼", "해외", "시장", "점유율", "증가",
+         "감소", "영업이익", "분기", "발표", "규제", "당국", "조사", "착수", "합병", "인수", "협력", "강화"]
+RARE = ["양자암호", "초전도체", "우주항공"]   # 드물게 나오는 단어 (결과가 적은 검색)
+SCHEMA = """
+    CREATE TABLE news (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, ticker TEXT, company_name TEXT, category TEXT, title TEXT,
+        content TEXT, summary TEXT, sentiment TEXT, impact_score INTEGER, source TEXT, published_at TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+def make_rows(seed=7):
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(N_NEWS):
+        company = rng.choice(COMPANIES)
+        words = rng.sample(WORDS, 6) + ([rng.choice(RARE)] if rng.random() < 0.002 else [])
+        title = f"{company}, {' '.join(words[:3])}"
+        summary = f"{company}가 {' '.join(words[2:6])} 소식을 전했다."
+        content = " ".join(rng.choice(WORDS) for _ in range(120)) + " " + " ".join(words)
+        rows.append((company, company, "일반", title, content, summary, rng.choice(("positive", "negative", "neutral")),
+                     rng.randint(-100, 100), "Stocky News", "2026-01-01 09:00:00"))
+    return rows
+
+INSERT_SQL = """INSERT INTO news (ticker, company_name, category, title, content, summary, sentiment, impact_score, source, published_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+async def timed(label, coro_fn, repeat=5):
+    result = await coro_fn()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = await coro_fn()
+    print(f"{label:<44} {(time.perf_counter() - started) / repeat * 1000:9.2f} ms")
+    return result
+
+async def main():
+    rows = make_rows()
+    folder = tempfile.mkdtemp()
+
+    # 1. 색인 유지 비용: 트리거 없이 넣기 vs 트리거로 색인하며 넣기
+    for label, with_index in (("기사 10만 건 저장 (색인 없음)", False), ("기사 10만 건 저장 (트리거로 색인)", True)):
+        path = os.path.join(folder, f"news_{with_index}.db")
+        async with aiosqlite.connect(path) as db:
+            await db.execute(SCHEMA)
+            if with_index:
+                await ensure_index(db)
+            started = time.perf_counter()
+            await db.executemany(INSERT_SQL, rows)
+            await db.commit()
+            print(f"{label:<44} {(time.perf_counter() - started) * 1000:9.0f} ms")
+
+    path = os.path.join(folder, "news_True.db")
+    async with aiosqlite.connect(path) as db:
+        db.row_factory = aiosqlite.Row
+
+        async def like_company(name):
+            cursor = await db.execute("SELECT id FROM news WHERE company_name = ? OR title LIKE ? OR summary LIKE ? ORDER BY id DESC LIMIT 1000",
+                                      (name, f"%{name}%", f"%{name}%"))
+            return [r[0] for r in await cursor.fetchall()]
+
+        async def fts_company(name):
+            condition, params = mention_filter("company_name", name)
+            cursor = await db.execute(f"SELECT id FROM news WHERE {condition} ORDER BY id DESC LIMIT 1000", params)
+            return [r[0] for r in await cursor.fetchall()]
+
+        async def like_search(q):
+            cursor = await db.execute("SELECT id FROM news WHERE title LIKE :q OR summary LIKE :q OR content LIKE :q ORDER BY id DESC LIMIT 20",
+                                      {"q": f"%{q}%"})
+            return [r[0] for r in await cursor.fetchall()]
+
+        print()
+        for name in ("인사이트애널리틱스", "진호랩"):
+            old = await timed(f"회사 필터 LIKE ({name})", lambda: like_company(name))
+            new = await timed(f"회사 필터 FTS ({name})", lambda: fts_company(name))
+            print(f"  · 결과 일치: {old == new} ({len(new)}건)")
+
+        print()
+        for q in ("양자암호", "반도체 인공지능", "영업이익 실적"):
+            await timed(f"본문 포함 LIKE 최신 20건 ({q.split()[0]})", lambda: like_search(q.split()[0]))
+            page = await timed(f"검색 관련도순 20건 ({q})", lambda: search_news(db, q, limit=20))
+            if page["next_cursor"]:
+                await timed("  └ 다음 페이지 (cursor)", lambda: search_news(db, q, limit=20, cursor=page["next_cursor"]))
+            await timed(f"검색 최신순 20건 ({q})", lambda: search_news(db, q, limit=20, sort="recent"))
+        await timed("두 글자 검색어만 (LIKE 대체 경로, 실적)", lambda: search_news(db, "실적", limit=20))
+
+        # 커서로 끝까지 넘겨도 빠지거나 겹치는 기사가 없는지 확인
+        seen, cursor = [], None
+        while True:
+            page = await search_news(db, "양자암호", limit=50, cursor=cursor)
+            seen += [item["id"] for item in page["items"]]
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        expected = [r[0] for r in await (await db.execute(
+            "SELECT id FROM news WHERE title LIKE '%양자암호%' OR summary LIKE '%양자암호%' OR content LIKE '%양자암호%'")).fetchall()]
+        print(f"\n커서 페이지 전체 = LIKE 결과: {sorted(seen) == sorted(expected)} ({len(seen)}건, 중복 {len(seen) - len(set(seen))})")
+        print("스니펫 예:", page["items"][0]["snippet"] if page["items"] else None)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,73 @@
+import os
+import sys
+import time
+import random
+import uuid
+
+# 1. 경로 설정
+current_file = os.path.abspath(__file__)
+scripts_folder = os.path.dirname(current_file)
+backend_root = os.path.dirname(scripts_folder)
+if backend_root not in sys.path: sys.path.insert(0, backend_root)
+
+from core.order_book import OrderBook
+
+# 호가창 성능 측정: 잔량 N건을 쌓는 속도(등록)와, 그 위에서 공격적 주문이 체결되는 속도(매칭)
+SIZES = [10_000, 100_000, 1_000_000]
+MID_PRICE = 72000
+TICK = 100
+AGGRESSIVE_ORDERS = 10_000
+
+def make_order(side, price, qty):
+    return {
+        "order_id": uuid.uuid4().hex,
+        "agent_id": f"Citizen_{random.randint(1, 475):03d}",
+        "price": price,
+        "quantity": qty,
+        "side": side,
+        "timestamp": None,
+    }
+
+def build_resting(n):
+    # 매수는 현재가 아래, 매도는 현재가 위로 500호가 안에 랜덤하게 깝니다. (서로 안 겹치게)
+    orders = []
+    for _ in range(n):
+        if random.random() < 0.5:
+            orders.append(make_order("BUY", MID_PRICE - TICK * random.randint(1, 500), random.randint(1, 100)))
+        else:
+            orders.append(make_order("SELL", MID_PRICE + TICK * random.randint(1, 500), random.randint(1, 100)))
+    return orders
+
+def run(n):
+    resting = build_resting(n)
+    book = OrderBook()
+
+    t0 = time.perf_counter()
+    for o in resting:
+        book.add(o)
+    insert_sec = time.perf_counter() - t0
+
+    # 현재가 근처 5호가를 쓸어가는 공격적 주문 (시뮬레이션의 '시장가 돌격'과 같은 형태)
+    aggressive = []
+    for _ in range(AGGRESSIVE_ORDERS):
+        if random.random() < 0.5:
+            aggressive.append(make_order("BUY", MID_PRICE + TICK * 5, random.randint(10, 100)))
+        else:
+            aggressive.append(make_order("SELL", MID_PRICE - TICK * 5, random.randint(10, 100)))
+
+    fills = 0
+    t0 = time.perf_counter()
+    for o in aggressive:
+        book.add(o)
+        fills += len(book.match())
+    match_sec = time.perf_counter() - t0
+
+    print(f"📊 resting={n:>9,} | 등록 {n / insert_sec:>12,.0f} orders/s | "
+          f"매칭 {AGGRESSIVE_ORDERS / match_sec:>10,.0f} orders/s ({fills:,} fills) | "
+          f"best bid/ask = {book.best_price('BUY')}/{book.best_price('SELL')}")
+
+if __name__ == "__main__":
+    random.seed(42)
+    sizes = [int(a) for a in sys.argv[1:]] or SIZES
+    for n in sizes:
+        run(n)
@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+import random
+
+# 1. 경로 설정
+current_file = os.path.abspath(__file__)
+scripts_folder = os.path.dirname(current_file)
+backend_root = os.path.dirname(scripts_folder)
+if backend_root not in sys.path: sys.path.insert(0, backend_root)
+
+from core.population_engine import PopulationEngine
+from core.order_book import OrderBook
+
+# 오프라인 벤치마크: DB/LLM 없이 인구 엔진 의사결정 + 호가창 일괄 매칭 속도를 잽니다.
+TICKERS = ["SS011", "JW004", "AT010", "MH012", "SH001", "ND008",
+           "JH005", "SE002", "IA009", "SW006", "QD007", "YJ003"]
+TICKS = 50
+
+class FakeAccount:
+    def __init__(self, agent_id, rng):
+        self.agent_id = agent_id
+        self.cash = rng.randint(2_000_000, 500_000_000)
+        self.positions = {t: rng.randint(0, 200) for t in rng.sample(TICKERS, 3)}
+        self.psychology = {"fear_index": rng.random(), "greed_index": rng.random(), "safety_needs": rng.random()}
+
+def seed_liquidity(books, prices, seq):
+    # 마켓 메이커 대신 양쪽에 두꺼운 벽을 깔아 둡니다.
+    for t, book in books.items():
+        for step in range(1, 6):
+            for side, sign in (("BUY", -1), ("SELL", 1)):
+                seq[0] += 1
+                book.add({"order_id": f"MM-{seq[0]}", "agent_id": "MARKET_MAKER",
+                          "price": int(prices[t] * (1 + sign * 0.0015 * step)),
+                          "quantity": 100_000, "side": side, "timestamp": None})
+
+def run(n_agents):
+    rng = random.Random(7)
+    accounts = [FakeAccount(f"Citizen_{i:06d}", rng) for i in range(n_agents)]
+    engine = PopulationEngine(TICKERS, seed=7)
+    engine.load_accounts(accounts)
+
+    prices = {t: rng.randint(10_000, 500_000) for t in TICKERS}
+    books = {t: OrderBook() for t in TICKERS}
+    seq = [0]
+
+    decide_sec = match_sec = 0.0
+    orders = fills = 0
+    for _ in range(TICKS):
+        for t in TICKERS:
+            prices[t] = max(100, int(prices[t] * (1 + rng.gauss(0, 0.004))))
+        news = {t: rng.choice([0.0, 0.0, 0.0, 0.8, -0.8]) for t in TICKERS}
+        seed_liquidity(books, prices, seq)
+
+        started = time.perf_counter()
+        batches = engine.step(prices, news)
+        decide_sec += time.perf_counter() - started
+
+        started = time.perf_counter()
+        for t, batch in batches.items():
+            book = books[t]
+            for order in batch:
+                book.add(order)
+            # (지난 틱 벽끼리 교차한 체결은 빼고 셉니다)
+            fills += sum(1 for b, s, _, _ in book.match() if "POP-" in b["order_id"] + s["order_id"])
+            for order in batch:
+                if order["order_id"] in book.orders:
+                    book.cancel(order["order_id"])
+            orders += len(batch)
+        match_sec += time.perf_counter() - started
+
+    per_tick = (decide_sec + match_sec) / TICKS
+    print(f"📊 에이전트 {n_agents:>7,}명 | 틱당 {per_tick * 1000:7.1f}ms "
+          f"(판단 {decide_sec / TICKS * 1000:6.1f}ms + 매칭 {match_sec / TICKS * 1000:6.1f}ms) | "
+          f"틱당 주문 {orders / TICKS:8.1f} / 체결 {fills / TICKS:8.1f}")
+
+if __name__ == "__main__":
+    for n in [500, 10_000, 50_000, 100_000]:
+        run(n)
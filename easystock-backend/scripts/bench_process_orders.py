@@ -0,0 +1,113 @@
+import os
+import sys
+import time
+import random
+import asyncio
+import tempfile
+import aiosqlite
+
+# 1. 경로 설정
+current_file = os.path.abspath(__file__)
+scripts_folder = os.path.dirname(current_file)
+backend_root = os.path.dirname(scripts_folder)
+if backend_root not in sys.path: sys.path.insert(0, backend_root)
+
+from services.order_execution import execute_crossing, PENDING_INDEX_SQL
+
+# 오프라인 벤치마크: 임시 SQLite 파일에 대기 주문 N건을 깔고, 가격이 크게 움직여 전부 체결될 때
+# 예전 주문별 처리(row-by-row)와 집합 SQL 일괄 체결의 쓰기 락 점유 시간(BEGIN ~ COMMIT)을 비교합니다.
+N_ORDERS = 10_000
+N_USERS = 2_000
+N_FILLED = 50_000     # 이미 체결/취소된 과거 주문 (부분 인덱스가 건너뛰는 행)
+COMPANY = "삼송전자"
+
+SCHEMA = [
+    "CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT, balance INTEGER DEFAULT 1000000)",
+    """CREATE TABLE orders (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, company_name TEXT, order_type TEXT,
+       price INTEGER, quantity INTEGER, status TEXT DEFAULT 'PENDING', created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+       filled_quantity INTEGER DEFAULT 0)""",
+    "CREATE TABLE holdings (user_id INTEGER, company_name TEXT, quantity INTEGER, average_price REAL, PRIMARY KEY (user_id, company_name))",
+    """CREATE TABLE transactions (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, transaction_type TEXT,
+       amount INTEGER, balance_after INTEGER, description TEXT)""",
+]
+
+async def seed(path, with_index):
+    rng = random.Random(7)
+    async with aiosqlite.connect(path) as db:
+        await db.execute("PRAGMA journal_mode=WAL")
+        for sql in SCHEMA:
+            await db.execute(sql)
+        if with_index:
+            await db.execute(PENDING_INDEX_SQL)
+        await db.executemany("INSERT INTO users (username) VALUES (?)", [(f"u{i}",) for i in range(N_USERS)])
+        await db.executemany("INSERT INTO holdings VALUES (?, ?, ?, ?)",
+                             [(u, COMPANY, 100, 1000.0) for u in range(1, N_USERS + 1, 2)])
+        await db.executemany("INSERT INTO orders (user_id, company_name, order_type, price, quantity, status) VALUES (?, ?, ?, ?, ?, ?)",
+                             [(rng.randint(1, N_USERS), COMPANY, rng.choice(("BUY", "SELL")), rng.randint(900, 1100), 10,
+                               rng.choice(("FILLED", "CANCELLED"))) for _ in range(N_FILLED)])
+        # 매수는 1000원 이상, 매도는 1000원 이하 -> 현재가 1000원이면 전부 체결
+        pending = []
+        for _ in range(N_ORDERS):
+            side = rng.choice(("BUY", "SELL"))
+            price = rng.randint(1000, 1100) if side == "BUY" else rng.randint(900, 1000)
+            pending.append((rng.randint(1, N_USERS), COMPANY, side, price, rng.randint(1, 20), "PENDING"))
+        await db.executemany("INSERT INTO orders (user_id, company_name, order_type, price, quantity, status) VALUES (?, ?, ?, ?, ?, ?)", pending)
+        await db.commit()
+
+async def row_by_row(db, company_name, current_price):
+    """기존 process_orders 의 주문별 처리 (비교용)"""
+    count = 0
+    cursor = await db.execute("SELECT id, user_id, quantity, price FROM orders WHERE company_name = ? AND order_type = 'BUY' AND status = 'PENDING' AND price >= ?", (company_name, current_price))
+    for order in await cursor.fetchall():
+        h = await (await db.execute("SELECT quantity, average_price FROM holdings WHERE user_id = ? AND company_name = ?", (order['user_id'], company_name))).fetchone()
+        if h:
+            new_qty = h['quantity'] + order['quantity']
+            new_avg = ((h['quantity'] * h['average_price']) + (order['quantity'] * order['price'])) / new_qty
+            await db.execute("UPDATE holdings SET quantity = ?, average_price = ? WHERE user_id = ? AND company_name = ?", (new_qty, new_avg, order['user_id'], company_name))
+        else:
+            await db.execute("INSERT INTO holdings (user_id, company_name, quantity, average_price) VALUES (?, ?, ?, ?)", (order['user_id'], company_name, order['quantity'], order['price']))
+        await db.execute("UPDATE orders SET status = 'FILLED' WHERE id = ?", (order['id'],))
+        await db.execute("INSERT INTO transactions (user_id, transaction_type, amount, balance_after, description) VALUES (?, 'BUY', ?, 0, ?)",
+                         (order['user_id'], -(order['price'] * order['quantity']), f"{company_name} {order['quantity']}주 지정가 체결"))
+        count += 1
+    cursor = await db.execute("SELECT id, user_id, quantity, price FROM orders WHERE company_name = ? AND order_type = 'SELL' AND status = 'PENDING' AND price <= ?", (company_name, current_price))
+    for order in await cursor.fetchall():
+        income = order['price'] * order['quantity']
+        await db.execute("UPDATE users SET balance = balance + ? WHERE id = ?", (income, order['user_id']))
+        await db.execute("UPDATE orders SET status = 'FILLED' WHERE id = ?", (order['id'],))
+        await db.execute("INSERT INTO transactions (user_id, transaction_type, amount, balance_after, description) VALUES (?, 'SELL', ?, 0, ?)",
+                         (order['user_id'], income, f"{company_name} {order['quantity']}주 지정가 체결"))
+        count += 1
+    return count
+
+async def fingerprint(db):
+    rows = []
+    for sql in ("SELECT user_id, quantity, ROUND(average_price, 4) FROM holdings ORDER BY user_id",
+                "SELECT id, balance FROM users ORDER BY id",
+                "SELECT id, status FROM orders ORDER BY id",
+                "SELECT user_id, transaction_type, SUM(amount), COUNT(*) FROM transactions GROUP BY user_id, transaction_type ORDER BY 1, 2"):
+        rows.append(await (await db.execute(sql)).fetchall())
+    return [[tuple(r) for r in part] for part in rows]
+
+async def run(name, fn, with_index):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    await seed(path, with_index)
+    async with aiosqlite.connect(path, isolation_level=None) as db:
+        db.row_factory = aiosqlite.Row
+        started = time.perf_counter()
+        await db.execute("BEGIN IMMEDIATE")
+        count = await fn(db, COMPANY, 1000)
+        await db.execute("COMMIT")
+        elapsed = time.perf_counter() - started
+        print(f"{name:<28} 체결 {count:>6}건  쓰기 락 {elapsed * 1000:8.1f} ms")
+        return await fingerprint(db)
+
+async def main():
+    print(f"대기 주문 {N_ORDERS:,}건 (과거 주문 {N_FILLED:,}건) 전부 체결")
+    old = await run("row-by-row (인덱스 없음)", row_by_row, False)
+    await run("row-by-row (부분 인덱스)", row_by_row, True)
+    new = await run("set-based (부분 인덱스)", execute_crossing, True)
+    print("결과 일치:", old == new)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,275 @@
+import os
+import sys
+import time
+import random
+import asyncio
+import json
+import tempfile
+from datetime import datetime
+
+# 1. 경로 설정
+current_file = os.path.abspath(__file__)
+scripts_folder = os.path.dirname(current_file)
+backend_root = os.path.dirname(scripts_folder)
+if backend_root not in sys.path: sys.path.insert(0, backend_root)
+
+# 엔드포인트 단계의 라우터가 main_simulation(DB)을 불러오므로 처음부터 임시 DB 를 쓰게 합니다.
+BENCH_DIR = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(BENCH_DIR, 'team.db')}")
+
+from core.order_book import OrderBook
+from core.candle_builder import CandleBuilder
+from core.market_stream import MarketStream
+
+# 부하 테스트: 구독자 1,000명(그중 일부는 일부러 느린 소비자)이 붙은 상태로 호가/체결을 쏟아 붓고
+# 발행 비용, 체결 전달 지연, 느린 구독자 버퍼 크기, 합쳐진 depth 로 복원한 호가가 실제와 같은지 확인합니다.
+# 이어서 실제 uvicorn 서버에 routers/stream.py 를 올리고 WebSocket/SSE 클라이언트로 같은 시장을 받아
+# 엔드포인트를 거친 전달 지연, 잘못된 명령 뒤에도 연결/구독 변경이 유지되는지, 끊은 뒤 구독이 바로 풀리는지 봅니다.
+TICKERS = ["SS011", "JW004", "AT010", "MH012", "SH001", "ND008",
+           "JH005", "SE002", "IA009", "SW006", "QD007", "YJ003"]
+SUBSCRIBERS = 1_000
+SLOW_RATIO = 0.05        # 느린 소비자 비율 (프레임 묶음마다 SLOW_DELAY 초씩 멈춤)
+SLOW_DELAY = 0.2
+DURATION = 5.0
+ORDERS_PER_STEP = 5      # 종목당 10ms 마다 넣는 주문 수
+ENDPOINT_CLIENTS = 50    # 엔드포인트 단계: WebSocket / SSE 클라이언트 각각
+ENDPOINT_DURATION = 3.0
+
+
+class BenchEngine:
+    """MarketStream 이 쓰는 엔진 속성만 흉내 낸 DB 없는 엔진"""
+    def __init__(self):
+        self.order_books = {}
+        self.last_prices = {}
+        self.candles = CandleBuilder(intervals=("1m",))
+        self.stream = None
+
+    def get_book(self, ticker):
+        book = self.order_books.get(ticker)
+        if book is None:
+            book = self.order_books[ticker] = OrderBook()
+        return book
+
+
+async def market(engine, stream, stop_at, seq):
+    rng = random.Random(7)
+    mids = {t: 10_000 + 1_000 * i for i, t in enumerate(TICKERS)}
+    trades = 0
+    while time.perf_counter() < stop_at:
+        for t in TICKERS:
+            book = engine.get_book(t)
+            for _ in range(ORDERS_PER_STEP):
+                seq[0] += 1
+                side = rng.choice(("BUY", "SELL"))
+                offset = rng.randint(-6, 12) * 10
+                price = mids[t] - offset if side == "BUY" else mids[t] + offset
+                book.add({"order_id": seq[0], "agent_id": "bench", "price": price,
+                          "quantity": rng.randint(1, 50), "side": side, "timestamp": None})
+            fills = book.match()
+            if fills:
+                now = datetime.fromtimestamp(time.time())
+                for _, _, p, q in fills:
+                    engine.candles.record(t, p, q, now)
+                engine.last_prices[t] = float(fills[-1][2])
+                stream.on_fills(t, fills, now)
+                trades += len(fills)
+            mids[t] += rng.choice((-10, 0, 10))
+        await asyncio.sleep(0.01)
+    return trades
+
+
+async def consumer(sub, slow, stop_at, result):
+    books = {}        # ticker -> {"bids": {}, "asks": {}} (받은 depth 로 복원한 호가)
+    latencies = []
+    frames = 0
+    max_buffer = 0
+    while time.perf_counter() < stop_at + 1.0:
+        max_buffer = max(max_buffer, len(sub.events))
+        batch = await sub.next_frames(timeout=0.5)
+        for text in batch:
+            frame = json.loads(text)
+            frames += 1
+            if frame["type"] == "trade":
+                latencies.append(time.time() - datetime.fromisoformat(frame["time"]).timestamp())
+            elif frame["type"] == "depth":
+                state = books.setdefault(frame["ticker"], {"bids": {}, "asks": {}})
+                for side in ("bids", "asks"):
+                    if frame["snapshot"]:
+                        state[side] = {}
+                    for price, volume in frame[side]:
+                        if volume > 0:
+                            state[side][price] = volume
+                        else:
+                            state[side].pop(price, None)
+        if slow:
+            await asyncio.sleep(SLOW_DELAY)
+    result.append({"slow": slow, "frames": frames, "latencies": latencies, "books": books,
+                   "dropped": sub.dropped, "max_buffer": max_buffer, "tickers": set(sub.tickers)})
+
+
+def pct(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def main():
+    engine = BenchEngine()
+    stream = MarketStream(engine, depth=10, interval=0.1, max_events=256)
+    rng = random.Random(1)
+    start = time.perf_counter()
+    stop_at = start + DURATION
+
+    result = []
+    consumers = []
+    for i in range(SUBSCRIBERS):
+        sub = stream.subscribe(rng.sample(TICKERS, 3))
+        consumers.append(asyncio.create_task(consumer(sub, i < SUBSCRIBERS * SLOW_RATIO, stop_at, result)))
+
+    stream.start()
+    trades = await market(engine, stream, stop_at, [0])
+    await asyncio.sleep(0.3)          # 마지막 호가 변화까지 발행
+    await stream.stop()
+    stream.pump_once()
+    await asyncio.gather(*consumers)
+
+    # 복원한 호가가 마지막으로 발행된 상위 호가와 같아야 합니다. (느린 소비자 포함)
+    mismatches = 0
+    for r in result:
+        for t in r["tickers"]:
+            published = stream._published[t][1]
+            got = r["books"].get(t, {"bids": {}, "asks": {}})
+            if got["bids"] != published["bids"] or got["asks"] != published["asks"]:
+                mismatches += 1
+
+    fast = [r for r in result if not r["slow"]]
+    slow = [r for r in result if r["slow"]]
+    fast_lat = [x for r in fast for x in r["latencies"]]
+    stats = stream.snapshot()
+    print(f"구독자 {SUBSCRIBERS:,}명 (느린 소비자 {len(slow)}명), {DURATION:.0f}초, 체결 {trades:,}건")
+    print(f"발행: depth 프레임 {stats['depth_frames']:,}개, 이벤트 {stats['events']:,}개, 호가 발행 1회 평균 {stats['pump_avg_ms']} ms")
+    print(f"빠른 소비자: 프레임 평균 {sum(r['frames'] for r in fast) / len(fast):,.0f}개, "
+          f"체결 전달 지연 p50 {pct(fast_lat, 50) * 1000:.1f} ms / p99 {pct(fast_lat, 99) * 1000:.1f} ms, 버린 체결 {sum(r['dropped'] for r in fast)}")
+    print(f"느린 소비자: 프레임 평균 {sum(r['frames'] for r in slow) / max(1, len(slow)):,.0f}개, "
+          f"버퍼 최대 {max((r['max_buffer'] for r in slow), default=0)}건, 버린 체결 {sum(r['dropped'] for r in slow):,}")
+    print(f"depth 복원 불일치: {mismatches}")
+
+# --------------------------------------------------------------
+# 엔드포인트 단계 (routers/stream.py 를 실제 서버로)
+# --------------------------------------------------------------
+def load_stream_router():
+    # 라우터가 main_simulation 을 불러오므로 임시 DB 에 테이블을 만들어 둡니다. (stock_game.db 도 임시 폴더에)
+    os.chdir(BENCH_DIR)
+    import database
+    database.Base.metadata.create_all(database.engine)
+    from routers import stream as stream_router
+    return stream_router
+
+
+def trade_latency(frame):
+    return time.time() - datetime.fromisoformat(frame["time"]).timestamp()
+
+
+async def ws_client(port, tickers, stop_at, result):
+    from websockets.asyncio.client import connect
+    async with connect(f"ws://127.0.0.1:{port}/ws/market?tickers={','.join(tickers[:2])}") as ws:
+        # 객체가 아닌 JSON 명령을 보내도 연결이 살아 있고, 그 뒤의 구독 추가가 반영되어야 합니다.
+        await ws.send("[1, 2]")
+        await ws.send('"hello"')
+        await ws.send(json.dumps({"action": "subscribe", "tickers": [tickers[2]]}))
+        latencies, seen = [], set()
+        while time.perf_counter() < stop_at:
+            try:
+                frame = json.loads(await asyncio.wait_for(ws.recv(), 0.5))
+            except asyncio.TimeoutError:
+                continue
+            if frame["type"] == "trade":
+                latencies.append(trade_latency(frame))
+                seen.add(frame["ticker"])
+    result.append({"kind": "ws", "latencies": latencies, "complete": seen == set(tickers)})
+
+
+async def sse_client(port, tickers, stop_at, result):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET /api/stream?tickers={','.join(tickers)} HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+                 f"Accept: text/event-stream\r\n\r\n".encode())
+    await writer.drain()
+    latencies, seen = [], set()
+    while time.perf_counter() < stop_at:
+        try:
+            line = await asyncio.wait_for(reader.readline(), 0.5)
+        except asyncio.TimeoutError:
+            continue
+        if line.startswith(b"data: "):
+            frame = json.loads(line[6:])
+            if frame["type"] == "trade":
+                latencies.append(trade_latency(frame))
+                seen.add(frame["ticker"])
+    writer.close()
+    result.append({"kind": "sse", "latencies": latencies, "complete": seen == set(tickers)})
+
+
+async def endpoint_pass():
+    import uvicorn
+    from fastapi import FastAPI
+
+    stream_router = load_stream_router()
+    engine = BenchEngine()
+    stream = MarketStream(engine, depth=10, interval=0.1, max_events=256)
+    stream_router.market_stream = stream                        # 시뮬레이션 대신 벤치 엔진의 허브
+    stream_router.user_orders._tickers.update({t: t for t in TICKERS})
+
+    app = FastAPI()
+    app.include_router(stream_router.router)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+
+    rng = random.Random(3)
+    stop_at = time.perf_counter() + ENDPOINT_DURATION
+    result = []
+    clients = [asyncio.create_task(ws_client(port, rng.sample(TICKERS, 3), stop_at, result)) for _ in range(ENDPOINT_CLIENTS)]
+    clients += [asyncio.create_task(sse_client(port, rng.sample(TICKERS, 3), stop_at, result)) for _ in range(ENDPOINT_CLIENTS)]
+    while len(stream.subscribers) < len(clients):
+        await asyncio.sleep(0.01)
+
+    stream.start()
+    trades = await market(engine, stream, stop_at, [0])
+    await asyncio.gather(*clients)
+
+    # 조용한 종목만 구독한 연결도 끊자마자 구독이 풀려야 합니다. (보낼 프레임이 없어도 끊김을 바로 알아챔)
+    from websockets.asyncio.client import connect
+    stream_router.user_orders._tickers["IDLE"] = "IDLE"
+    async with connect(f"ws://127.0.0.1:{port}/ws/market?tickers=IDLE") as ws:
+        await ws.recv()
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET /api/stream?tickers=IDLE HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n")
+        await writer.drain()
+        while len(stream.subscribers) < 2:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.3)
+        writer.close()
+    closed_at = time.perf_counter()
+    while stream.subscribers and time.perf_counter() - closed_at < 30:
+        await asyncio.sleep(0.005)
+    release_ms = (time.perf_counter() - closed_at) * 1000
+    left = len(stream.subscribers)
+    await stream.stop()
+    server.should_exit = True
+    await serving
+
+    print(f"\n엔드포인트: WebSocket {ENDPOINT_CLIENTS}명 + SSE {ENDPOINT_CLIENTS}명, {ENDPOINT_DURATION:.0f}초, 체결 {trades:,}건")
+    for kind, label in (("ws", "WebSocket"), ("sse", "SSE")):
+        rs = [r for r in result if r["kind"] == kind]
+        lat = [x for r in rs for x in r["latencies"]]
+        print(f"{label}: 체결 수신 평균 {len(lat) / max(1, len(rs)):,.0f}건, 전달 지연 p50 {pct(lat, 50) * 1000:.1f} ms / "
+              f"p99 {pct(lat, 99) * 1000:.1f} ms, 구독 종목 전부 수신 {sum(r['complete'] for r in rs)}/{len(rs)}")
+    print(f"조용한 연결 종료 -> 구독 해제까지 {release_ms:.0f} ms (남은 구독자 {left}, 예전에는 최대 {stream_router.HEARTBEAT_SEC:.0f}초)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
+    asyncio.run(endpoint_pass())
@@ -19,10 +19,11 @@ os.chdir(backend_root)
 # 2. 필요한 모듈 임포트
 try:
     from core.agent_service import StockAgentService
-    from database import DB_NAME 
+    from database import DB_PATH
 except ImportError:
     DB_PATH = "/home/site/wwwroot/stock_game.db" if os.getenv("WEBSITE_HOSTNAME") else "stock_game.db"
     from core.agent_service import StockAgentService
+from scripts.batch_update import title_hash, known_hashes, ensure_news_columns
 
 # 가상 뉴스 전용 10개 기업 리스트
 TARGET_COMPANIES = [
@@ -40,92 +41,229 @@ TARGET_COMPANIES = [
 
 VIRTUAL_PRESS = ["스토키 일보", "매일경제 AI", "한경 인사이트", "블록체인 뉴스", "Stocky Daily", "월스트리트 찌라시"]
 
-def save_direct_to_db(company_name, category, news_list):
+# ------------------------------------------------------------------
+# 동시 생성 설정
+# - 기업별 LLM 호출(analyze_stock_news_async)을 최대 CONCURRENCY 개까지 동시에 돌립니다.
+# - 빈 응답/예외(대부분 429 rate limit)는 지수 백오프 + 지터로 MAX_RETRIES 번까지 다시 시도합니다.
+# - 생성된 기사는 기업 단위로 체크포인트 파일({"saved": [...], "news": {...}})에 바로 적어 두고,
+#   중간에 끊겨도 다시 실행하면 아직 생성/저장하지 않은 기업만 처리합니다.
+# - DB 저장은 마지막에 한 트랜잭션으로 한 번만 합니다. 모든 기업이 저장되면 체크포인트를 지웁니다.
+# - 제목 해시(news.source_hash, batch_update 와 같은 방식)가 이미 있는 기사는 다시 넣지 않습니다.
+#   (reuse 정책으로 캐시된 기사를 다시 받아도 news 테이블에 중복이 쌓이지 않음)
+# ------------------------------------------------------------------
+NEWS_PER_COMPANY = int(os.getenv("BULK_NEWS_COUNT", "10"))
+CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "4"))
+MAX_RETRIES = int(os.getenv("BULK_MAX_RETRIES", "5"))
+BACKOFF_BASE = 2.0      # 초, 시도마다 2배 (2, 4, 8, ...)
+BACKOFF_MAX = 60.0
+CACHE_POLICY = os.getenv("BULK_CACHE", "fresh")     # fresh: 새로 생성해 캐시에 변형 추가 / reuse: 캐시된 기사 재사용 / off
+CHECKPOINT_PATH = os.path.join(scripts_folder, "bulk_generate_virtual.checkpoint.json")
+
+NEWS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS news (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ticker TEXT,
+        title TEXT,
+        content TEXT,
+        summary TEXT,
+        sentiment TEXT,
+        impact_score INTEGER,
+        published_at TEXT,
+        company_name TEXT, 
+        category TEXT,
+        source TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+INSERT_SQL = """
+    INSERT INTO news (
+        company_name, category, title, content, 
+        summary, sentiment, impact_score, 
+        ticker, source, published_at, source_hash
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'), ?)
+"""
+
+
+def load_checkpoint():
+    """saved: 이미 DB에 저장한 기업명, news: {기업명: 기사 목록} 생성만 하고 아직 저장 못 한 결과"""
+    empty = {"saved": [], "news": {}}
+    if not os.path.exists(CHECKPOINT_PATH):
+        return empty
+    try:
+        with open(CHECKPOINT_PATH, encoding="utf-8") as f:
+            return {**empty, **json.load(f)}
+    except (OSError, ValueError) as e:
+        print(f"⚠️ 체크포인트를 읽지 못해 처음부터 시작합니다: {e}")
+        return empty
+
+
+def write_checkpoint(state: dict):
+    # 임시 파일에 쓰고 교체해서, 쓰는 도중 끊겨도 이전 체크포인트가 깨지지 않게 합니다.
+    tmp_path = CHECKPOINT_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, CHECKPOINT_PATH)
+
+
+def to_row(company, news):
+    """기사 dict -> INSERT 파라미터 (점수 음수 보정 + 언론사 기본값)"""
+    raw_score = news.get('impact_score', 0)
+    sentiment = str(news.get('sentiment', 'neutral')).lower()
+    try:
+        final_score = abs(int(raw_score))
+    except (TypeError, ValueError):
+        final_score = 0
+    if 'negative' in sentiment:
+        final_score = -final_score
+
+    source_name = news.get('source') or random.choice(VIRTUAL_PRESS)
+    return (
+        company['name'],
+        company['sector'],
+        news.get('title'),
+        news.get('content'),
+        news.get('summary'),
+        sentiment,
+        final_score,
+        company['name'],
+        source_name,
+        title_hash(news.get('title'))
+    )
+
+
+def save_direct_to_db(news_by_company: dict):
     """
-    stock_game.db에 뉴스를 저장합니다.
-    (테이블 강제 생성 + 점수 음수 보정 + 언론사 저장 기능 포함)
+    stock_game.db에 이번 실행의 뉴스를 한 트랜잭션으로 저장합니다.
+    (테이블 강제 생성 + 컬럼 보정은 실행당 한 번, 실패하면 전부 롤백) 저장한 기사 수를 반환합니다.
+    제목 해시가 이미 DB에 있거나 이번 실행에서 겹치는 기사는 건너뜁니다.
     """
-    db_path = os.path.join(backend_root, DB_NAME)
-    
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
+    by_name = {c['name']: c for c in TARGET_COMPANIES}
+    rows = [to_row(by_name[name], news) for name, news_list in news_by_company.items() if name in by_name for news in news_list]
+    if not rows:
+        return 0
+
+    db_path = os.path.join(backend_root, DB_PATH)
+    conn = sqlite3.connect(db_path, timeout=30)
     try:
-        # 1. 테이블이 없으면 만드는 안전장치
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS news (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ticker TEXT,
-                title TEXT,
-                content TEXT,
-                summary TEXT,
-                sentiment TEXT,
-                impact_score INTEGER,
-                published_at TEXT,
-                company_name TEXT, 
-                category TEXT,
-                source TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # 2. 컬럼 확인 및 추가 (기존 DB에 새 칸 뚫기)
-        cursor.execute("PRAGMA table_info(news)")
-        columns = [info[1] for info in cursor.fetchall()]
-        
-        if 'company_name' not in columns:
-            cursor.execute("ALTER TABLE news ADD COLUMN company_name TEXT")
-        if 'category' not in columns:
-            cursor.execute("ALTER TABLE news ADD COLUMN category TEXT")
-        if 'source' not in columns:
-            cursor.execute("ALTER TABLE news ADD COLUMN source TEXT")
-            
-        for news in news_list:
-            # 3. 점수 및 감성 보정
-            raw_score = news.get('impact_score', 0)
-            sentiment = news.get('sentiment', 'neutral').lower()
-            
-            final_score = abs(raw_score) 
-            if 'negative' in sentiment:
-                final_score = -final_score
-
-            # 4. 언론사 랜덤 선택 (가상 뉴스니까 VIRTUAL_PRESS 중 하나 뽑기)
-            source_name = news.get('source', random.choice(VIRTUAL_PRESS))
-
-            # 5. 데이터 삽입 (source 포함)
-            cursor.execute("""
-                INSERT INTO news (
-                    company_name, category, title, content, 
-                    summary, sentiment, impact_score, 
-                    ticker, source, published_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))
-            """, (
-                company_name, 
-                category, 
-                news.get('title'), 
-                news.get('content'),
-                news.get('summary'), 
-                sentiment,     
-                final_score,
-                company_name,
-                source_name
-            ))
-            
-        conn.commit()
-        print(f" -> ✅ 저장 완료 (감성: {sentiment}, 점수: {final_score}, 출처: {source_name})")
-        
-    except Exception as e:
-        print(f" -> ❌ 저장 실패: {e}")
+        with conn:
+            # 1. 테이블이 없으면 만드는 안전장치
+            conn.execute(NEWS_TABLE_SQL)
+
+            # 2. 컬럼 확인 및 추가 (기존 DB에 새 칸 뚫기)
+            columns = {info[1] for info in conn.execute("PRAGMA table_info(news)")}
+            for column in ("company_name", "category"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE news ADD COLUMN {column} TEXT")
+            ensure_news_columns(conn)
+
+            # 3. 이미 있는 기사 거르기 (제목 해시)
+            seen = known_hashes(conn, {row[-1] for row in rows})
+            new_rows = []
+            for row in rows:
+                if row[-1] not in seen:
+                    seen.add(row[-1])
+                    new_rows.append(row)
+            if len(new_rows) < len(rows):
+                print(f"♻️ 이미 저장된 기사 {len(rows) - len(new_rows)}건은 건너뜁니다.")
+
+            # 4. 전체 기사 일괄 삽입
+            conn.executemany(INSERT_SQL, new_rows)
     finally:
         conn.close()
+    return len(new_rows)
+
+
+async def generate_company(agent, company, semaphore):
+    """한 기업의 뉴스를 생성해 (기업, 기사 목록)을 돌려줍니다. 빈 응답/예외는 백오프 후 재시도, 끝내 실패하면 기사 목록이 None"""
+    for attempt in range(MAX_RETRIES + 1):
+        async with semaphore:
+            try:
+                result = await agent.analyze_stock_news_async(
+                    company['name'], mode="virtual", count=NEWS_PER_COMPANY, company_desc=company.get('desc', ''),
+                    cache=CACHE_POLICY
+                )
+            except Exception as e:
+                print(f"⚠️ {company['name']} 호출 오류: {e}")
+                result = None
+
+        news_list = [n for n in result if isinstance(n, dict)] if isinstance(result, list) else []
+        if news_list:
+            for news_item in news_list:
+                news_item.setdefault('source', random.choice(VIRTUAL_PRESS))
+            return company, news_list
+
+        if attempt < MAX_RETRIES:
+            # 세마포어를 놓은 채로 기다려서 다른 기업 작업은 계속 진행되게 합니다.
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)) * random.uniform(0.5, 1.0)
+            print(f"🔁 {company['name']} 재시도 {attempt + 1}/{MAX_RETRIES} ({delay:.1f}초 후)")
+            await asyncio.sleep(delay)
+    return company, None
+
+
+async def run_pipeline():
+    state = load_checkpoint()
+    news_by_company = state["news"]
+    skip = set(state["saved"]) | set(news_by_company)
+    pending = [c for c in TARGET_COMPANIES if c['name'] not in skip]
+    total = len(pending)
+    if skip:
+        print(f"♻️ 체크포인트 이어받기: 저장 완료 {len(state['saved'])}개, 저장 대기 {len(news_by_company)}개, 남은 기업 {total}개")
+
+    agent = StockAgentService(mode="virtual") if pending else None
+    semaphore = asyncio.Semaphore(max(1, CONCURRENCY))
+    started = time.perf_counter()
+    generated, finished_count, failed = 0, 0, []
+
+    print(f"\n🏢 [Money Quest] 기업당 {NEWS_PER_COMPANY}건의 최신 뉴스 생성을 시작합니다... (동시 {CONCURRENCY}개)\n")
+
+    tasks = [asyncio.create_task(generate_company(agent, c, semaphore)) for c in pending]
+    for finished in asyncio.as_completed(tasks):
+        company, news_list = await finished
+        finished_count += 1
+        if news_list:
+            news_by_company[company['name']] = news_list
+            write_checkpoint(state)
+            generated += len(news_list)
+        else:
+            failed.append(company['name'])
+
+        elapsed = time.perf_counter() - started
+        status = f"✅ {len(news_list)}건" if news_list else "❌ 생성 실패"
+        print(f"✍️ [{finished_count}/{total}] {company['name']} {status} "
+              f"| 경과 {elapsed:.1f}초, {generated / elapsed if elapsed else 0:.2f}건/초")
+
+    save_started = time.perf_counter()
+    try:
+        saved = save_direct_to_db(news_by_company)
+    except Exception as e:
+        print(f"\n❌ 저장 실패 (체크포인트는 남겨 두었습니다. 다시 실행하면 저장부터 이어갑니다): {e}")
+        return
+    save_elapsed = time.perf_counter() - save_started
+
+    if failed:
+        # 저장한 기업은 saved 로 옮기고, 실패한 기업만 다음 실행에서 다시 생성합니다.
+        write_checkpoint({"saved": state["saved"] + list(news_by_company), "news": {}})
+    elif os.path.exists(CHECKPOINT_PATH):
+        os.remove(CHECKPOINT_PATH)
+
+    elapsed = time.perf_counter() - started
+    print(f"\n📊 생성 {generated}건 / 저장 {saved}건 (DB {save_elapsed * 1000:.0f}ms, 1 트랜잭션)")
+    print(f"⏱️ 총 {elapsed:.1f}초, 처리량 {generated / elapsed if elapsed else 0:.2f}건/초, "
+          f"{total - len(failed)}/{total}개 기업 성공")
+    if agent:
+        print(f"📈 LLM 호출 지연: {json.dumps(agent.latency_snapshot(), ensure_ascii=False)}")
+        print(f"🗄️ LLM 캐시 ({CACHE_POLICY}): {json.dumps(agent.cache_snapshot(), ensure_ascii=False)}")
+    if failed:
+        print(f"⚠️ 실패한 기업 ({len(failed)}): {', '.join(failed)} -> 다시 실행하면 이 기업들만 생성합니다.")
+
 
 def run_bulk_generation():
-    print(f"📂 사용 중인 DB: {DB_NAME}") 
-    agent = StockAgentService(mode="virtual")
+    print(f"📂 사용 중인 DB: {DB_PATH}") 
     
     # 🧹 [안전장치 1] 시작하자마자 기존 뉴스를 싹 지워버립니다.
     # try:
-    #     db_path = os.path.join(backend_root, DB_NAME)
+    #     db_path = os.path.join(backend_root, DB_PATH)
     #     conn = sqlite3.connect(db_path)
     #     cursor = conn.cursor()
     #     cursor.execute("DELETE FROM news") 
@@ -135,26 +273,8 @@ def run_bulk_generation():
     # except Exception as e:
     #     print(f"⚠️ 초기화 중 경고: {e}")
 
-    print("\n🏢 [Money Quest] 기업당 10건의 최신 뉴스 생성을 시작합니다...\n")
-
-    for comp in TARGET_COMPANIES:
-        print(f"✍️ {comp['name']} 뉴스 생성 중...", end="", flush=True)
-
-        result = agent.analyze_stock_news(comp['name'], mode="virtual", count=10, company_desc=comp.get('desc', '')) 
-        
-        if isinstance(result, list) and len(result) > 0:
-            final_result = result 
-            
-            for news_item in final_result:
-                news_item['source'] = random.choice(VIRTUAL_PRESS)
-
-            save_direct_to_db(comp['name'], comp['sector'], final_result)
-        else:
-            print(f" -> ❌ 생성 실패")
-            
-        time.sleep(1)
-
+    asyncio.run(run_pipeline())
     print("\n✨ 모든 작업 완료!")
 
 if __name__ == "__main__":
-    run_bulk_generation()
\ No newline at end of file
+    run_bulk_generation()
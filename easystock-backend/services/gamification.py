@@ -1,11 +1,6 @@
 from datetime import datetime
 import aiosqlite
-import os
-from database import DB_PATH
-
-# 경로 설정
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DB_PATH = os.path.join(BASE_DIR, "DB_PATH")
+from database import db_writer
 
 # 레벨업 경험치 테이블
 LEVEL_TABLE = {
@@ -20,16 +15,14 @@ LEVEL_TABLE = {
 async def gain_exp(user_id: int, amount: int, max_level: int = None, db: aiosqlite.Connection = None):
     """
     유저에게 경험치를 지급하고, 레벨업을 체크합니다.
-    db: 외부에서 이미 열린 DB 커넥션이 있다면 그걸 씁니다. (없으면 새로 만듦)
+    db: 외부에서 이미 열린 DB 커넥션(쓰기 의도 안)이 있다면 그걸 씁니다.
+        (없으면 단일 작성자 큐에 쓰기 의도로 넘겨서, 따로 커넥션을 열지 않습니다)
     """
-    should_close_db = False
-    
-    try:
-        # 1. 외부에서 DB 연결을 안 줬으면 -> 새로 만든다.
-        if db is None:
-            db = await aiosqlite.connect(DB_PATH)
-            should_close_db = True
+    # 1. 외부에서 DB 연결을 안 줬으면 -> 작성자 큐에서 실행
+    if db is None:
+        return await db_writer.submit(lambda conn: gain_exp(user_id, amount, max_level, db=conn))
 
+    try:
         # 2. 현재 정보 가져오기
         cursor = await db.execute("SELECT level, exp FROM users WHERE id = ?", (user_id,))
         row = await cursor.fetchone()
@@ -60,29 +53,21 @@ async def gain_exp(user_id: int, amount: int, max_level: int = None, db: aiosqli
         # 5. DB 업데이트
         await db.execute("UPDATE users SET level = ?, exp = ? WHERE id = ?", (new_level, new_exp, user_id))
         
-        # 외부에서 받은 DB면 commit을 밖에서 하겠지만, 안전을 위해 여기서도 저장
-        if should_close_db:
-            await db.commit()
-
+        # commit 은 작성자(또는 커넥션을 넘겨준 쪽)가 합니다.
         return {"level": new_level, "exp": new_exp, "leveled_up": new_level > current_level}
 
     except Exception as e:
         print(f"❌ gain_exp 에러: {e}")
-    finally:
-        if should_close_db and db:
-            await db.close()
 
 # 퀘스트 체크 함수도 마찬가지로 db 파라미터 추가
 async def check_quest(user_id: int, quest_id: str, db: aiosqlite.Connection = None):
     """
-    db 파라미터를 받아서 기존 트랜잭션에 참여합니다.
+    db 파라미터를 받아서 기존 트랜잭션에 참여합니다. (없으면 작성자 큐에서 실행)
     """
-    should_close_db = False
-    try:
-        if db is None:
-            db = await aiosqlite.connect(DB_PATH)
-            should_close_db = True
+    if db is None:
+        return await db_writer.submit(lambda conn: check_quest(user_id, quest_id, db=conn))
 
+    try:
         # 이미 깼는지 확인
         cursor = await db.execute("SELECT is_completed FROM user_quests WHERE user_id = ? AND quest_id = ?", (user_id, quest_id))
         row = await cursor.fetchone()
@@ -103,16 +88,10 @@ async def check_quest(user_id: int, quest_id: str, db: aiosqlite.Connection = No
         
         # 여기서도 db를 넘겨줌!
         await gain_exp(user_id, reward, db=db)
-        
-        if should_close_db:
-            await db.commit()
             
         print(f"🏆 퀘스트 완료! [{quest_id}] 보상: {reward} EXP")
         return True
             
     except Exception as e:
         print(f"❌ check_quest 에러: {e}")
-        return False
-    finally:
-        if should_close_db and db:
-            await db.close()
\ No newline at end of file
+        return False
\ No newline at end of file
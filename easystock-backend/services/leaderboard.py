@@ -0,0 +1,265 @@
+import asyncio
+import time
+from database import db_pool, db_writer
+from core.leaderboard import Leaderboard
+
+# ------------------------------------------------------------------
+# 랭킹 서비스
+# - 서버 시작 때 users/holdings 를 쿼리 두 번으로 읽어 메모리 랭킹(core/leaderboard.py)을 만듭니다.
+# - 잔고/보유 주식이 바뀐 유저는 SQLite 트리거가 leaderboard_dirty 에 적어 두므로
+#   주문/보상/퀘스트 등 어느 경로로 바뀌었든 interval 마다 그 유저들만 다시 읽습니다.
+# - 가격은 시뮬레이션 엔진의 마지막 체결가를 interval 마다 비교해서 바뀐 종목만 반영합니다.
+#   체결이 없던 종목의 현재가와 이름 -> ticker 매핑은 price_reload_interval 마다 스레드에서 한 번에 읽어 두므로
+#   갱신 루프(이벤트 루프)에서는 DB 를 조회하지 않습니다.
+# - ranking_snapshot 은 snapshot_interval 마다 집합 쿼리 한 번(INSERT ... SELECT + 윈도 함수)으로 다시 채웁니다.
+# ------------------------------------------------------------------
+
+INITIAL_CAPITAL = 1_000_000   # 스냅샷 수익률 기준 (가입 축하금)
+
+SCHEMA_SQL = [
+    "CREATE TABLE IF NOT EXISTS leaderboard_dirty (user_id INTEGER PRIMARY KEY)",
+    """CREATE TABLE IF NOT EXISTS ranking_snapshot (
+        rank INTEGER, user_id INTEGER, username TEXT, total_asset REAL, profit_rate REAL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+    "CREATE TRIGGER IF NOT EXISTS trg_lb_users_ins AFTER INSERT ON users BEGIN INSERT OR IGNORE INTO leaderboard_dirty VALUES (NEW.id); END",
+    "CREATE TRIGGER IF NOT EXISTS trg_lb_users_upd AFTER UPDATE OF balance, level, exp, username ON users BEGIN INSERT OR IGNORE INTO leaderboard_dirty VALUES (NEW.id); END",
+    "CREATE TRIGGER IF NOT EXISTS trg_lb_users_del AFTER DELETE ON users BEGIN INSERT OR IGNORE INTO leaderboard_dirty VALUES (OLD.id); END",
+    "CREATE TRIGGER IF NOT EXISTS trg_lb_holdings_ins AFTER INSERT ON holdings BEGIN INSERT OR IGNORE INTO leaderboard_dirty VALUES (NEW.user_id); END",
+    "CREATE TRIGGER IF NOT EXISTS trg_lb_holdings_upd AFTER UPDATE ON holdings BEGIN INSERT OR IGNORE INTO leaderboard_dirty VALUES (NEW.user_id); END",
+    "CREATE TRIGGER IF NOT EXISTS trg_lb_holdings_del AFTER DELETE ON holdings BEGIN INSERT OR IGNORE INTO leaderboard_dirty VALUES (OLD.user_id); END",
+]
+
+# 유저별 총자산을 한 번에 계산해서 순위까지 매겨 넣습니다. (가격은 임시 테이블 live_prices)
+SNAPSHOT_SQL = """
+    INSERT INTO ranking_snapshot (rank, user_id, username, total_asset, profit_rate, updated_at)
+    SELECT ROW_NUMBER() OVER (ORDER BY total DESC, id), id, username, total,
+           ROUND((total - :capital) * 100.0 / :capital, 2), CURRENT_TIMESTAMP
+    FROM (
+        SELECT u.id, u.username, COALESCE(u.balance, 0) + COALESCE(SUM(h.quantity * p.price), 0) AS total
+        FROM users u
+        LEFT JOIN holdings h ON h.user_id = u.id AND h.quantity > 0
+        LEFT JOIN live_prices p ON p.company_name = h.company_name
+        GROUP BY u.id
+    )
+"""
+
+CHUNK = 500   # IN (...) 한 번에 넣는 id 수
+
+
+async def ensure_schema(conn):
+    for sql in SCHEMA_SQL:
+        await conn.execute(sql)
+
+
+async def read_users(conn, user_ids=None):
+    """({user_id: users 행}, {user_id: {종목: (수량, 평단가)}}) - user_ids 가 None 이면 전체"""
+    if user_ids is None:
+        groups = [None]
+    else:
+        ids = list(user_ids)
+        groups = [ids[i:i + CHUNK] for i in range(0, len(ids), CHUNK)]
+
+    users, holdings = {}, {}
+    for group in groups:
+        where, params = ("", ()) if group is None else (f"WHERE id IN ({','.join('?' * len(group))})", group)
+        cursor = await conn.execute(f"SELECT id, username, balance, level, exp FROM users {where}", params)
+        for row in await cursor.fetchall():
+            users[row["id"]] = row
+            holdings[row["id"]] = {}
+        where = "" if group is None else f"AND user_id IN ({','.join('?' * len(group))})"
+        cursor = await conn.execute(f"SELECT user_id, company_name, quantity, average_price FROM holdings WHERE quantity > 0 {where}", params)
+        for row in await cursor.fetchall():
+            if row["user_id"] in holdings:
+                holdings[row["user_id"]][row["company_name"]] = (row["quantity"], row["average_price"])
+    return users, holdings
+
+
+class EnginePrices:
+    """holdings.company_name -> 현재가 (엔진 마지막 체결가, 없으면 reload 때 읽어 둔 DB 현재가)"""
+
+    def __init__(self, engine_fn):
+        self.engine_fn = engine_fn      # 시뮬레이션 엔진 (처음 쓸 때 불러옴)
+        self.tickers = {}               # 회사 이름/코드 -> ticker (없는 이름은 None 으로 남음)
+        self.db_prices = {}             # ticker -> companies.current_price
+
+    def __call__(self, name):
+        ticker = self.tickers.get(name)
+        if ticker is None:
+            return None
+        price = self.engine_fn().last_prices.get(ticker)
+        return price if price is not None else self.db_prices.get(ticker)
+
+    @staticmethod
+    def _read():
+        from database import SessionLocal, DBCompany
+        with SessionLocal() as db:
+            return db.query(DBCompany.ticker, DBCompany.name, DBCompany.current_price).all()
+
+    async def reload(self):
+        rows = await asyncio.to_thread(self._read)
+        tickers, db_prices = {}, {}
+        for ticker, name, price in rows:
+            tickers[ticker] = tickers[name] = ticker
+            db_prices[ticker] = price
+        self.tickers, self.db_prices = tickers, db_prices
+
+
+class LeaderboardService:
+    def __init__(self, price_of, interval: float = 1.0, snapshot_interval: float = 60.0,
+                 reload_prices=None, price_reload_interval: float = 60.0):
+        self.board = Leaderboard()
+        self.price_of = price_of                    # 종목(holdings.company_name) -> 현재가 (DB 조회 없이)
+        self.reload_prices = reload_prices          # price_of 가 쓰는 매핑/현재가를 다시 읽는 코루틴 함수
+        self.interval = interval
+        self.snapshot_interval = snapshot_interval
+        self.price_reload_interval = price_reload_interval
+        self._task = None
+        self._last_snapshot = 0.0
+        self._last_price_reload = 0.0
+        self.loaded = False
+        self.stats = {"refreshes": 0, "dirty_users": 0, "price_updates": 0, "snapshots": 0, "snapshot_ms": 0.0}
+
+    def _apply(self, users, holdings):
+        for user_id, row in users.items():
+            self.board.upsert_user(user_id, row["username"], row["balance"] or 0,
+                                   row["level"] or 1, row["exp"] or 0, holdings.get(user_id))
+
+    async def _maybe_reload_prices(self, force=False):
+        if self.reload_prices is None:
+            return
+        if force or time.monotonic() - self._last_price_reload >= self.price_reload_interval:
+            await self.reload_prices()
+            self._last_price_reload = time.monotonic()
+
+    def refresh_prices(self):
+        for name in list(self.board.holders):
+            price = self.price_of(name) or 0
+            if price != self.board.prices.get(name, 0):
+                self.board.set_price(name, price)
+                self.stats["price_updates"] += 1
+
+    async def load(self):
+        """전체 다시 읽기 (서버 시작 때)"""
+        async def prepare(conn):
+            await ensure_schema(conn)
+            await conn.execute("DELETE FROM leaderboard_dirty")   # 이후 변경분만 dirty 로 남습니다.
+        await db_writer.submit(prepare)
+
+        async with db_pool.acquire() as conn:
+            users, holdings = await read_users(conn)
+        self.board = Leaderboard()
+        self._apply(users, holdings)
+        await self._maybe_reload_prices(force=True)
+        self.refresh_prices()
+        self.board.settle()
+        self.loaded = True
+        return len(self.board)
+
+    async def refresh(self):
+        """바뀐 유저만 다시 읽고, 가격이 바뀐 종목을 반영합니다."""
+        async def collect(conn):
+            cursor = await conn.execute("DELETE FROM leaderboard_dirty RETURNING user_id")
+            ids = [row[0] for row in await cursor.fetchall()]
+            if not ids:
+                return ids, {}, {}
+            users, holdings = await read_users(conn, ids)
+            return ids, users, holdings
+
+        ids, users, holdings = await db_writer.submit(collect)
+        for user_id in ids:
+            if user_id not in users:
+                self.board.remove_user(user_id)
+        self._apply(users, holdings)
+        await self._maybe_reload_prices()
+        self.refresh_prices()
+        self.board.settle()   # 정렬은 여기서 끝내 두어 조회 요청이 비용을 내지 않도록
+        self.stats["refreshes"] += 1
+        self.stats["dirty_users"] += len(ids)
+
+    async def write_snapshot(self):
+        """ranking_snapshot 을 집합 쿼리 한 번으로 다시 채웁니다. (저장한 행 수 반환)"""
+        prices = [(name, price) for name, price in self.board.prices.items()]
+
+        async def rewrite(conn):
+            await conn.execute("CREATE TEMP TABLE IF NOT EXISTS live_prices (company_name TEXT PRIMARY KEY, price REAL)")
+            await conn.execute("DELETE FROM live_prices")
+            await conn.executemany("INSERT INTO live_prices VALUES (?, ?)", prices)
+            await conn.execute("DELETE FROM ranking_snapshot")
+            cursor = await conn.execute(SNAPSHOT_SQL, {"capital": INITIAL_CAPITAL})
+            return cursor.rowcount
+
+        started = time.perf_counter()
+        count = await db_writer.submit(rewrite)
+        self.stats["snapshots"] += 1
+        self.stats["snapshot_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        self._last_snapshot = time.monotonic()
+        return count
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+                if time.monotonic() - self._last_snapshot >= self.snapshot_interval:
+                    await self.write_snapshot()
+            except Exception as e:
+                print(f"⚠️ [랭킹] 갱신 실패: {e}")
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try: await self._task
+            except asyncio.CancelledError: pass
+            self._task = None
+
+    # --------------------------------------------------------------
+    # 조회
+    # --------------------------------------------------------------
+    @staticmethod
+    def to_row(rank, user_id, entry):
+        return {
+            "rank": rank,
+            "user_id": user_id,
+            "username": entry.username,
+            "level": entry.level or 1,
+            "total_assets": int(entry.total),
+            "profit_rate": round(entry.profit_rate, 2),
+            "exp": entry.exp,
+        }
+
+    def top(self, k=10, offset=0):
+        return [self.to_row(*item) for item in self.board.top(k, offset)]
+
+    def user_rank(self, user_id):
+        """ranking_snapshot 과 같은 모양 (수익률은 가입 축하금 대비)"""
+        rank = self.board.rank(user_id)
+        if rank is None:
+            return None
+        entry = self.board.users[user_id]
+        return {
+            "rank": rank,
+            "user_id": user_id,
+            "username": entry.username,
+            "total_asset": int(entry.total),
+            "profit_rate": round((entry.total - INITIAL_CAPITAL) / INITIAL_CAPITAL * 100, 2),
+            "total_users": len(self.board),
+        }
+
+    def snapshot(self):
+        return {**self.stats, "users": len(self.board), **self.board.stats}
+
+
+def _market_engine():
+    # 시뮬레이션 엔진은 처음 쓸 때 불러옵니다. (벤치마크/스크립트에서 이 모듈만 쓸 수 있도록)
+    from main_simulation import market_engine
+    return market_engine
+
+
+# 시뮬레이션 엔진 가격을 쓰는 전역 서비스
+_live_prices = EnginePrices(_market_engine)
+leaderboard = LeaderboardService(_live_prices, reload_prices=_live_prices.reload)
@@ -0,0 +1,164 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from database import SessionLocal, DBAgent, DBCompany, DBNews
+from core.decision_cache import log_bucket
+from core.mentor_brain import generate_all_mentors_advice, FALLBACK_ADVICE
+
+# ------------------------------------------------------------------
+# 멘토 조언 캐시 (/team/api/advice/{ticker})
+# - 조언 한 번 = 관찰 쿼리 5번 + GPT-4o 4번. 같은 종목을 보는 유저는 보유 상태만 다르므로
+#   (종목, 보유량 구간, 수익률 구간)을 키로 조언을 공유합니다.
+#   공유되는 조언이므로 프롬프트에는 요청한 유저의 정확한 보유량/평단가 대신 구간 값을 넣습니다.
+# - 버전 = (현재가 1% 구간, 그 회사의 최신 뉴스 id). 체결로 가격이 구간을 벗어나거나 새 뉴스가 뜨면,
+#   또는 ttl 이 지나면 낡은 조언이 됩니다. 버전 확인은 가벼운 쿼리 두 번 (종목+최신 뉴스, 유저 보유)
+# - 낡은 조언은 max_stale 안이면 바로 돌려주고 뒤에서 다시 만듭니다. (stale-while-revalidate)
+# - 같은 키를 동시에 여러 명이 요청하면 진행 중인 계산 하나를 같이 기다립니다. (single-flight)
+# - LLM 실패 기본값(FALLBACK_ADVICE)이 섞인 결과나 에러는 저장하지 않습니다.
+# ------------------------------------------------------------------
+
+PRICE_BASE = 1.01       # 현재가 1% 구간
+QTY_BASE = 2            # 보유량 2배 구간
+PROFIT_STEP = 5.0       # 수익률 5%p 구간
+PROFIT_CAP = 10         # ±50% 밖은 한 구간으로
+
+
+def bucket_user_state(price, qty_bucket, profit_bucket):
+    """캐시 키 구간을 프롬프트용 유저 상태로 (구간에 속한 누구에게 보여도 맞는 값)"""
+    if qty_bucket <= 0:
+        return {"held_quantity": 0, "avg_price": 0, "profit_rate": "0%"}
+    lo, hi = QTY_BASE ** (qty_bucket - 1), QTY_BASE ** qty_bucket
+    held = f"{lo}" if hi - lo <= 1 else f"{lo}~{hi - 1}"
+    if profit_bucket is None or not price:
+        return {"held_quantity": held, "avg_price": 0, "profit_rate": "0%"}   # 평단가 기록이 없으면 원래처럼 0
+
+    low_rate, high_rate = profit_bucket * PROFIT_STEP, (profit_bucket + 1) * PROFIT_STEP
+    avg_at = lambda rate: f"{price / (1 + rate / 100):,.0f}"
+    if profit_bucket >= PROFIT_CAP:
+        avg, rate = f"약 {avg_at(low_rate)} 이하", f"{low_rate:+.0f}% 이상"
+    elif profit_bucket <= -PROFIT_CAP:
+        avg, rate = f"약 {avg_at(high_rate)} 초과", f"{high_rate:+.0f}% 미만"
+    else:
+        avg, rate = f"약 {avg_at(high_rate)}~{avg_at(low_rate)}", f"{low_rate:+.0f}%~{high_rate:+.0f}%"
+    return {"held_quantity": held, "avg_price": avg, "profit_rate": rate}
+
+
+class AdviceEntry:
+    __slots__ = ("advice", "version", "stored_at")
+
+    def __init__(self, advice, version, stored_at):
+        self.advice = advice
+        self.version = version
+        self.stored_at = stored_at
+
+
+class MentorAdviceService:
+    def __init__(self, ttl: float = 300.0, max_stale: float = 1800.0, max_entries: int = 2000,
+                 session_factory=SessionLocal, generate=generate_all_mentors_advice):
+        self.ttl = ttl                  # 버전이 같아도 이 시간(초)이 지나면 새로 만듦
+        self.max_stale = max_stale      # 이보다 오래된 조언은 기다리더라도 새로 만든 걸 돌려줌
+        self.max_entries = max_entries
+        self.session_factory = session_factory
+        self.generate = generate
+        self.entries = OrderedDict()    # key -> AdviceEntry
+        self.inflight = {}              # key -> asyncio.Task
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0,
+                      "refreshes": 0, "not_cached": 0, "evictions": 0}
+
+    def probe(self, db: Session, ticker: str, user_id: str):
+        """(캐시 키, 버전, 프롬프트용 유저 상태) 또는 종목이 없으면 None"""
+        latest_news = db.query(func.max(DBNews.id)) \
+                        .filter(DBNews.company_name == DBCompany.name) \
+                        .correlate(DBCompany).scalar_subquery()
+        company = db.query(DBCompany.current_price, latest_news).filter(DBCompany.ticker == ticker).first()
+        if not company:
+            return None
+        price, news_id = company
+        price = price or 0
+
+        user = db.query(DBAgent.portfolio, DBAgent.psychology).filter(DBAgent.agent_id == user_id).first()
+        qty, avg_price = 0, 0
+        if user:
+            qty = (user.portfolio or {}).get(ticker, 0)
+            avg_price = (user.psychology or {}).get(f"avg_price_{ticker}", 0)
+        profit = None
+        if avg_price and avg_price > 0:
+            rate = (price - avg_price) / avg_price * 100
+            profit = max(-PROFIT_CAP, min(PROFIT_CAP, int(rate // PROFIT_STEP)))
+
+        key = (ticker, log_bucket(qty, QTY_BASE), profit)
+        version = (log_bucket(price, PRICE_BASE), news_id)
+        return key, version, bucket_user_state(price, key[1], profit)
+
+    async def get(self, db: Session, ticker: str, user_id: str):
+        probe = self.probe(db, ticker, user_id)
+        db.rollback()   # 읽기 트랜잭션을 닫아 조언을 기다리는 동안 커넥션을 붙잡지 않음
+        if probe is None:
+            return {"error": "종목 데이터를 찾을 수 없습니다."}
+        key, version, user_state = probe
+
+        entry = self.entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry.stored_at
+            if entry.version == version and age <= self.ttl:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry.advice
+            if age <= self.max_stale:
+                # 낡았지만 쓸 만한 조언은 바로 주고, 새 조언은 뒤에서 (이미 만드는 중이면 그대로 둠)
+                self.stats["stale_hits"] += 1
+                self._refresh(key, ticker, user_id, user_state, version)
+                return entry.advice
+
+        self.stats["misses"] += 1
+        # 요청이 끊겨도 같이 기다리는 다른 요청을 위해 계산 자체는 취소하지 않습니다.
+        return await asyncio.shield(self._refresh(key, ticker, user_id, user_state, version))
+
+    def _refresh(self, key, ticker, user_id, user_state, version):
+        task = self.inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+            return task
+        task = asyncio.create_task(self._compute(key, ticker, user_id, user_state, version))
+        self.inflight[key] = task
+        task.add_done_callback(lambda _: self.inflight.pop(key, None))
+        return task
+
+    async def _compute(self, key, ticker, user_id, user_state, version):
+        self.stats["refreshes"] += 1
+        try:
+            # 요청 세션은 응답과 함께 닫히므로 백그라운드 갱신은 자기 세션을 씁니다.
+            with self.session_factory() as db:
+                advice = await self.generate(db, ticker, user_id, user_state=user_state)
+        except Exception as e:
+            self.stats["not_cached"] += 1
+            return {"error": str(e)}
+
+        if "error" in advice or any(v == FALLBACK_ADVICE for v in advice.values() if isinstance(v, dict)):
+            self.stats["not_cached"] += 1
+            return advice
+
+        self.entries[key] = AdviceEntry(advice, version, time.monotonic())
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+        return advice
+
+    def snapshot(self):
+        lookups = self.stats["hits"] + self.stats["stale_hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self.entries),
+            "inflight": len(self.inflight),
+            "hit_rate": round((self.stats["hits"] + self.stats["stale_hits"]) / lookups, 4) if lookups else 0.0,
+        }
+
+
+mentor_advice = MentorAdviceService(
+    ttl=float(os.getenv("MENTOR_ADVICE_TTL", "300")),
+    max_stale=float(os.getenv("MENTOR_ADVICE_MAX_STALE", "1800")),
+)
@@ -0,0 +1,232 @@
+import json
+import base64
+
+# ------------------------------------------------------------------
+# 뉴스 전문 검색 (SQLite FTS5)
+# - news 테이블을 원본(content table)으로 쓰는 news_fts 색인을 trigram 토크나이저로 만듭니다.
+#   한국어는 띄어쓰기 단위가 '삼송전자가', '반도체를' 처럼 조사가 붙어 있어서 단어 단위 토크나이저로는
+#   '삼송전자' 가 안 걸리는데, trigram 은 세 글자 조각으로 색인하므로 부분 문자열 검색이 됩니다.
+# - news 에 INSERT/UPDATE/DELETE 가 일어나면 트리거가 색인을 같이 고칩니다. (batch_update, bulk_generate,
+#   news_manager 등 기존 저장 코드는 그대로)
+# - 두 글자 이하 검색어는 trigram 색인으로 찾을 수 없어서 LIKE 로 거릅니다.
+#   세 글자 이상 검색어가 하나라도 있으면 색인으로 좁힌 결과 안에서만 거르고, 전부 짧을 때만 전체를 훑습니다.
+# - 작성자 큐/풀 어느 쪽 연결이든 받아서 쓰는 함수라 commit 은 하지 않습니다.
+# ------------------------------------------------------------------
+
+NEWS_FTS_SQL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS news_fts USING fts5(
+        title, summary, content, content='news', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS trg_news_fts_ins AFTER INSERT ON news BEGIN
+        INSERT INTO news_fts (rowid, title, summary, content) VALUES (NEW.id, NEW.title, NEW.summary, NEW.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_news_fts_del AFTER DELETE ON news BEGIN
+        INSERT INTO news_fts (news_fts, rowid, title, summary, content) VALUES ('delete', OLD.id, OLD.title, OLD.summary, OLD.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_news_fts_upd AFTER UPDATE OF title, summary, content ON news BEGIN
+        INSERT INTO news_fts (news_fts, rowid, title, summary, content) VALUES ('delete', OLD.id, OLD.title, OLD.summary, OLD.content);
+        INSERT INTO news_fts (rowid, title, summary, content) VALUES (NEW.id, NEW.title, NEW.summary, NEW.content);
+    END""",
+]
+
+# 목록 API 용 색인 (본문 content 는 목록에서 읽지 않음)
+# - ix_news_list: 목록 열을 모두 담은 커버링 색인. 큰 content 가 든 원본 행(오버플로 페이지)을 건드리지 않고
+#   id 역순으로 한 페이지를 읽습니다.
+# - ix_news_company / ix_news_ticker: 회사/종목 필터 + id 역순 키셋 페이지
+NEWS_LIST_INDEX_SQL = [
+    """CREATE INDEX IF NOT EXISTS ix_news_list ON news
+       (id, title, summary, sentiment, impact_score, category, source, company_name, ticker, published_at, created_at)""",
+    "CREATE INDEX IF NOT EXISTS ix_news_company ON news (company_name, id)",
+    "CREATE INDEX IF NOT EXISTS ix_news_ticker ON news (ticker, id)",
+]
+# 예전 스크립트가 만든 news 테이블에는 없을 수도 있는 목록 열
+LIST_EXTRA_COLUMNS = {"ticker": "TEXT", "company_name": "TEXT", "category": "TEXT", "source": "TEXT",
+                      "sentiment": "TEXT", "impact_score": "INTEGER", "published_at": "TEXT",
+                      "created_at": "TIMESTAMP"}
+
+# bm25 열 가중치 (제목 > 요약 > 본문)
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+SNIPPET_TOKENS = 24     # trigram 은 글자 하나가 토큰 하나라서 약 24자
+MIN_TERM = 3            # trigram 색인으로 찾을 수 있는 최소 글자 수
+
+LIST_COLUMNS = "n.id, n.title, n.summary, n.sentiment, n.impact_score, n.category, n.source, n.company_name, n.ticker, n.published_at"
+
+
+async def ensure_index(conn):
+    """
+    목록 색인과 전문 검색 색인/트리거를 만들고, 새로 만든 전문 검색 색인이면 기존 기사로 한 번 채웁니다.
+    (채운 기사 수 반환)
+    """
+    cursor = await conn.execute("SELECT name FROM sqlite_master WHERE name IN ('news', 'news_fts')")
+    names = {row[0] for row in await cursor.fetchall()}
+    if "news" not in names:
+        return 0    # 뉴스 테이블이 아직 없는 DB (init_db 가 만든 뒤 다시 부름)
+
+    cursor = await conn.execute("PRAGMA table_info(news)")
+    columns = {row[1] for row in await cursor.fetchall()}
+    for column, kind in LIST_EXTRA_COLUMNS.items():
+        if column not in columns:
+            await conn.execute(f"ALTER TABLE news ADD COLUMN {column} {kind}")
+    for sql in NEWS_LIST_INDEX_SQL:
+        await conn.execute(sql)
+
+    existed = "news_fts" in names
+    for sql in NEWS_FTS_SQL:
+        await conn.execute(sql)
+    if existed:
+        return 0
+    await conn.execute("INSERT INTO news_fts (news_fts) VALUES ('rebuild')")
+    cursor = await conn.execute("SELECT COUNT(*) FROM news")
+    return (await cursor.fetchone())[0]
+
+
+def parse_query(q):
+    """검색어 -> (FTS MATCH 식 또는 None, LIKE 로 거를 짧은 검색어 목록)"""
+    long_terms, short_terms = [], []
+    for term in (q or "").split():
+        (long_terms if len(term) >= MIN_TERM else short_terms).append(term)
+    # 각 검색어를 "..." 구문으로 감싸 FTS 문법 문자(*, :, - 등)가 연산자로 해석되지 않게 합니다.
+    match = " ".join('"' + t.replace('"', '""') + '"' for t in long_terms) or None
+    return match, short_terms
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """잘못된 커서면 ValueError"""
+    if not cursor:
+        return None
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception as e:
+        raise ValueError("잘못된 cursor 입니다.") from e
+
+
+def _like_filters(short_terms, params):
+    clauses = []
+    for i, term in enumerate(short_terms):
+        key = f"like{i}"
+        params[key] = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        clauses.append(f"(n.title LIKE :{key} ESCAPE '\\' OR n.summary LIKE :{key} ESCAPE '\\' OR n.content LIKE :{key} ESCAPE '\\')")
+    return clauses
+
+
+async def search_news(conn, q, limit=20, cursor=None, sort="relevance", company=None):
+    """
+    {"items": [...], "next_cursor": str | None}
+    sort: relevance (bm25 점수 순) / recent (최신순)
+    cursor: 이전 응답의 next_cursor (OFFSET 없이 마지막 행 다음부터 이어서 읽음)
+    """
+    match, short_terms = parse_query(q)
+    after = decode_cursor(cursor)
+    params = {"limit": limit + 1}
+    where = _like_filters(short_terms, params)
+    if company:
+        where.append("(n.company_name = :company OR n.ticker = :company)")
+        params["company"] = company
+
+    if match is not None:
+        return await _search_indexed(conn, match, where, params, limit, after, sort)
+
+    # 짧은 검색어뿐이면 색인을 못 쓰므로 최신순으로 훑습니다.
+    if after:
+        where.append("n.id < :after_id")
+        params["after_id"] = after[-1]
+    sql = f"""
+        SELECT {LIST_COLUMNS}, NULL AS snippet, NULL AS score FROM news n
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY n.id DESC LIMIT :limit
+    """
+    rows = [dict(r) for r in await (await conn.execute(sql, params)).fetchall()]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1]["id"]])
+    return {"items": rows, "next_cursor": next_cursor}
+
+
+async def _search_indexed(conn, match, where, params, limit, after, sort):
+    # 1단계: 색인에서 이번 페이지의 기사 id 만 고릅니다. (스니펫은 아직 만들지 않음)
+    params["match"] = match
+    source = "news_fts JOIN news n ON n.id = news_fts.rowid" if where else "news_fts"
+    if sort == "recent":
+        # FTS5 는 rowid 역순으로 바로 읽을 수 있어서 limit 건만 보고 멈춥니다.
+        if after:
+            where.append("news_fts.rowid < :after_id")
+            params["after_id"] = after[-1]
+        sql = f"""
+            SELECT news_fts.rowid AS id, NULL AS score FROM {source}
+            WHERE {" AND ".join(["news_fts MATCH :match"] + where)}
+            ORDER BY news_fts.rowid DESC LIMIT :limit
+        """
+    else:
+        # bm25 는 작을수록 관련도가 높습니다. (score, id) 다음 행부터 이어서 읽습니다.
+        w_title, w_summary, w_content = BM25_WEIGHTS
+        outer = ""
+        if after:
+            outer = "WHERE score > :after_score OR (score = :after_score AND id > :after_id)"
+            params["after_score"], params["after_id"] = after
+        sql = f"""
+            SELECT id, score FROM (
+                SELECT news_fts.rowid AS id, bm25(news_fts, {w_title}, {w_summary}, {w_content}) AS score
+                FROM {source}
+                WHERE {" AND ".join(["news_fts MATCH :match"] + where)}
+            ) {outer}
+            ORDER BY score, id LIMIT :limit
+        """
+    hits = [tuple(r) for r in await (await conn.execute(sql, params)).fetchall()]
+    next_cursor = None
+    if len(hits) > limit:
+        hits = hits[:limit]
+        last_id, last_score = hits[-1]
+        next_cursor = encode_cursor([last_id] if sort == "recent" else [last_score, last_id])
+    if not hits:
+        return {"items": [], "next_cursor": None}
+
+    # 2단계: 고른 기사에만 스니펫을 만듭니다.
+    ids = [hit[0] for hit in hits]
+    cursor = await conn.execute(f"""
+        SELECT {LIST_COLUMNS}, snippet(news_fts, -1, '<b>', '</b>', '…', {SNIPPET_TOKENS}) AS snippet
+        FROM news_fts JOIN news n ON n.id = news_fts.rowid
+        WHERE news_fts MATCH ? AND news_fts.rowid IN ({",".join("?" * len(ids))})
+    """, (match, *ids))
+    by_id = {r["id"]: dict(r) for r in await cursor.fetchall()}
+    items = [{**by_id[news_id], "score": score} for news_id, score in hits if news_id in by_id]
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def mention_filter(column, name):
+    """
+    (SQL 조건, 파라미터): column 값이 name 이거나 제목/요약에 name 이 들어간 기사
+    기존 'title LIKE %x% OR summary LIKE %x%' 전체 스캔 대신 색인에서 기사 id 를 먼저 찾습니다.
+    """
+    if len(name) >= MIN_TERM:
+        match = '{title summary} : "' + name.replace('"', '""') + '"'
+        return (f"({column} = :name OR id IN (SELECT rowid FROM news_fts WHERE news_fts MATCH :name_match))",
+                {"name": name, "name_match": match})
+    return (f"({column} = :name OR title LIKE :name_like OR summary LIKE :name_like)",
+            {"name": name, "name_like": f"%{name}%"})
+
+
+async def list_news(conn, columns, condition=None, params=None, before_id=None, limit=50):
+    """
+    id 역순 키셋 페이지: (행 목록, 다음 페이지 before_id 또는 None)
+    OFFSET 없이 'id < 마지막 id' 로 이어서 읽으므로 뒤 페이지도 앞 페이지와 같은 비용입니다.
+    """
+    params = dict(params or {})
+    where = [condition] if condition else []
+    if before_id:
+        where.append("id < :before_id")
+        params["before_id"] = before_id
+    params["limit"] = limit + 1
+    cursor = await conn.execute(f"""
+        SELECT {columns} FROM news
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY id DESC LIMIT :limit
+    """, params)
+    rows = await cursor.fetchall()
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1]["id"]
+    return rows, None
@@ -0,0 +1,89 @@
+# ------------------------------------------------------------------
+# 대기 주문 일괄 체결 (Set-based Execution)
+# - 가격이 크게 움직여서 수천 건이 한꺼번에 체결돼도, 주문마다 SELECT/UPDATE 를 돌지 않고
+#   체결 대상을 임시 테이블에 executemany 로 한 번 넣은 뒤 집합 SQL 몇 줄로 끝냅니다.
+#   (holdings 는 INSERT ... ON CONFLICT DO UPDATE, 잔고/주문 상태는 UPDATE ... FROM)
+# - 체결가는 기존 방식 그대로 각 주문의 지정가입니다.
+# - 작성자 큐(db_writer)의 쓰기 의도 안에서 부르는 함수라 commit 은 하지 않습니다.
+# ------------------------------------------------------------------
+
+# 대기(PENDING) 주문만 담는 부분 인덱스: 체결/취소된 주문이 쌓여도 인덱스 크기는 대기 주문 수만큼입니다.
+PENDING_INDEX_SQL = """
+    CREATE INDEX IF NOT EXISTS ix_orders_pending_cross
+    ON orders (company_name, order_type, price) WHERE status = 'PENDING'
+"""
+
+CROSSING_SQL = {
+    # orders(company_name, order_type, price) WHERE status='PENDING' 부분 인덱스를 범위로 탑니다.
+    "BUY": """
+        SELECT id, user_id, price, quantity - COALESCE(filled_quantity, 0) AS remaining FROM orders
+        WHERE company_name = ? AND order_type = 'BUY' AND status = 'PENDING' AND price >= ?
+    """,
+    "SELL": """
+        SELECT id, user_id, price, quantity - COALESCE(filled_quantity, 0) AS remaining FROM orders
+        WHERE company_name = ? AND order_type = 'SELL' AND status = 'PENDING' AND price <= ?
+    """,
+}
+
+
+async def execute_crossing(conn, company_name, current_price, detach=None):
+    """
+    current_price 에 닿은 대기 주문을 모두 체결합니다. (체결 건수 반환)
+    detach(ids) -> {주문 id: 실제 남은 수량}: 호가창에 올라가 있던 주문을 먼저 내리고
+    (아직 DB 반영 전인 부분 체결까지 뺀) 정확한 남은 수량을 알려 주는 콜백입니다.
+    """
+    rows = []
+    for side, sql in CROSSING_SQL.items():
+        cursor = await conn.execute(sql, (company_name, current_price))
+        rows += [(r["id"], r["user_id"], side, r["price"], r["remaining"]) for r in await cursor.fetchall()]
+    if not rows:
+        return 0
+
+    live = detach([r[0] for r in rows]) if detach else {}
+    fills = [(oid, uid, side, price, live.get(oid, remaining)) for oid, uid, side, price, remaining in rows]
+    fills = [f for f in fills if f[4] > 0]
+    if not fills:
+        return 0
+
+    await conn.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS exec_fills (
+            order_id INTEGER PRIMARY KEY, user_id INTEGER, side TEXT, price INTEGER, qty INTEGER
+        )
+    """)
+    await conn.execute("DELETE FROM exec_fills")
+    await conn.executemany("INSERT INTO exec_fills VALUES (?, ?, ?, ?, ?)", fills)
+
+    # 1. 매수: 유저별로 합쳐서 주식 지급 (평단가는 기존 보유분과 가중 평균)
+    await conn.execute("""
+        INSERT INTO holdings (user_id, company_name, quantity, average_price)
+        SELECT user_id, ?, SUM(qty), CAST(SUM(qty * price) AS REAL) / SUM(qty)
+        FROM exec_fills WHERE side = 'BUY' GROUP BY user_id
+        ON CONFLICT (user_id, company_name) DO UPDATE SET
+            average_price = CASE WHEN holdings.quantity + excluded.quantity > 0
+                THEN (holdings.quantity * COALESCE(holdings.average_price, 0) + excluded.quantity * excluded.average_price)
+                     / (holdings.quantity + excluded.quantity)
+                ELSE excluded.average_price END,
+            quantity = holdings.quantity + excluded.quantity
+    """, (company_name,))
+
+    # 2. 매도: 유저별 판매 대금 지급
+    await conn.execute("""
+        UPDATE users SET balance = balance + s.income
+        FROM (SELECT user_id, SUM(qty * price) AS income FROM exec_fills WHERE side = 'SELL' GROUP BY user_id) AS s
+        WHERE users.id = s.user_id
+    """)
+
+    # 3. 주문 상태 한 번에 변경
+    await conn.execute("""
+        UPDATE orders SET status = 'FILLED', filled_quantity = COALESCE(orders.filled_quantity, 0) + f.qty
+        FROM exec_fills AS f WHERE orders.id = f.order_id
+    """)
+
+    # 4. 거래 원장
+    await conn.executemany(
+        "INSERT INTO transactions (user_id, transaction_type, amount, balance_after, description) VALUES (?, ?, ?, 0, ?)",
+        [(uid, side, -(price * qty) if side == "BUY" else price * qty, f"{company_name} {qty}주 지정가 체결")
+         for _, uid, side, price, qty in fills],
+    )
+    await conn.execute("DELETE FROM exec_fills")
+    return len(fills)
@@ -0,0 +1,272 @@
+import asyncio
+import time
+from collections import deque
+from sqlalchemy import or_
+from database import SessionLocal, DBCompany, db_pool, db_writer
+from core.settlement import EXTERNAL_PREFIX
+from core.llm_scheduler import percentile
+from services.order_execution import execute_crossing, PENDING_INDEX_SQL
+
+# ------------------------------------------------------------------
+# 유저 지정가 주문 -> 시뮬레이션 호가창 연결
+# - 유저 주문도 에이전트들이 거래하는 main_simulation.market_engine 의 호가창에 그대로 올립니다.
+# - 주문 접수 때 돈/주식을 먼저 묶어 두고(기존 방식), 체결되면 엔진 콜백이 체결을 큐에 넣고
+#   소비 태스크가 모아서 작성자(db_writer) 쓰기 의도 하나로 holdings/balance/orders 에 반영합니다.
+# - 서버가 다시 켜지면 PENDING 주문의 남은 수량을 호가창에 다시 올립니다.
+# - 주문 접수 -> 체결(매칭), 접수 -> DB 반영까지의 지연을 따로 잽니다.
+# ------------------------------------------------------------------
+
+MISS_TTL = 30.0     # 없는 종목 이름을 다시 DB 에서 찾기까지 (초)
+
+
+def engine_order_id(order_row_id):
+    return f"USER-{order_row_id}"
+
+
+class UserOrderService:
+    def __init__(self, engine, sim_time_fn=None):
+        self.engine = engine
+        self.sim_time_fn = sim_time_fn or (lambda: None)   # 시뮬레이션 현재 시간
+        engine.external_fill_handler = self.on_fill
+
+        self.open_orders = {}     # 주문 id(orders.id) -> 호가창에 올라간 주문 dict (남은 수량이 실시간 반영됨, 체결 반영 전까지 유지)
+        self._tickers = {}        # 유저가 보낸 종목 이름/코드 -> 엔진 ticker
+        self._missing = {}        # 찾지 못한 이름 -> 확인한 시각 (MISS_TTL 동안 다시 조회하지 않음)
+        self._fills = None        # asyncio.Queue (이벤트 루프 안에서 만듦)
+        self._task = None
+
+        self.match_latency = deque(maxlen=1000)    # 접수 -> 체결 (초)
+        self.settle_latency = deque(maxlen=1000)   # 접수 -> DB 반영 (초)
+        self.stats = {"orders": 0, "fills": 0, "settled": 0, "restored": 0, "settle_errors": 0}
+
+    # --------------------------------------------------------------
+    # 종목/가격
+    # --------------------------------------------------------------
+    def resolve_ticker(self, name_or_ticker):
+        """유저가 보낸 회사 이름/코드를 엔진 ticker 로 바꿉니다. (처음 한 번만 DB 조회, 없는 이름도 잠시 기억)"""
+        ticker = self._tickers.get(name_or_ticker)
+        if ticker is None:
+            checked_at = self._missing.get(name_or_ticker)
+            if checked_at is not None and time.monotonic() - checked_at < MISS_TTL:
+                return None
+            with SessionLocal() as db:
+                company = db.query(DBCompany.ticker).filter(
+                    or_(DBCompany.ticker == name_or_ticker, DBCompany.name == name_or_ticker)
+                ).first()
+            if not company:
+                if len(self._missing) >= 1000:   # 임의 입력으로 끝없이 커지지 않게
+                    self._missing.clear()
+                self._missing[name_or_ticker] = time.monotonic()
+                return None
+            self._missing.pop(name_or_ticker, None)
+            ticker = self._tickers[name_or_ticker] = company.ticker
+        return ticker
+
+    def reference_price(self, ticker):
+        price = self.engine.last_prices.get(ticker)
+        if price is None:
+            with SessionLocal() as db:
+                company = db.query(DBCompany.current_price).filter(DBCompany.ticker == ticker).first()
+            price = company.current_price if company else None
+        return price
+
+    # --------------------------------------------------------------
+    # 접수 / 취소
+    # --------------------------------------------------------------
+    def submit(self, order_row_id, user_id, ticker, company_name, side, price, quantity, submitted_at=None):
+        """묶어 둔 주문을 호가창에 올리고 바로 매칭합니다. (이번에 체결된 수량 반환)"""
+        order = {
+            "order_id": engine_order_id(order_row_id),
+            "agent_id": f"{EXTERNAL_PREFIX}{user_id}",
+            "price": int(price),
+            "quantity": int(quantity),
+            "side": side,
+            "timestamp": self.sim_time_fn(),
+            # 아래는 호가창이 쓰지 않는 부가 정보 (체결 정산용)
+            "row_id": order_row_id,
+            "ticker": ticker,
+            "user_id": user_id,
+            "company_name": company_name,
+            "limit_price": int(price),
+            "submitted_at": submitted_at,
+        }
+        self.open_orders[order_row_id] = order
+        self.stats["orders"] += 1
+        with SessionLocal() as db:
+            self.engine.add_resting(db, ticker, order, self.sim_time_fn())
+        return int(quantity) - order["quantity"]
+
+    def cancel(self, order_row_id):
+        """
+        호가창에서 내리고, 실제로 남아 있던 수량을 돌려줍니다.
+        (DB의 체결 수량은 비동기라 늦을 수 있으므로 환불 기준은 호가창의 남은 수량)
+        다 체결됐지만 아직 DB 반영 전이면 0, 호가창에서 관리하던 주문이 아니면 None.
+        """
+        order = self.open_orders.pop(order_row_id, None)
+        if order is None:
+            return None
+        remaining = order["quantity"]
+        self.engine.cancel_order(order["ticker"], order["order_id"])
+        return remaining
+
+    def reattach(self, order_row_id, order, quantity):
+        """cancel/detach 로 내린 주문을 남은 수량 그대로 되돌립니다. (DB 반영이 실패해 주문이 여전히 PENDING 일 때)"""
+        order["quantity"] = quantity
+        self.open_orders[order_row_id] = order
+        if quantity > 0:
+            self.engine.get_book(order["ticker"]).add(order)
+
+    def detach(self, order_row_ids):
+        """
+        DB 쪽에서 직접 체결할 주문들을 호가창에서 내립니다. (process_orders 용)
+        반환: {주문 id: 호가창 기준 남은 수량} - 호가창에 있던 주문만
+        """
+        live = {}
+        for row_id in order_row_ids:
+            remaining = self.cancel(row_id)
+            if remaining is not None:
+                live[row_id] = remaining
+        return live
+
+    async def execute_crossing(self, conn, company_name, current_price):
+        """current_price 에 닿은 대기 주문을 집합 SQL 로 한꺼번에 체결합니다. (쓰기 의도 안에서 호출)"""
+        detached = {}
+
+        def detach(ids):
+            orders = {row_id: self.open_orders.get(row_id) for row_id in ids}
+            live = self.detach(ids)
+            detached.update({row_id: (orders[row_id], qty) for row_id, qty in live.items()})
+            return live
+
+        try:
+            return await execute_crossing(conn, company_name, current_price, detach=detach)
+        except Exception:
+            # 쓰기 의도가 롤백되면 주문은 여전히 PENDING 이므로 내렸던 수량 그대로 호가창에 되돌립니다.
+            for row_id, (order, qty) in detached.items():
+                self.reattach(row_id, order, qty)
+            raise
+
+    # --------------------------------------------------------------
+    # 체결 -> DB 반영
+    # --------------------------------------------------------------
+    def on_fill(self, ticker, order, price, qty, sim_time):
+        """엔진 콜백 (동기). 체결을 큐에 넣기만 하고 DB 반영은 소비 태스크가 합니다."""
+        self.stats["fills"] += 1
+        if order.get("submitted_at") is not None:
+            self.match_latency.append(time.monotonic() - order["submitted_at"])
+        if self._fills is None:
+            self._fills = asyncio.Queue()
+        self._fills.put_nowait((order, price, qty))
+
+    async def _settle(self, conn, fills):
+        for order, price, qty in fills:
+            user_id, name, row_id = order["user_id"], order["company_name"], order["row_id"]
+            if order["side"] == "BUY":
+                cursor = await conn.execute("SELECT quantity, average_price FROM holdings WHERE user_id = ? AND company_name = ?", (user_id, name))
+                holding = await cursor.fetchone()
+                if holding:
+                    new_qty = holding["quantity"] + qty
+                    new_avg = ((holding["quantity"] * (holding["average_price"] or 0)) + (qty * price)) / new_qty if new_qty > 0 else price
+                    await conn.execute("UPDATE holdings SET quantity = ?, average_price = ? WHERE user_id = ? AND company_name = ?", (new_qty, new_avg, user_id, name))
+                else:
+                    await conn.execute("INSERT INTO holdings (user_id, company_name, quantity, average_price) VALUES (?, ?, ?, ?)", (user_id, name, qty, price))
+                # 지정가로 묶어 둔 돈 중 더 싸게 산 차액은 돌려줍니다.
+                refund = (order["limit_price"] - price) * qty
+                if refund > 0:
+                    await conn.execute("UPDATE users SET balance = balance + ? WHERE id = ?", (refund, user_id))
+                await conn.execute("INSERT INTO transactions (user_id, transaction_type, amount, balance_after, description) VALUES (?, 'BUY', ?, 0, ?)",
+                                   (user_id, -(price * qty), f"{name} {qty}주 지정가 체결"))
+            else:
+                income = price * qty
+                await conn.execute("UPDATE users SET balance = balance + ? WHERE id = ?", (income, user_id))
+                await conn.execute("INSERT INTO transactions (user_id, transaction_type, amount, balance_after, description) VALUES (?, 'SELL', ?, 0, ?)",
+                                   (user_id, income, f"{name} {qty}주 지정가 체결"))
+
+            # 취소가 먼저 반영됐더라도 CANCELLED 를 FILLED 로 덮어쓰지 않습니다.
+            await conn.execute("""
+                UPDATE orders SET filled_quantity = COALESCE(filled_quantity, 0) + ?,
+                    status = CASE WHEN status = 'PENDING' AND COALESCE(filled_quantity, 0) + ? >= quantity THEN 'FILLED' ELSE status END
+                WHERE id = ?
+            """, (qty, qty, row_id))
+
+    async def _drain(self):
+        while True:
+            first = await self._fills.get()
+            if first is None:
+                return
+            batch = [first]
+            while not self._fills.empty():
+                item = self._fills.get_nowait()
+                if item is None:
+                    self._fills.put_nowait(None)
+                    break
+                batch.append(item)
+            try:
+                await db_writer.submit(lambda conn: self._settle(conn, batch))
+            except Exception as e:
+                self.stats["settle_errors"] += 1
+                print(f"🔥 [유저 체결 반영 실패] {len(batch)}건: {e}")
+                continue
+            now = time.monotonic()
+            self.stats["settled"] += len(batch)
+            for order, _, _ in batch:
+                if order.get("submitted_at") is not None:
+                    self.settle_latency.append(now - order["submitted_at"])
+                # 다 체결된 주문은 DB 에 FILLED 로 반영된 뒤에 목록에서 뺍니다. (그 전 취소 요청 거절용)
+                if order["quantity"] <= 0 and self.open_orders.get(order["row_id"]) is order:
+                    del self.open_orders[order["row_id"]]
+
+    def start(self):
+        if self._fills is None:
+            self._fills = asyncio.Queue()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._drain())
+
+    async def stop(self):
+        """큐에 남은 체결을 모두 반영하고 멈춥니다."""
+        if self._task is not None and not self._task.done():
+            self._fills.put_nowait(None)
+            await self._task
+        self._task = None
+
+    async def restore(self):
+        """서버 시작 시 PENDING 주문의 남은 수량을 호가창에 다시 올립니다."""
+        async def ensure_schema(conn):
+            try: await conn.execute("ALTER TABLE orders ADD COLUMN filled_quantity INTEGER DEFAULT 0")
+            except Exception: pass
+            await conn.execute(PENDING_INDEX_SQL)
+        await db_writer.submit(ensure_schema)
+
+        async with db_pool.acquire() as conn:
+            cursor = await conn.execute("""
+                SELECT id, user_id, company_name, order_type, price, quantity, COALESCE(filled_quantity, 0) AS filled
+                FROM orders WHERE status = 'PENDING'
+            """)
+            rows = await cursor.fetchall()
+
+        for row in rows:
+            remaining = row["quantity"] - row["filled"]
+            ticker = self.resolve_ticker(row["company_name"])
+            if remaining <= 0 or ticker is None or row["order_type"] not in ("BUY", "SELL"):
+                continue
+            self.submit(row["id"], row["user_id"], ticker, row["company_name"], row["order_type"], row["price"], remaining)
+            self.stats["restored"] += 1
+        return self.stats["restored"]
+
+    def snapshot(self):
+        match = sorted(self.match_latency)
+        settle = sorted(self.settle_latency)
+        return {
+            **self.stats,
+            "open_orders": len(self.open_orders),
+            "pending_fills": self._fills.qsize() if self._fills is not None else 0,
+            "match_p50_ms": round(percentile(match, 50) * 1000, 2),
+            "match_p95_ms": round(percentile(match, 95) * 1000, 2),
+            "settle_p50_ms": round(percentile(settle, 50) * 1000, 2),
+            "settle_p95_ms": round(percentile(settle, 95) * 1000, 2),
+        }
+
+
+# 시뮬레이션 엔진과 같은 프로세스/이벤트 루프에서 도는 전역 서비스
+import main_simulation
+user_orders = UserOrderService(main_simulation.market_engine, lambda: main_simulation.current_sim_time)
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException, Header, Depends
 from pydantic import BaseModel
-from sqlalchemy import desc, asc, func
+from sqlalchemy import desc
 from sqlalchemy.orm import Session
 from database import SessionLocal, DBCompany, DBTrade, DBNews, DBAgent, DBDiscussion
 import uvicorn
@@ -11,7 +11,12 @@ import os
 # 유저님의 핵심 엔진 및 멘토 임포트
 from core.team_market_engine import MarketEngine
 from models.domain_models import Order, OrderSide, OrderType
-from core.mentor_brain import generate_all_mentors_advice, chat_with_mentor
+from core.mentor_brain import chat_with_mentor
+from core.candle_builder import load_chart
+from core.market_stream import post_to_dict
+import main_simulation
+from services.mentor_advice import mentor_advice
+from main_simulation import market_engine as sim_engine
 
 router = APIRouter()
 engine = MarketEngine()
@@ -29,6 +34,9 @@ def get_current_sim_time(db: Session):
     """
     시뮬레이션의 '가짜 현재 시간'을 가져옵니다.
     """
+    # 시뮬레이션이 돌고 있으면 마지막 체결 시각을 메모리에서 바로 씁니다.
+    if sim_engine.summary.sim_now:
+        return sim_engine.summary.sim_now
     last_trade = db.query(DBTrade).order_by(desc(DBTrade.timestamp)).first()
     if last_trade:
         return last_trade.timestamp
@@ -57,44 +65,35 @@ class ChatRequest(BaseModel):
 
 # --- [API Endpoints] ---
 
-# 1. 기업 목록 조회 (등락률 + 거래량 계산 로직)
+# 1. 기업 목록 조회 (등락률 + 거래량은 시뮬레이션이 체결마다 갱신하는 당일 요약에서)
 @router.get("/api/companies")
 def get_companies(db: Session = Depends(get_db)):
     companies = db.query(DBCompany).all()
-    sim_now = get_current_sim_time(db)
-    sim_today_start = sim_now.replace(hour=9, minute=0, second=0, microsecond=0)
-    
+    summary = sim_engine.summary
+    if not summary.warmed:
+        # 서버가 막 켜져서 아직 요약이 없으면 묶음 쿼리 한 번으로 다시 계산
+        summary.warm(db, [c.ticker for c in companies], main_simulation.current_sim_time)
+
     result = []
     for comp in companies:
-        first_trade = db.query(DBTrade).filter(
-            DBTrade.ticker == comp.ticker,
-            DBTrade.timestamp >= sim_today_start
-        ).order_by(asc(DBTrade.timestamp)).first()
-        
-        change_rate = 0
-        if first_trade and first_trade.price > 0:
-            change_rate = ((comp.current_price - first_trade.price) / first_trade.price) * 100
-        
-        total_volume = db.query(func.sum(DBTrade.quantity)).filter(
-            DBTrade.ticker == comp.ticker,
-            DBTrade.timestamp >= sim_today_start
-        ).scalar() or 0
-        
+        day = summary.to_dict(comp.ticker, comp.current_price)
         result.append({
             "ticker": comp.ticker,
             "name": comp.name,
             "sector": comp.sector,
             "current_price": comp.current_price,
-            "change_rate": round(change_rate, 2),
-            "volume": int(total_volume)
+            "change_rate": day["change_rate"],
+            "volume": int(day["volume"])
         })
     return result
 
 # 2. 특정 기업 차트 데이터
 @router.get("/api/chart/{ticker}")
 def get_chart(ticker: str, limit: int = 3000, db: Session = Depends(get_db)): 
-    trades = db.query(DBTrade).filter(DBTrade.ticker == ticker).order_by(desc(DBTrade.timestamp)).limit(limit).all()
-    return [{"time": t.timestamp.isoformat(), "price": t.price} for t in trades][::-1]
+    # 원본 체결 대신 1분봉 종가로 그립니다. (candles 인덱스 범위 조회 한 번)
+    # 아직 flush 전인 진행 중 봉은 엔진 메모리 값을 씁니다. (main.py 차트와 같게)
+    bars = load_chart(db, ticker, "1m", limit, live_bar=sim_engine.candles.live_bar(ticker, "1m"))
+    return [{"time": b["time"], "price": b["close"]} for b in bars]
 
 # 5. 커뮤니티 (기능 유지)
 @router.get("/api/community/global")
@@ -114,6 +113,7 @@ def create_community_post(req: CommunityPostRequest, db: Session = Depends(get_d
         new_post = DBDiscussion(ticker=req.ticker, agent_id=req.author, content=req.content, sentiment=req.sentiment, created_at=sim_now)
         db.add(new_post)
         db.commit()
+        main_simulation.market_stream.publish_post(post_to_dict(new_post))
         return {"status": "success"}
     except Exception as e:
         db.rollback()
@@ -122,7 +122,7 @@ def create_community_post(req: CommunityPostRequest, db: Session = Depends(get_d
 # 7. 멘토 및 챗봇 (기능 유지)
 @router.get("/api/advice/{ticker}")
 async def get_mentor_advice(ticker: str, x_user_id: str = Header("USER_01"), db: Session = Depends(get_db)):
-    try: return await generate_all_mentors_advice(db, ticker, x_user_id)
+    try: return await mentor_advice.get(db, ticker, x_user_id)
     except Exception as e: return {"error": str(e)}
 
 @router.post("/api/chat")